@@ -1,10 +1,18 @@
-from fastapi import FastAPI, Query, HTTPException, Depends
-from fastapi.responses import JSONResponse
-from drivers import ElevatorDriver, ElevatorDriverFactory, ElevatorCallRequest
-from building_data_manager import BuildingDataManager
+from fastapi import FastAPI, Query, HTTPException, Depends, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse, StreamingResponse
+from drivers import ElevatorDriver, ElevatorDriverFactory, ElevatorCallRequest, ElevatorBatchCallRequest
+from driver_pool import ElevatorDriverPool
+from evidence_writer import get_evidence_writer
+from event_fanout import EventFanoutHub, CLOSE_SLOW_CONSUMER
+from lift_state import LIFT_STATE_SUBTOPICS
+import json_codec
+import asyncio
+import re
+import time
+from building_topology import BuildingTopology, ERROR_SAME_FLOOR
 import logging
 import yaml
-from typing import Dict, Optional
+from typing import Dict, List, Optional, Tuple
 
 # 配置日志
 logging.basicConfig(
@@ -26,8 +34,42 @@ def load_config():
 config = load_config()
 api_config = config.get('api', {})
 
-# 初始化建筑数据管理器
-building_manager = BuildingDataManager()
+def topology_key(building_id: str) -> str:
+    """建筑ID统一去掉 building: 前缀后作为拓扑索引的键"""
+    return building_id[len('building:'):] if building_id.startswith('building:') else building_id
+
+# 由虚拟建筑配置预编译的拓扑索引（按建筑ID），呼叫校验只做哈希查找
+def load_topologies(path: str = 'virtual_building_config.yml') -> Dict[str, BuildingTopology]:
+    try:
+        topology = BuildingTopology.from_config_file(path)
+        logger.info(f"Building topology loaded for {topology.building_id}: {topology.stats()}")
+        return {topology_key(topology.building_id): topology}
+    except Exception as e:
+        logger.error(f"Failed to load building topology: {e}")
+        return {}
+
+building_topologies = load_topologies()
+
+# 单次批量呼叫的最大条数
+MAX_BATCH_CALLS = api_config.get('max_batch_calls', 50)
+
+# 应用生命周期内共享的驱动连接池
+driver_pool = ElevatorDriverPool()
+
+# 本地事件扇出：同一建筑群组的SSE/WebSocket客户端共享一个上游订阅
+fanout_config = config.get('event_fanout', {})
+fanout_hub = EventFanoutHub(buffer_size=fanout_config.get('buffer_size', 256))
+FANOUT_HEARTBEAT = fanout_config.get('heartbeat_interval', 15.0)
+DEFAULT_EVENT_TOPICS = ','.join(LIFT_STATE_SUBTOPICS)
+
+_SSE_LINE_BREAK = re.compile(r'\r\n|\r|\n')
+
+def sse_message(event: str, data: str) -> str:
+    """组装一条SSE消息；含换行的数据（如格式化过的上游帧）拆成多行 data: 字段，客户端按换行拼回原文"""
+    if '\n' not in data and '\r' not in data:
+        return f"event: {event}\ndata: {data}\n\n"
+    lines = ''.join(f"data: {line}\n" for line in _SSE_LINE_BREAK.split(data))
+    return f"event: {event}\n{lines}\n"
 
 app = FastAPI(
     title=api_config.get('title', 'Elevator Control API v2.0'),
@@ -35,35 +77,49 @@ app = FastAPI(
     version="2.0.0"
 )
 
-def get_driver(elevator_type: str = Query('kone', description="Elevator type")) -> ElevatorDriver:
-    """获取电梯驱动依赖"""
-    # 为每个请求创建新的驱动实例，避免事件循环冲突
-    drivers = ElevatorDriverFactory.create_from_config()
-    driver = drivers.get(elevator_type.lower())
-    if not driver:
+async def acquire_driver(elevator_type: str, building_id: Optional[str] = None,
+                         group_id: Optional[str] = None) -> ElevatorDriver:
+    """从连接池获取承载该建筑/群组的共享电梯驱动"""
+    try:
+        return await driver_pool.get(elevator_type, building_id, group_id)
+    except KeyError:
         raise HTTPException(
             status_code=400, 
-            detail=f"Unsupported elevator type: {elevator_type}. Available types: {list(drivers.keys())}"
+            detail=f"Unsupported elevator type: {elevator_type}. Available types: {driver_pool.available_types}"
         )
-    return driver
+    except ConnectionError as e:
+        logger.error(f"Driver connection failed: {e}")
+        raise HTTPException(status_code=503, detail=f"Elevator connection unavailable: {e}")
+
+async def get_driver(
+    elevator_type: str = Query('kone', description="Elevator type"),
+    building_id: Optional[str] = Query(None, description="Building ID"),
+    group_id: Optional[str] = Query(None, description="Group ID")
+) -> ElevatorDriver:
+    """获取电梯驱动依赖 - 复用连接池中已连接的驱动"""
+    return await acquire_driver(elevator_type, building_id, group_id)
 
 @app.get("/")
 async def root():
     """根端点，返回API信息"""
-    # 获取可用的驱动类型
-    temp_drivers = ElevatorDriverFactory.create_from_config()
     return {
         "name": "Elevator Control API v2.0",
         "version": "2.0.0",
         "description": "WebSocket-based elevator control service following KONE SR-API v2.0",
-        "supported_types": list(temp_drivers.keys()),
+        "supported_types": driver_pool.available_types,
         "endpoints": {
             "initialize": "/api/elevator/initialize",
             "call": "/api/elevator/call",
+            "calls": "/api/elevator/calls",
+            "call_state": "/api/elevator/calls/{call_id}",
+            "call_stream": "/api/elevator/calls/{call_id}/stream",
             "cancel": "/api/elevator/cancel",
             "mode": "/api/elevator/mode",
+            "state": "/api/elevator/state",
             "config": "/api/elevator/config",
-            "ping": "/api/elevator/ping"
+            "ping": "/api/elevator/ping",
+            "events_sse": "/api/elevator/events/stream",
+            "events_ws": "/api/elevator/events/ws"
         }
     }
 
@@ -95,49 +151,58 @@ async def elevator_initialize(driver: ElevatorDriver = Depends(get_driver)):
         logger.error(f"Initialize error: {error_result}")
         return JSONResponse(status_code=500, content=error_result)
 
+def precheck_call(request: ElevatorCallRequest) -> Optional[dict]:
+    """本地校验 - 请求所属建筑有拓扑索引时，源/目标区域、同楼层同侧、群组都由索引查表完成；
+    没有索引的建筑只拒绝源和目标相同的呼叫，其余交给驱动按该建筑缓存的config校验。通过返回None，否则返回400结果"""
+    source_area = request.source or (request.from_floor * 1000)
+    dest_area = request.destination or (request.to_floor * 1000)
+    
+    topology = building_topologies.get(topology_key(request.building_id))
+    if topology is not None:
+        validation_error = topology.check_call(source_area, dest_area, request.group_id)
+    else:
+        validation_error = ERROR_SAME_FLOOR if source_area == dest_area else None
+    if not validation_error and request.delay > 30:
+        validation_error = 'Invalid delay: maximum 30 seconds allowed'
+    
+    if validation_error:
+        error_result = {
+            'success': False,
+            'status_code': 400,
+            'error': validation_error
+        }
+        logger.error(f"Call validation failed: {error_result}")
+        return error_result
+    return None
+
 @app.post("/api/elevator/call")
 async def elevator_call(
     request: ElevatorCallRequest,
-    driver: ElevatorDriver = Depends(get_driver)
+    elevator_type: str = Query('kone', description="Elevator type"),
+    wait: bool = Query(True, description="Wait for the call event; false returns 202 with a call handle")
 ):
-    """发起电梯呼叫"""
+    """发起电梯呼叫 - wait=false 时本地校验后立即返回202，状态通过 /api/elevator/calls/{call_id} 查询"""
+    driver = await acquire_driver(elevator_type, request.building_id, request.group_id)
     try:
-        # 验证楼层是否有效
-        valid_floors = building_manager.get_valid_floors()
-        source_area = request.source or (request.from_floor * 1000)
-        dest_area = request.destination or (request.to_floor * 1000)
-        
-        if source_area not in valid_floors or dest_area not in valid_floors:
-            error_result = {
-                'success': False,
-                'status_code': 400,
-                'error': 'INVALID_FLOOR_AREA_ID'
-            }
-            logger.error(f"Invalid floor validation failed: {error_result}")
-            return JSONResponse(status_code=400, content=error_result)
-        
-        # 验证请求参数 - 修复None == None的问题
-        # 计算实际的源和目标区域
-        actual_source = request.source or (request.from_floor * 1000)
-        actual_destination = request.destination or (request.to_floor * 1000)
-        
-        if actual_source == actual_destination:
-            error_result = {
-                'success': False,
-                'status_code': 400,
-                'error': 'SAME_SOURCE_AND_DEST_FLOOR'
-            }
-            logger.error(f"Call validation failed: {error_result}")
+        error_result = precheck_call(request)
+        if error_result:
             return JSONResponse(status_code=400, content=error_result)
         
-        if request.delay > 30:
-            error_result = {
-                'success': False,
-                'status_code': 400,
-                'error': 'Invalid delay: maximum 30 seconds allowed'
-            }
-            logger.error(f"Call validation failed: {error_result}")
-            return JSONResponse(status_code=400, content=error_result)
+        if not wait:
+            record = driver.submit_call(request)
+            location = f"/api/elevator/calls/{record.call_id}"
+            logger.info(f"Call submitted: {record.call_id} {request.dict()}")
+            return JSONResponse(
+                status_code=202,
+                content={
+                    'success': True,
+                    'status_code': 202,
+                    'call_id': record.call_id,
+                    'state': record.state,
+                    'location': location
+                },
+                headers={'Location': location}
+            )
         
         result = await driver.call(request)
         
@@ -163,6 +228,109 @@ async def elevator_call(
         logger.error(f"Call error: {error_result}")
         return JSONResponse(status_code=500, content=error_result)
 
+@app.post("/api/elevator/calls")
+async def elevator_calls(
+    request: ElevatorBatchCallRequest,
+    elevator_type: str = Query('kone', description="Elevator type")
+):
+    """批量发起电梯呼叫 - 先一次性本地校验全部呼叫，再按建筑/群组在共享连接上并发发送"""
+    started = time.perf_counter()
+    calls = request.calls
+    if len(calls) > MAX_BATCH_CALLS:
+        error_result = {
+            'success': False,
+            'status_code': 400,
+            'error': f'Too many calls: maximum {MAX_BATCH_CALLS} per batch'
+        }
+        logger.error(f"Batch call rejected: {error_result}")
+        return JSONResponse(status_code=400, content=error_result)
+    
+    results: List[Optional[dict]] = [None] * len(calls)
+    groups: Dict[Tuple[str, str], List[int]] = {}
+    for index, call in enumerate(calls):
+        error_result = precheck_call(call)
+        if error_result:
+            results[index] = dict(error_result, session_id=None, latency_ms=0.0)
+        else:
+            groups.setdefault((call.building_id, call.group_id or '1'), []).append(index)
+    
+    async def dispatch_group(building_id: str, group_id: str, indexes: List[int]):
+        try:
+            driver = await acquire_driver(elevator_type, building_id, group_id)
+            group_results = await driver.call_batch([calls[index] for index in indexes])
+        except HTTPException as e:
+            group_results = [{'success': False, 'status_code': e.status_code, 'error': e.detail}] * len(indexes)
+        except Exception as e:
+            group_results = [{'success': False, 'status_code': 500, 'error': f'Call failed: {str(e)}'}] * len(indexes)
+        for index, result in zip(indexes, group_results):
+            results[index] = result
+    
+    await asyncio.gather(*(dispatch_group(building_id, group_id, indexes)
+                           for (building_id, group_id), indexes in groups.items()))
+    
+    items = []
+    for index, result in enumerate(results):
+        item = {'index': index, 'session_id': None, 'latency_ms': None}
+        item.update(result)
+        items.append(item)
+    succeeded = sum(1 for item in items if item['success'])
+    batch_result = {
+        'success': succeeded == len(items),
+        'status_code': 200,
+        'total': len(items),
+        'succeeded': succeeded,
+        'failed': len(items) - succeeded,
+        'latency_ms': round((time.perf_counter() - started) * 1000, 3),
+        'results': items
+    }
+    logger.info(f"Batch call: {succeeded}/{len(items)} succeeded in {batch_result['latency_ms']} ms")
+    return JSONResponse(status_code=200, content=batch_result)
+
+def find_call(call_id: str):
+    """在连接池的各驱动中查找异步呼叫记录，返回 (驱动, 记录)"""
+    for driver in driver_pool.drivers():
+        tracker = getattr(driver, 'call_tracker', None)
+        record = tracker.get(call_id) if tracker is not None else None
+        if record is not None:
+            return driver, record
+    raise HTTPException(status_code=404, detail=f"Unknown call: {call_id}")
+
+@app.get("/api/elevator/calls/{call_id}")
+async def elevator_call_state(
+    call_id: str,
+    wait: float = Query(0, ge=0, le=60, description="Long-poll seconds to wait for a change"),
+    since: int = Query(0, ge=0, description="Return once the call version is greater than this")
+):
+    """异步呼叫的当前生命周期状态；wait>0 时长轮询，版本超过 since 或呼叫结束时返回"""
+    driver, record = find_call(call_id)
+    if wait > 0:
+        record = await driver.call_tracker.wait_for_change(call_id, since, wait) or record
+    return {'success': True, 'status_code': 200, 'data': record.to_dict()}
+
+@app.get("/api/elevator/calls/{call_id}/stream")
+async def elevator_call_stream(call_id: str):
+    """异步呼叫状态 Server-Sent Events 流 - 每次状态变化推送一次，呼叫结束后关闭"""
+    driver, record = find_call(call_id)
+    tracker = driver.call_tracker
+    
+    async def stream():
+        version = 0
+        while True:
+            current = await tracker.wait_for_change(call_id, version, FANOUT_HEARTBEAT)
+            if current is None:
+                yield sse_message('close', json_codec.dumps({'reason': 'call expired'}))
+                break
+            if current.version > version:
+                version = current.version
+                yield sse_message('call-state', json_codec.dumps(current.to_dict()))
+                if current.terminal:
+                    break
+            else:
+                yield ": keep-alive\n\n"
+    
+    return StreamingResponse(stream(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
 @app.post("/api/elevator/cancel")
 async def elevator_cancel(
     building_id: str = Query(..., description="Building ID"),
@@ -199,11 +367,12 @@ async def elevator_cancel(
 async def elevator_mode(
     building_id: str = Query(..., description="Building ID"),
     group_id: str = Query("1", description="Group ID"),
+    max_age: Optional[float] = Query(None, ge=0, description="Maximum acceptable state age in seconds"),
     driver: ElevatorDriver = Depends(get_driver)
 ):
-    """获取电梯模式/状态"""
+    """获取电梯模式 - 读取实时状态缓存，超过 max_age 时才向服务器刷新"""
     try:
-        result = await driver.get_mode(building_id, group_id)
+        result = await driver.get_mode(building_id, group_id, max_age=max_age)
         
         if result['success']:
             logger.info(f"Mode check successful: {building_id}, {group_id} -> {result}")
@@ -227,23 +396,24 @@ async def elevator_mode(
         logger.error(f"Mode check error: {error_result}")
         return JSONResponse(status_code=500, content=error_result)
 
-@app.get("/api/elevator/config")
-async def elevator_config(
+@app.get("/api/elevator/state")
+async def elevator_state(
     building_id: str = Query(..., description="Building ID"),
+    group_id: str = Query("1", description="Group ID"),
+    max_age: Optional[float] = Query(None, ge=0, description="Maximum acceptable state age in seconds"),
     driver: ElevatorDriver = Depends(get_driver)
 ):
-    """获取建筑配置"""
+    """获取群组内各电梯的完整状态（模式、位置、门状态），来自实时状态缓存"""
     try:
-        result = await driver.get_config(building_id)
+        result = await driver.get_lift_state(building_id, group_id, max_age=max_age)
         
         if result['success']:
-            logger.info(f"Config retrieval successful: {building_id}")
             return JSONResponse(
                 status_code=result.get('status_code', 200),
                 content=result
             )
         else:
-            logger.error(f"Config retrieval failed: {result}")
+            logger.error(f"State query failed: {result}")
             return JSONResponse(
                 status_code=result.get('status_code', 500),
                 content=result
@@ -253,33 +423,82 @@ async def elevator_config(
         error_result = {
             'success': False,
             'status_code': 500,
-            'error': f'Config retrieval failed: {str(e)}'
+            'error': f'State query failed: {str(e)}'
         }
-        logger.error(f"Config error: {error_result}")
+        logger.error(f"State query error: {error_result}")
         return JSONResponse(status_code=500, content=error_result)
 
-@app.get("/api/elevator/ping")
-async def elevator_ping(
+@app.delete("/api/elevator/state")
+async def elevator_state_untrack(
+    building_id: str = Query(..., description="Building ID"),
+    group_id: str = Query("1", description="Group ID"),
+    driver: ElevatorDriver = Depends(get_driver)
+):
+    """停止跟踪群组的电梯状态并释放监控订阅租约；之后再查询状态时重新开始跟踪"""
+    try:
+        released = await driver.untrack_lift_state(building_id, group_id)
+        return {
+            'success': True,
+            'status_code': 200,
+            'released': released
+        }
+    except Exception as e:
+        error_result = {
+            'success': False,
+            'status_code': 500,
+            'error': f'State untrack failed: {str(e)}'
+        }
+        logger.error(f"State untrack error: {error_result}")
+        return JSONResponse(status_code=500, content=error_result)
+
+@app.get("/api/elevator/config")
+async def elevator_config(
     building_id: str = Query(..., description="Building ID"),
     driver: ElevatorDriver = Depends(get_driver)
 ):
-    """Ping建筑以检查连接性"""
+    """获取建筑配置"""
     try:
-        result = await driver.ping(building_id)
+        result = await driver.get_config(building_id)
         
         if result['success']:
-            logger.info(f"Ping successful: {building_id}, latency: {result.get('latency_ms')}ms")
+            logger.info(f"Config retrieval successful: {building_id}")
             return JSONResponse(
                 status_code=result.get('status_code', 200),
                 content=result
             )
         else:
-            logger.error(f"Ping failed: {result}")
+            logger.error(f"Config retrieval failed: {result}")
             return JSONResponse(
                 status_code=result.get('status_code', 500),
                 content=result
             )
             
+    except Exception as e:
+        error_result = {
+            'success': False,
+            'status_code': 500,
+            'error': f'Config retrieval failed: {str(e)}'
+        }
+        logger.error(f"Config error: {error_result}")
+        return JSONResponse(status_code=500, content=error_result)
+
+@app.get("/api/elevator/ping")
+async def elevator_ping(
+    building_id: str = Query(..., description="Building ID"),
+    driver: ElevatorDriver = Depends(get_driver)
+):
+    """Ping建筑以检查连接性 - 返回ping事件和往返时延 rtt_ms"""
+    try:
+        event = await driver.ping(building_id)
+        result = {
+            'success': True,
+            'status_code': 200,
+            'rtt_ms': event.get('rtt_ms'),
+            'data': event
+        }
+        logger.info(f"Ping successful: {building_id}, rtt: {result['rtt_ms']}ms")
+        return JSONResponse(status_code=200, content=result)
+            
     except Exception as e:
         error_result = {
             'success': False,
@@ -289,27 +508,108 @@ async def elevator_ping(
         logger.error(f"Ping error: {error_result}")
         return JSONResponse(status_code=500, content=error_result)
 
+def parse_topics(topics: str) -> list:
+    return [topic.strip() for topic in topics.split(',') if topic.strip()]
+
+async def open_fanout_subscriber(elevator_type: str, building_id: str, group_id: str, topics: str):
+    """从连接池取驱动并登记扇出订阅者，主题为空时返回400"""
+    driver = await acquire_driver(elevator_type, building_id, group_id)
+    try:
+        return await fanout_hub.subscribe(driver, building_id, group_id, parse_topics(topics))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/api/elevator/events/stream")
+async def elevator_events_sse(
+    building_id: str = Query(..., description="Building ID"),
+    group_id: str = Query("1", description="Group ID"),
+    topics: str = Query(DEFAULT_EVENT_TOPICS, description="Comma separated subtopics, + and # wildcards allowed"),
+    elevator_type: str = Query('kone', description="Elevator type")
+):
+    """监控事件 Server-Sent Events 流 - 与其他客户端共享上游订阅"""
+    subscriber = await open_fanout_subscriber(elevator_type, building_id, group_id, topics)
+    logger.info(f"SSE subscriber {subscriber.subscriber_id} opened: {building_id}/{group_id} {subscriber.topics}")
+    
+    async def stream():
+        try:
+            while True:
+                item = await subscriber.get(timeout=FANOUT_HEARTBEAT)
+                if item is not None:
+                    # 上游帧原样转发，不重新序列化
+                    yield sse_message(item.header.type or 'message', item.text)
+                elif subscriber.closed:
+                    yield sse_message('close', json_codec.dumps({'reason': subscriber.close_reason}))
+                    break
+                else:
+                    yield ": keep-alive\n\n"
+        finally:
+            subscriber.close()
+            logger.info(f"SSE subscriber {subscriber.subscriber_id} closed: {subscriber.close_reason}")
+    
+    return StreamingResponse(stream(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.websocket("/api/elevator/events/ws")
+async def elevator_events_ws(
+    websocket: WebSocket,
+    building_id: str = Query(..., description="Building ID"),
+    group_id: str = Query("1", description="Group ID"),
+    topics: str = Query(DEFAULT_EVENT_TOPICS, description="Comma separated subtopics, + and # wildcards allowed"),
+    elevator_type: str = Query('kone', description="Elevator type")
+):
+    """监控事件 WebSocket 推送 - 与其他客户端共享上游订阅"""
+    try:
+        subscriber = await open_fanout_subscriber(elevator_type, building_id, group_id, topics)
+    except HTTPException as e:
+        await websocket.close(code=1008, reason=str(e.detail)[:120])
+        return
+    await websocket.accept()
+    logger.info(f"WebSocket subscriber {subscriber.subscriber_id} opened: {building_id}/{group_id} {subscriber.topics}")
+    
+    async def watch_disconnect():
+        # 客户端不需要发送数据，只用于发现断开
+        try:
+            while True:
+                await websocket.receive_text()
+        except (WebSocketDisconnect, RuntimeError):
+            subscriber.close()
+    
+    watcher = asyncio.ensure_future(watch_disconnect())
+    try:
+        while True:
+            item = await subscriber.get(timeout=FANOUT_HEARTBEAT)
+            if item is not None:
+                await websocket.send_text(item.text)
+            elif subscriber.closed:
+                break
+        if subscriber.close_reason == CLOSE_SLOW_CONSUMER:
+            await websocket.close(code=1008, reason=CLOSE_SLOW_CONSUMER)
+        elif subscriber.close_reason is not None:
+            await websocket.close(code=1011, reason=subscriber.close_reason)
+    except (WebSocketDisconnect, RuntimeError):
+        pass
+    finally:
+        watcher.cancel()
+        subscriber.close()
+        logger.info(f"WebSocket subscriber {subscriber.subscriber_id} closed: {subscriber.close_reason}")
+
 @app.get("/api/elevator/status")
 async def get_available_types():
     """获取可用的电梯类型和状态"""
-    temp_drivers = ElevatorDriverFactory.create_from_config()
     status = {}
-    for elevator_type, driver in temp_drivers.items():
-        try:
-            # 尝试检查连接状态
-            status[elevator_type] = {
-                "available": True,
-                "type": type(driver).__name__
-            }
-        except Exception as e:
-            status[elevator_type] = {
-                "available": False,
-                "error": str(e)
-            }
+    for elevator_type in driver_pool.available_types:
+        driver_class = ElevatorDriverFactory.DRIVER_CLASSES.get(elevator_type)
+        status[elevator_type] = {
+            "available": driver_class is not None,
+            "type": driver_class.__name__ if driver_class else None,
+            "pooled_connections": driver_pool.pooled_count(elevator_type)
+        }
     
     return {
         "available_types": status,
-        "default_type": config.get('default_elevator_type', 'kone')
+        "default_type": config.get('default_elevator_type', 'kone'),
+        "connections": driver_pool.stats(),
+        "event_fanout": fanout_hub.stats()
     }
 
 # 优雅关闭处理
@@ -317,8 +617,11 @@ async def get_available_types():
 async def shutdown_event():
     """应用关闭时清理资源"""
     logger.info("Shutting down elevator control service...")
-    # 注意：由于我们现在为每个请求创建驱动，这里不需要关闭全局驱动
-    # 每个驱动会在请求结束时自动清理
+    fanout_hub.close()
+    # 关闭连接池中所有共享的驱动连接
+    await driver_pool.close_all()
+    # 将尚未落盘的证据记录写入文件（在线程池中等待，不阻塞事件循环）
+    await get_evidence_writer().aflush()
 
 if __name__ == "__main__":
     import uvicorn
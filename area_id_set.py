@@ -0,0 +1,153 @@
+"""
+区域ID区间集合
+把区域ID保存为有序、互不相交的半开区间 [start, stop)，以两个 array 存储并用二分查找判断成员，
+1200-12010 这样的连续区域只占一个区间；支持并、交、差等集合运算，结果仍是区间集合
+"""
+
+from array import array
+from bisect import bisect_right
+from typing import Iterable, Iterator, List, Optional, Tuple, Union
+
+Interval = Tuple[int, int]
+
+
+def _normalize(intervals: Iterable[Interval]) -> List[Interval]:
+    """排序并合并重叠或相邻的区间"""
+    merged: List[Interval] = []
+    for start, stop in sorted(interval for interval in intervals if interval[0] < interval[1]):
+        if merged and start <= merged[-1][1]:
+            if stop > merged[-1][1]:
+                merged[-1] = (merged[-1][0], stop)
+        else:
+            merged.append((start, stop))
+    return merged
+
+
+def _intervals_of(items: Iterable[Union[int, range]]) -> Iterator[Interval]:
+    for item in items:
+        if isinstance(item, range):
+            if item.step == 1:
+                yield (item.start, item.stop)
+            else:
+                for value in item:
+                    yield (value, value + 1)
+        else:
+            yield (int(item), int(item) + 1)
+
+
+class AreaIdSet:
+    """不可变的区域ID集合，成员判断为 O(log 区间数)"""
+
+    __slots__ = ('_starts', '_stops', '_size')
+
+    def __init__(self, items: Iterable[Union[int, range]] = ()):
+        self._assign(_normalize(_intervals_of(items)))
+
+    def _assign(self, intervals: List[Interval]):
+        self._starts = array('q', (start for start, _ in intervals))
+        self._stops = array('q', (stop for _, stop in intervals))
+        self._size = sum(stop - start for start, stop in intervals)
+
+    @classmethod
+    def from_intervals(cls, intervals: Iterable[Interval]) -> 'AreaIdSet':
+        """由半开区间 [start, stop) 构建"""
+        result = cls.__new__(cls)
+        result._assign(_normalize(intervals))
+        return result
+
+    @classmethod
+    def closed_range(cls, first: int, last: int) -> 'AreaIdSet':
+        """包含两端的连续区域，如 closed_range(1200, 12010)"""
+        return cls.from_intervals([(first, last + 1)])
+
+    def intervals(self) -> List[Interval]:
+        return list(zip(self._starts, self._stops))
+
+    def __contains__(self, area_id) -> bool:
+        if not isinstance(area_id, int):
+            return False
+        index = bisect_right(self._starts, area_id) - 1
+        return index >= 0 and area_id < self._stops[index]
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __bool__(self) -> bool:
+        return self._size > 0
+
+    def __iter__(self) -> Iterator[int]:
+        for start, stop in zip(self._starts, self._stops):
+            yield from range(start, stop)
+
+    @property
+    def first(self) -> Optional[int]:
+        return self._starts[0] if self._starts else None
+
+    @property
+    def last(self) -> Optional[int]:
+        return self._stops[-1] - 1 if self._stops else None
+
+    def union(self, other: 'AreaIdSet') -> 'AreaIdSet':
+        return AreaIdSet.from_intervals(self.intervals() + other.intervals())
+
+    def intersection(self, other: 'AreaIdSet') -> 'AreaIdSet':
+        result = []
+        left, right = self.intervals(), other.intervals()
+        i = j = 0
+        while i < len(left) and j < len(right):
+            start = max(left[i][0], right[j][0])
+            stop = min(left[i][1], right[j][1])
+            if start < stop:
+                result.append((start, stop))
+            if left[i][1] < right[j][1]:
+                i += 1
+            else:
+                j += 1
+        return AreaIdSet.from_intervals(result)
+
+    def difference(self, other: 'AreaIdSet') -> 'AreaIdSet':
+        result = []
+        removed = other.intervals()
+        j = 0
+        for start, stop in self.intervals():
+            # 跳过完全在当前区间之前的被减区间
+            while j < len(removed) and removed[j][1] <= start:
+                j += 1
+            k = j
+            while k < len(removed) and removed[k][0] < stop:
+                if removed[k][0] > start:
+                    result.append((start, removed[k][0]))
+                start = max(start, removed[k][1])
+                k += 1
+            if start < stop:
+                result.append((start, stop))
+        return AreaIdSet.from_intervals(result)
+
+    def issubset(self, other: 'AreaIdSet') -> bool:
+        return not self.difference(other)
+
+    def isdisjoint(self, other: 'AreaIdSet') -> bool:
+        return not self.intersection(other)
+
+    __or__ = union
+    __and__ = intersection
+    __sub__ = difference
+    __le__ = issubset
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, AreaIdSet):
+            return NotImplemented
+        return self._starts == other._starts and self._stops == other._stops
+
+    def __hash__(self) -> int:
+        return hash((self._starts.tobytes(), self._stops.tobytes()))
+
+    def describe(self) -> str:
+        """可读的区间描述，如 '1200-12010, 53000'"""
+        return ', '.join(
+            str(start) if stop - start == 1 else f"{start}-{stop - 1}"
+            for start, stop in zip(self._starts, self._stops)
+        )
+
+    def __repr__(self) -> str:
+        return f"AreaIdSet({self.describe()})"
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+JSON编解码器微基准
+对比各可用编解码器在KONE帧上的解码（bytes/str）和编码耗时。
+默认使用内置的典型帧，也可以传入证据日志（kone_validation.log）使用其中记录的真实请求/响应
+
+用法: python bench_json_codec.py [kone_validation.log] [--rounds N]
+"""
+
+import argparse
+import time
+from typing import Any, Dict, List
+
+import json_codec
+
+# 典型帧：监控事件占绝大多数，其次是呼叫确认和呼叫事件
+SAMPLE_FRAMES: List[Dict[str, Any]] = [
+    {
+        'subtopic': 'lift_1/status', 'buildingId': 'building:L1QinntdEOg', 'groupId': '1',
+        'type': 'monitor-lift-status', 'callType': 'monitor',
+        'data': {'time': '2025-08-17T10:21:33.812Z', 'lift_mode': 'normal', 'fault_active': False,
+                 'floor': 3, 'nearest_floor': 3, 'moving_state': 'STANDING', 'decks': [
+                     {'area': 3000, 'deck': 0, 'door_state': 'OPENED', 'load': 120}]}
+    },
+    {
+        'subtopic': 'lift_2/position', 'buildingId': 'building:L1QinntdEOg', 'groupId': '1',
+        'type': 'monitor-lift-position', 'callType': 'monitor',
+        'data': {'time': '2025-08-17T10:21:33.907Z', 'dir': 'UP', 'coll': 'UP', 'moving_state': 'MOVING',
+                 'area': 4000, 'cur': 4, 'adv': 5, 'door': False}
+    },
+    {
+        'subtopic': 'call_state/1234/fixed', 'buildingId': 'building:L1QinntdEOg', 'groupId': '1',
+        'type': 'monitor-call-state', 'callType': 'monitor',
+        'data': {'time': '2025-08-17T10:21:34.001Z', 'request_id': 593018412, 'session_id': 1234,
+                 'call_state': 'being_fixed', 'allocated_lift_deck': ['1:0'], 'eta': 12}
+    },
+    {'statusCode': 201, 'requestId': 593018412, 'data': {'time': '2025-08-17T10:21:33.500Z'}},
+    {
+        'callType': 'action', 'buildingId': 'building:L1QinntdEOg',
+        'data': {'request_id': 593018412, 'success': True, 'session_id': 1234}
+    },
+    {
+        'type': 'lift-call-api-v2', 'buildingId': 'building:L1QinntdEOg', 'callType': 'action',
+        'groupId': '1', 'payload': {'request_id': 593018412, 'area': 3000,
+                                    'time': '2025-08-17T10:21:33.400Z', 'terminal': 1,
+                                    'call': {'action': 2, 'destination': 5000}}
+    },
+]
+
+
+def load_recorded_frames(path: str) -> List[Any]:
+    """从证据日志中提取记录的请求/响应帧"""
+    frames = []
+    with open(path, 'rb') as f:
+        for line in f:
+            try:
+                record = json_codec.loads(line)
+            except ValueError:
+                continue
+            for field in ('message', 'response', 'event'):
+                if isinstance(record.get(field), dict):
+                    frames.append(record[field])
+    return frames
+
+
+def bench(codec: json_codec.JsonCodec, frames: List[Any], rounds: int) -> Dict[str, float]:
+    """返回每帧平均耗时（微秒）"""
+    encoded = [codec.dumps_bytes(frame) for frame in frames]
+    text = [frame.decode('utf-8') for frame in encoded]
+    count = len(frames) * rounds
+    results = {}
+
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for frame in encoded:
+            codec.loads(frame)
+    results['loads_bytes_us'] = (time.perf_counter() - start) / count * 1e6
+
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for frame in text:
+            codec.loads(frame)
+    results['loads_str_us'] = (time.perf_counter() - start) / count * 1e6
+
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for frame in frames:
+            codec.dumps_bytes(frame)
+    results['dumps_bytes_us'] = (time.perf_counter() - start) / count * 1e6
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='JSON codec micro-benchmark on KONE frames')
+    parser.add_argument('evidence_log', nargs='?', help='evidence log (JSONL) with recorded frames')
+    parser.add_argument('--rounds', type=int, default=20000)
+    args = parser.parse_args()
+
+    frames = load_recorded_frames(args.evidence_log) if args.evidence_log else SAMPLE_FRAMES
+    if not frames:
+        print(f"No frames found in {args.evidence_log}")
+        return
+    rounds = max(1, args.rounds * len(SAMPLE_FRAMES) // len(frames))
+    print(f"Frames: {len(frames)}, rounds: {rounds}, active codec: {json_codec.codec.name}")
+
+    baseline = None
+    for name in json_codec.available_codecs():
+        results = bench(json_codec.get_codec(name), frames, rounds)
+        baseline = baseline or results
+        summary = ', '.join(
+            f"{key}={value:.2f} ({baseline[key] / value:.1f}x)" for key, value in results.items()
+        )
+        print(f"{name:>8}: {summary}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,126 @@
+"""
+建筑配置/动作缓存
+按 (类型, 建筑, 群组) 缓存 common-api config / actions 响应，带TTL和单飞刷新；
+刷新时用内容哈希判断拓扑是否变化，变化时通知监听者（派生数据据此失效）
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+CacheKey = Tuple[str, str, str]
+# 监听者参数: (类型, 建筑ID, 群组ID, 旧哈希, 新哈希, 新响应)
+ChangeListener = Callable[[str, str, str, Optional[str], str, dict], None]
+
+
+def content_hash(response: dict) -> str:
+    """响应内容哈希：只取 data 部分，忽略 requestId 等每次不同的字段"""
+    content = response.get('data', response)
+    encoded = json.dumps(content, sort_keys=True, ensure_ascii=False, default=str).encode('utf-8')
+    return hashlib.sha256(encoded).hexdigest()
+
+
+class _CacheEntry:
+    __slots__ = ('response', 'content_hash', 'fetched_at')
+
+    def __init__(self, response: dict, digest: str):
+        self.response = response
+        self.content_hash = digest
+        self.fetched_at = time.monotonic()
+
+
+class BuildingDataCache:
+    """带TTL、单飞刷新和变化通知的建筑数据缓存"""
+
+    def __init__(self, ttl: float = 300.0):
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.fetches = 0  # 实际请求次数（并发未命中共享一次）
+        self.changes = 0
+        self._entries: Dict[CacheKey, _CacheEntry] = {}
+        self._inflight: Dict[CacheKey, asyncio.Task] = {}
+        self._listeners: List[ChangeListener] = []
+
+    async def get(self, kind: str, building_id: str, group_id: Optional[str],
+                  fetch: Callable[[], Awaitable[dict]],
+                  max_age: Optional[float] = None, refresh: bool = False) -> dict:
+        """返回缓存的响应（副本）；过期、强制刷新或未命中时调用 fetch，并发请求共享同一次刷新"""
+        key = (kind, building_id, group_id or '1')
+        max_age = self.ttl if max_age is None else max_age
+        entry = self._entries.get(key)
+        if not refresh and entry is not None and time.monotonic() - entry.fetched_at < max_age:
+            self.hits += 1
+            return dict(entry.response)
+
+        self.misses += 1
+        task = self._inflight.get(key)
+        if task is None or task.done():
+            task = asyncio.ensure_future(self._refresh(key, fetch))
+            self._inflight[key] = task
+        # shield: 单个调用方被取消不影响其他等待者
+        response = await asyncio.shield(task)
+        return dict(response)
+
+    def peek(self, kind: str, building_id: str, group_id: Optional[str] = None) -> Optional[dict]:
+        """不触发刷新，返回当前缓存的响应（可能已过期）"""
+        entry = self._entries.get((kind, building_id, group_id or '1'))
+        return dict(entry.response) if entry is not None else None
+
+    def content_hash(self, kind: str, building_id: str, group_id: Optional[str] = None) -> Optional[str]:
+        entry = self._entries.get((kind, building_id, group_id or '1'))
+        return entry.content_hash if entry is not None else None
+
+    def invalidate(self, building_id: Optional[str] = None, kind: Optional[str] = None):
+        """使匹配的缓存失效，下次访问时重新获取"""
+        for key in list(self._entries):
+            if (kind is None or key[0] == kind) and (building_id is None or key[1] == building_id):
+                del self._entries[key]
+
+    def add_listener(self, listener: ChangeListener):
+        """注册内容变化监听者"""
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener: ChangeListener):
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'entries': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'fetches': self.fetches,
+            'changes': self.changes
+        }
+
+    async def _refresh(self, key: CacheKey, fetch: Callable[[], Awaitable[dict]]) -> dict:
+        self.fetches += 1
+        try:
+            response = await fetch()
+        finally:
+            self._inflight.pop(key, None)
+
+        # 只缓存成功的响应，错误响应原样返回
+        status = response.get('statusCode')
+        if isinstance(status, int) and status >= 400:
+            return response
+
+        digest = content_hash(response)
+        previous = self._entries.get(key)
+        self._entries[key] = _CacheEntry(response, digest)
+
+        if previous is not None and previous.content_hash != digest:
+            self.changes += 1
+            logger.info(f"Building {key[0]} changed: building={key[1]}, group={key[2]}")
+            for listener in list(self._listeners):
+                try:
+                    listener(key[0], key[1], key[2], previous.content_hash, digest, response)
+                except Exception as e:
+                    logger.error(f"Building data change listener failed: {e}")
+        return response
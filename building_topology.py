@@ -0,0 +1,173 @@
+"""
+建筑拓扑索引
+从建筑配置（virtual_building_config.yml 或 common-api config 响应）一次性编译出只读索引：
+区域 -> 楼层/侧/群组，楼层 -> 区域，以及合法的 (出发, 到达) 组合，
+呼叫校验只需几次哈希查找，与区域数量无关。
+行程规则：同一群组内不同楼层之间任意侧都可到达；同楼层无论同侧还是对侧都没有行程
+"""
+
+from dataclasses import dataclass
+from itertools import product
+from types import MappingProxyType
+from typing import Any, Dict, FrozenSet, Iterable, List, Mapping, Optional, Tuple
+
+import yaml
+
+# 校验错误码，与 acesslifts 原有的错误码保持一致
+ERROR_INVALID_AREA = 'INVALID_FLOOR_AREA_ID'
+ERROR_SAME_FLOOR = 'SAME_SOURCE_AND_DEST_FLOOR'
+ERROR_GROUP_MISMATCH = 'AREA_NOT_IN_GROUP'
+
+# 区域所在的 (楼层, 侧, 群组)；群组为None表示所有群组都可到达
+Zone = Tuple[int, int, Optional[str]]
+
+
+@dataclass(frozen=True)
+class AreaInfo:
+    """单个区域的拓扑信息"""
+    area_id: int
+    floor: int
+    side: int
+    group: Optional[str] = None
+    short_name: Optional[str] = None
+    exit: bool = False
+
+    @property
+    def zone(self) -> Zone:
+        return (self.floor, self.side, self.group)
+
+
+def _zones_compatible(source: Zone, destination: Zone) -> bool:
+    """不同楼层且属于同一群组（或未区分群组）的区域之间才有行程。
+    侧不影响结果：验证指南 Test 12（同层对侧）和 Test 13（同层同侧）都以 SAME_SOURCE_AND_DEST_FLOOR 取消"""
+    if source[0] == destination[0]:
+        return False
+    return source[2] is None or destination[2] is None or source[2] == destination[2]
+
+
+class BuildingTopology:
+    """只读的建筑拓扑索引"""
+
+    __slots__ = ('building_id', 'areas', 'floor_areas', 'groups', 'valid_pairs')
+
+    def __init__(self, building_id: str, areas: Iterable[AreaInfo],
+                 groups: Optional[Mapping[str, Iterable[int]]] = None):
+        area_map = {area.area_id: area for area in areas}
+        floor_areas: Dict[int, List[int]] = {}
+        for area in area_map.values():
+            floor_areas.setdefault(area.floor, []).append(area.area_id)
+
+        zones = {area.zone for area in area_map.values()}
+
+        self.building_id = building_id
+        self.areas: Mapping[int, AreaInfo] = MappingProxyType(area_map)
+        self.floor_areas: Mapping[int, FrozenSet[int]] = MappingProxyType(
+            {floor: frozenset(ids) for floor, ids in floor_areas.items()}
+        )
+        self.groups: Mapping[str, Tuple[int, ...]] = MappingProxyType(
+            {str(group_id): tuple(lifts) for group_id, lifts in (groups or {}).items()}
+        )
+        # 合法组合按区域所在的 (楼层, 侧, 群组) 预先计算：数量只随楼层数增长，不随区域数平方增长
+        self.valid_pairs: FrozenSet[Tuple[Zone, Zone]] = frozenset(
+            (source, destination) for source, destination in product(zones, repeat=2)
+            if _zones_compatible(source, destination)
+        )
+
+    def __contains__(self, area_id: Any) -> bool:
+        return area_id in self.areas
+
+    def floor_of(self, area_id: int) -> Optional[int]:
+        area = self.areas.get(area_id)
+        return area.floor if area is not None else None
+
+    def is_valid_pair(self, source: int, destination: int) -> bool:
+        source_area = self.areas.get(source)
+        destination_area = self.areas.get(destination)
+        if source_area is None or destination_area is None:
+            return False
+        return (source_area.zone, destination_area.zone) in self.valid_pairs
+
+    def check_call(self, source: int, destination: Optional[int] = None,
+                   group_id: Optional[str] = None) -> Optional[str]:
+        """校验一次呼叫，合法返回None，否则返回错误码"""
+        source_area = self.areas.get(source)
+        if source_area is None or not self._in_group(source_area, group_id):
+            return ERROR_INVALID_AREA if source_area is None else ERROR_GROUP_MISMATCH
+        if destination is None:
+            return None
+
+        destination_area = self.areas.get(destination)
+        if destination_area is None:
+            return ERROR_INVALID_AREA
+        if not self._in_group(destination_area, group_id):
+            return ERROR_GROUP_MISMATCH
+        if (source_area.zone, destination_area.zone) in self.valid_pairs:
+            return None
+        if source_area.floor == destination_area.floor:
+            return ERROR_SAME_FLOOR
+        return ERROR_GROUP_MISMATCH
+
+    @staticmethod
+    def _in_group(area: AreaInfo, group_id: Optional[str]) -> bool:
+        return group_id is None or area.group is None or area.group == str(group_id)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'areas': len(self.areas),
+            'floors': len(self.floor_areas),
+            'groups': len(self.groups),
+            'valid_zone_pairs': len(self.valid_pairs)
+        }
+
+    @classmethod
+    def from_virtual_config(cls, config: Dict[str, Any]) -> 'BuildingTopology':
+        """从 virtual_building_config.yml 的内容编译"""
+        areas = []
+        for floor in (config.get('floors') or {}).values():
+            level = floor.get('level')
+            for area in floor.get('areas') or []:
+                areas.append(AreaInfo(
+                    area_id=int(area['area_id']),
+                    floor=int(level),
+                    side=int(area.get('side', 1)),
+                    group=str(area['group']) if area.get('group') is not None else None,
+                    short_name=area.get('short_name'),
+                    exit=bool(area.get('exit', False))
+                ))
+
+        groups = {}
+        for name, group in (config.get('elevator_groups') or {}).items():
+            group_id = name[len('group_'):] if name.startswith('group_') else name
+            groups[group_id] = [lift['lift_id'] for lift in group.get('lifts') or [] if lift.get('lift_id') is not None]
+
+        building_id = (config.get('building') or {}).get('id', '')
+        return cls(building_id, areas, groups)
+
+    @classmethod
+    def from_config_file(cls, path: str = 'virtual_building_config.yml') -> 'BuildingTopology':
+        with open(path, 'r') as f:
+            return cls.from_virtual_config(yaml.safe_load(f) or {})
+
+    @classmethod
+    def from_kone_config(cls, building_id: str, response: Dict[str, Any],
+                         group_id: Optional[str] = None) -> 'BuildingTopology':
+        """从 common-api config 响应编译（destinations: area_id / group_floor_id / group_side）"""
+        data = response.get('data', response) or {}
+        group = str(group_id) if group_id is not None else None
+        areas = [
+            AreaInfo(
+                area_id=int(destination['area_id']),
+                floor=int(destination.get('group_floor_id', 0)),
+                side=int(destination.get('group_side', 1)),
+                group=group,
+                short_name=destination.get('short_name'),
+                exit=bool(destination.get('exit', False))
+            )
+            for destination in data.get('destinations') or []
+            if destination.get('area_id') is not None
+        ]
+        groups = {
+            str(item.get('group_id', 1)): [lift['lift_id'] for lift in item.get('lifts') or [] if lift.get('lift_id') is not None]
+            for item in data.get('groups') or []
+        }
+        return cls(building_id, areas, groups)
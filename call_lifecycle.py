@@ -0,0 +1,259 @@
+"""
+呼叫生命周期跟踪
+异步提交的呼叫立即得到 call_id，之后由 monitor-call-state 事件（call_state/<session_id>/<state>）
+推进状态：submitted -> accepted -> being_assigned / assigned / being_fixed / fixed -> served / canceled；
+本地预校验或服务器拒绝为 rejected，未能取得会话为 failed。查询直接读内存记录，可按版本长轮询等待变化
+"""
+
+import asyncio
+import itertools
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+CALL_SUBMITTED = 'submitted'
+CALL_ACCEPTED = 'accepted'
+CALL_SERVED = 'served'
+CALL_CANCELED = 'canceled'
+CALL_REJECTED = 'rejected'
+CALL_FAILED = 'failed'
+
+TERMINAL_CALL_STATES = frozenset({CALL_SERVED, CALL_CANCELED, CALL_REJECTED, CALL_FAILED})
+
+CALL_STATE_EVENT_TYPE = 'monitor-call-state'
+CALL_STATE_SUBTOPICS = ['call_state/+/+']
+
+DEFAULT_RETENTION = 300.0
+DEFAULT_MAX_RECORDS = 10000
+MAX_ORPHAN_EVENTS = 1024
+MAX_ORPHAN_EVENTS_PER_SESSION = 16
+
+# monitor-call-state 中随状态更新的字段
+_EVENT_FIELDS = ('allocated_lift_deck', 'eta', 'cancel_reason', 'modified_destination', 'subgroup_id')
+
+
+def call_state_of(event: dict, payload: dict) -> Optional[str]:
+    """呼叫状态：优先取负载中的 call_state，其次取主题 call_state/<session>/<state> 的最后一级"""
+    state = payload.get('call_state') or payload.get('state')
+    if state:
+        return str(state)
+    topic = event.get('subtopic') or event.get('topic')
+    if isinstance(topic, str) and topic.startswith('call_state/'):
+        parts = topic.split('/')
+        if len(parts) == 3 and parts[2] != '+':
+            return parts[2]
+    return None
+
+
+def session_id_of(event: dict, payload: dict) -> Optional[str]:
+    session_id = payload.get('session_id')
+    if session_id is None:
+        topic = event.get('subtopic') or event.get('topic')
+        if isinstance(topic, str) and topic.startswith('call_state/'):
+            session_id = topic.split('/')[1]
+    return str(session_id) if session_id is not None else None
+
+
+class CallRecord:
+    """一次异步呼叫的当前状态，每次变化递增版本号"""
+
+    __slots__ = ('call_id', 'building_id', 'group_id', 'request', 'state', 'session_id',
+                 'allocated_lift_deck', 'eta', 'cancel_reason', 'modified_destination', 'subgroup_id',
+                 'error', 'response', 'version', 'created_at', 'updated_at', 'history')
+
+    def __init__(self, call_id: str, building_id: str, group_id: str, request: Dict[str, Any]):
+        now = time.time()
+        self.call_id = call_id
+        self.building_id = building_id
+        self.group_id = group_id
+        self.request = request
+        self.state = CALL_SUBMITTED
+        self.session_id: Optional[str] = None
+        self.allocated_lift_deck: Optional[List[Any]] = None
+        self.eta: Optional[Any] = None
+        self.cancel_reason: Optional[str] = None
+        self.modified_destination: Optional[int] = None
+        self.subgroup_id: Optional[int] = None
+        self.error: Optional[str] = None
+        self.response: Optional[Dict[str, Any]] = None
+        self.version = 1
+        self.created_at = now
+        self.updated_at = now
+        self.history: List[Dict[str, Any]] = [{'state': CALL_SUBMITTED, 'at': now}]
+
+    @property
+    def terminal(self) -> bool:
+        return self.state in TERMINAL_CALL_STATES
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'call_id': self.call_id,
+            'building_id': self.building_id,
+            'group_id': self.group_id,
+            'state': self.state,
+            'terminal': self.terminal,
+            'session_id': self.session_id,
+            'allocated_lift_deck': self.allocated_lift_deck,
+            'eta': self.eta,
+            'cancel_reason': self.cancel_reason,
+            'modified_destination': self.modified_destination,
+            'error': self.error,
+            'version': self.version,
+            'created_at': self.created_at,
+            'updated_at': self.updated_at,
+            'history': list(self.history),
+            'request': self.request
+        }
+
+
+class CallTracker:
+    """按 call_id 保存异步呼叫，按 session_id 接收 monitor-call-state 事件；
+    结束的呼叫保留 retention 秒，记录总数超过 max_records 时先淘汰最早结束的"""
+
+    def __init__(self, retention: float = DEFAULT_RETENTION, max_records: int = DEFAULT_MAX_RECORDS):
+        self.retention = retention
+        self.max_records = max_records
+        self._records: 'OrderedDict[str, CallRecord]' = OrderedDict()
+        self._sessions: Dict[str, CallRecord] = {}
+        self._live: set = set()      # 未结束的 call_id
+        self._unbound: set = set()   # 尚未取得会话的 call_id
+        # 会话绑定之前到达的状态事件，绑定时补放
+        self._orphans: 'OrderedDict[str, List[dict]]' = OrderedDict()
+        self._waiters: Dict[str, List[asyncio.Future]] = {}
+        self._ids = itertools.count(1)
+        self._prefix = f"{int(time.time() * 1000):x}"
+        self.applied = 0
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def create(self, building_id: str, group_id: Optional[str], request: Dict[str, Any]) -> CallRecord:
+        self._prune()
+        call_id = f"call-{self._prefix}-{next(self._ids)}"
+        record = self._records[call_id] = CallRecord(call_id, building_id, str(group_id or '1'), request)
+        self._live.add(call_id)
+        self._unbound.add(call_id)
+        return record
+
+    def get(self, call_id: str) -> Optional[CallRecord]:
+        return self._records.get(call_id)
+
+    def active(self) -> int:
+        """未结束的呼叫数"""
+        return len(self._live)
+
+    def bind_session(self, record: CallRecord, session_id: Any, response: Optional[Dict[str, Any]] = None):
+        """呼叫取得会话：进入 accepted，并补放已先到达的状态事件"""
+        session_id = str(session_id)
+        record.session_id = session_id
+        record.response = response
+        self._sessions[session_id] = record
+        self._unbound.discard(record.call_id)
+        if record.state == CALL_SUBMITTED:
+            self._transition(record, CALL_ACCEPTED)
+        for event in self._orphans.pop(session_id, []):
+            self.apply(event)
+
+    def finish(self, record: CallRecord, state: str, error: Optional[str] = None,
+               response: Optional[Dict[str, Any]] = None):
+        """本地结束一次呼叫（rejected / failed）"""
+        if record.terminal:
+            return
+        record.error = error
+        record.response = response
+        self._transition(record, state)
+
+    def apply(self, event: dict) -> Optional[CallRecord]:
+        """应用一条 monitor-call-state 事件；不属于已跟踪呼叫时返回None"""
+        payload = event.get('data')
+        if not isinstance(payload, dict):
+            payload = event.get('payload')
+        if not isinstance(payload, dict):
+            return None
+        session_id = session_id_of(event, payload)
+        state = call_state_of(event, payload)
+        if session_id is None or state is None:
+            return None
+
+        record = self._sessions.get(session_id)
+        if record is None:
+            if self._unbound:
+                # 可能是尚未取得会话的呼叫的事件，暂存等待绑定
+                events = self._orphans.setdefault(session_id, [])
+                events.append(event)
+                del events[:-MAX_ORPHAN_EVENTS_PER_SESSION]
+                while len(self._orphans) > MAX_ORPHAN_EVENTS:
+                    self._orphans.popitem(last=False)
+            return None
+        if record.terminal:
+            return record
+
+        for field in _EVENT_FIELDS:
+            if field in payload:
+                setattr(record, field, payload[field])
+        self.applied += 1
+        self._transition(record, state)
+        return record
+
+    def _transition(self, record: CallRecord, state: str):
+        now = time.time()
+        if state != record.state:
+            record.history.append({'state': state, 'at': now})
+        record.state = state
+        record.version += 1
+        record.updated_at = now
+        if record.terminal:
+            self._live.discard(record.call_id)
+            self._unbound.discard(record.call_id)
+            if record.session_id is not None:
+                self._sessions.pop(record.session_id, None)
+        waiters = self._waiters.pop(record.call_id, None)
+        if waiters:
+            for waiter in waiters:
+                if not waiter.done():
+                    waiter.set_result(record)
+
+    async def wait_for_change(self, call_id: str, since_version: int = 0,
+                              timeout: float = 30.0) -> Optional[CallRecord]:
+        """长轮询：记录版本大于 since_version 或已结束时立即返回，否则等待下一次变化或超时"""
+        record = self._records.get(call_id)
+        if record is None or record.version > since_version or record.terminal:
+            return record
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.setdefault(call_id, []).append(waiter)
+        try:
+            await asyncio.wait_for(waiter, timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            waiters = self._waiters.get(call_id)
+            if waiters and waiter in waiters:
+                waiters.remove(waiter)
+                if not waiters:
+                    del self._waiters[call_id]
+        return self._records.get(call_id)
+
+    def _prune(self):
+        now = time.time()
+        expired = [call_id for call_id, record in self._records.items()
+                   if record.terminal and now - record.updated_at > self.retention]
+        for call_id in expired:
+            del self._records[call_id]
+        if len(self._records) >= self.max_records:
+            finished = [call_id for call_id, record in self._records.items() if record.terminal]
+            for call_id in finished[:len(self._records) - self.max_records + 1]:
+                del self._records[call_id]
+
+    def stats(self) -> Dict[str, Any]:
+        states: Dict[str, int] = {}
+        for record in self._records.values():
+            states[record.state] = states.get(record.state, 0) + 1
+        return {'records': len(self._records), 'states': states, 'applied': self.applied}
+
+    def close(self, reason: str = 'driver closed'):
+        """驱动关闭：未结束的呼叫标记为 failed 并唤醒等待者"""
+        for record in list(self._records.values()):
+            if not record.terminal:
+                record.error = reason
+                self._transition(record, CALL_FAILED)
+        self._orphans.clear()
@@ -0,0 +1,144 @@
+"""
+呼叫预校验
+由缓存的 common-api config（拓扑）和 actions 响应编译出规则，在发送 lift-call-api-v2 之前
+本地判断服务器必然拒绝的呼叫：未知/禁用动作、延时超限、群组外的 allowed_lifts、同楼层、
+最低层向下/最高层向上的 landing call。被拒绝的呼叫不占用 WebSocket 往返和上游限流额度，
+返回与服务器相同形状的结果：201 状态确认合并 success=false 的呼叫事件（error / cancel_reason）
+"""
+
+from dataclasses import dataclass
+from typing import Any, Dict, FrozenSet, List, Optional
+
+from building_topology import BuildingTopology, ERROR_SAME_FLOOR
+from message_builders import utc_timestamp
+
+# 预校验模式：enforce 本地拒绝；strict 仍然发送（一致性测试用），响应中附带预测结果；off 不校验
+VALIDATION_MODES = ('enforce', 'strict', 'off')
+
+MAX_CALL_DELAY = 30
+
+# actions 响应没有给出方向时使用的默认 landing call 方向
+DEFAULT_ACTION_DIRECTIONS = {2001: 'up', 2002: 'down'}
+
+# 服务器以 cancel_reason 返回的错误，本地拒绝时同样放在 cancelReason 中
+CANCEL_REASON_CODES = frozenset({ERROR_SAME_FLOOR, 'INVALID_DIRECTION'})
+
+
+@dataclass(frozen=True)
+class CallRejection:
+    """预测的拒绝结果：code 为错误枚举，message 为服务器返回的错误文本"""
+    code: str
+    message: str
+
+    def to_dict(self, sent: bool = False) -> Dict[str, Any]:
+        """附在响应 prevalidation 字段中的预测结果，sent 表示呼叫是否仍发送到了服务器"""
+        return {'code': self.code, 'error': self.message, 'sent': sent}
+
+
+class CallValidator:
+    """由一个建筑群组的 config + actions 编译出的只读规则集"""
+
+    __slots__ = ('building_id', 'group_id', 'topology', 'known_actions', 'disabled_actions',
+                 'action_directions', 'group_lifts', 'lowest_floor', 'highest_floor')
+
+    def __init__(self, building_id: str, group_id: str,
+                 topology: Optional[BuildingTopology] = None,
+                 actions_response: Optional[Dict[str, Any]] = None):
+        self.building_id = building_id
+        self.group_id = group_id
+        self.topology = topology
+
+        known, disabled, directions = set(), set(), dict(DEFAULT_ACTION_DIRECTIONS)
+        for entry in self._call_types(actions_response):
+            action_id = entry.get('action_id', entry.get('id'))
+            if action_id is None:
+                continue
+            action_id = int(action_id)
+            known.add(action_id)
+            if entry.get('enabled') is False or entry.get('disabled') is True:
+                disabled.add(action_id)
+            direction = str(entry.get('direction', '')).lower()
+            if direction in ('up', 'down'):
+                directions[action_id] = direction
+        # actions 未知时不做动作相关的判断，避免误拒
+        self.known_actions: Optional[FrozenSet[int]] = frozenset(known) if known else None
+        self.disabled_actions: FrozenSet[int] = frozenset(disabled)
+        self.action_directions: Dict[int, str] = directions
+
+        lifts = topology.groups.get(str(group_id)) if topology is not None else None
+        self.group_lifts: Optional[FrozenSet[int]] = frozenset(lifts) if lifts else None
+        floors = list(topology.floor_areas) if topology is not None else []
+        self.lowest_floor = min(floors) if floors else None
+        self.highest_floor = max(floors) if floors else None
+
+    @staticmethod
+    def _call_types(actions_response: Optional[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        if not actions_response:
+            return []
+        data = actions_response.get('data', actions_response) or {}
+        entries = data.get('call_types') or data.get('actions') or []
+        return [entry for entry in entries if isinstance(entry, dict)]
+
+    def check(self, area: int, action: int, destination: Optional[int] = None,
+              delay: Optional[int] = None, allowed_lifts: Optional[List[int]] = None) -> Optional[CallRejection]:
+        """合法返回None，否则返回预测的拒绝结果"""
+        if delay is not None and not (0 <= delay <= MAX_CALL_DELAY):
+            return CallRejection('INVALID_DELAY', f'Invalid json payload: delay must be between 0 and {MAX_CALL_DELAY} seconds')
+
+        if self.known_actions is not None:
+            if action not in self.known_actions:
+                return CallRejection('UNKNOWN_CALL_ACTION',
+                                     f'Ignoring call, unknown call action: {action or "UNDEFINED"}')
+            if action in self.disabled_actions:
+                return CallRejection('DISABLED_CALL_ACTION', f'Ignoring call, disabled call action: {action}')
+
+        if allowed_lifts and self.group_lifts is not None:
+            outside = [lift for lift in allowed_lifts if lift not in self.group_lifts]
+            if outside:
+                return CallRejection('INVALID_ALLOWED_LIFTS',
+                                     f'Ignoring call, allowed lifts not in group {self.group_id}: {outside}')
+
+        if self.topology is None:
+            return None
+        source_floor = self.topology.floor_of(area)
+        if destination is not None:
+            if source_floor is not None and source_floor == self.topology.floor_of(destination):
+                return CallRejection(ERROR_SAME_FLOOR, ERROR_SAME_FLOOR)
+            return None
+
+        # landing call：最低层不能向下，最高层不能向上
+        direction = self.action_directions.get(action)
+        if (direction == 'down' and source_floor is not None and source_floor == self.lowest_floor) or \
+                (direction == 'up' and source_floor is not None and source_floor == self.highest_floor):
+            return CallRejection('INVALID_DIRECTION', 'INVALID_DIRECTION')
+        return None
+
+
+def rejection_response(rejection: CallRejection, building_id: str, group_id: Optional[str],
+                       request_id: int) -> dict:
+    """本地拒绝的响应：与服务器拒绝时相同，状态确认（statusCode 201）合并失败的呼叫事件，
+    错误文本在 data.error，取消类错误码在 data.cancel_reason；prevalidation 标明是本地预测"""
+    now = utc_timestamp()
+    ack = {'statusCode': 201, 'requestId': request_id, 'data': {'time': now}}
+    event = {
+        'callType': 'action',
+        'buildingId': building_id,
+        'groupId': group_id or '1',
+        'data': {
+            'request_id': request_id,
+            'success': False,
+            'error': rejection.message,
+            'time': now
+        }
+    }
+    if rejection.code in CANCEL_REASON_CODES:
+        event['data']['cancel_reason'] = rejection.code
+    response = dict(ack, **event)
+    response['prevalidation'] = rejection.to_dict()
+    return response
+
+
+def is_local_rejection(response: dict) -> bool:
+    """响应是否为本地预校验拒绝（未发送到服务器）"""
+    prevalidation = response.get('prevalidation')
+    return isinstance(prevalidation, dict) and not prevalidation.get('sent', True)
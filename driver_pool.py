@@ -0,0 +1,218 @@
+"""
+电梯驱动连接池
+在应用生命周期内复用已认证、已连接的驱动实例，避免每个请求重复读取配置、获取Token和建立WebSocket连接。
+多建筑场景下按 (建筑, 群组) 将路由分片到若干上游WebSocket连接：
+每个连接承载的路由数和连接总数可配置，连接按需建立、空闲超时后关闭，
+每个连接有独立的监听器和事件总线，热点建筑的事件洪峰不会拖慢其他连接上的呼叫
+"""
+
+import asyncio
+import logging
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import yaml
+
+from drivers import ElevatorDriver, ElevatorDriverFactory
+
+logger = logging.getLogger(__name__)
+
+# 未指定建筑时使用的默认分组键
+DEFAULT_BUILDING_KEY = '*'
+DEFAULT_GROUP_KEY = '1'
+
+# 默认分片限制，可在 config.yaml 的 connection_pool 段覆盖
+DEFAULT_POOL_LIMITS: Dict[str, Any] = {
+    'max_connections': 4,              # 每种电梯类型最多的上游连接数
+    'max_routes_per_connection': 8,    # 每个连接承载的 (建筑, 群组) 数，超出后开新连接
+    'idle_timeout': 300.0,             # 连接空闲多久后关闭（秒），0 表示不关闭
+}
+
+
+class _Shard:
+    """一个上游连接及其承载的路由"""
+
+    def __init__(self, shard_id: int, driver: ElevatorDriver):
+        self.shard_id = shard_id
+        self.driver = driver
+        self.routes: set = set()
+        self.last_used = time.monotonic()
+
+    def touch(self):
+        self.last_used = time.monotonic()
+
+    def is_busy(self) -> bool:
+        has_active_work = getattr(self.driver, 'has_active_work', None)
+        return bool(has_active_work and has_active_work())
+
+    async def release_idle_tracking(self, idle: float):
+        """释放空闲期间无人读取的状态跟踪租约，使其不再把连接保持为忙碌"""
+        release = getattr(self.driver, 'release_idle_lift_state', None)
+        if release is not None:
+            try:
+                await release(idle)
+            except Exception as e:
+                logger.warning(f"Failed to release idle lift state tracking on shard #{self.shard_id}: {e}")
+
+
+class ElevatorDriverPool:
+    """按 (电梯类型, 建筑ID, 群组ID) 路由到分片连接的共享连接池"""
+
+    def __init__(self, config_path: str = 'config.yaml', **limits):
+        self.config_path = config_path
+        # 配置只在连接池创建时读取一次
+        self._settings = ElevatorDriverFactory.load_driver_settings(config_path)
+        options = dict(DEFAULT_POOL_LIMITS)
+        options.update(self._load_pool_limits(config_path))
+        options.update(limits)
+        self.max_connections = max(1, int(options['max_connections']))
+        self.max_routes_per_connection = max(1, int(options['max_routes_per_connection']))
+        self.idle_timeout = float(options['idle_timeout'])
+
+        self._shards: Dict[str, List[_Shard]] = {}
+        self._routes: Dict[Tuple[str, str, str], _Shard] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._shard_ids = 0
+        self._reaper_task: Optional[asyncio.Task] = None
+        self._closed = False
+
+    @staticmethod
+    def _load_pool_limits(config_path: str) -> Dict[str, Any]:
+        try:
+            with open(config_path, 'r') as f:
+                config = yaml.safe_load(f) or {}
+            return config.get('connection_pool') or {}
+        except Exception as e:
+            logger.error(f"Failed to load connection pool limits: {e}")
+            return {}
+
+    @property
+    def available_types(self) -> List[str]:
+        """配置中可用的电梯类型"""
+        return list(self._settings.keys())
+
+    def pooled_count(self, elevator_type: str) -> int:
+        """某电梯类型当前打开的上游连接数量"""
+        return len(self._shards.get(elevator_type.lower(), []))
+
+    def stats(self) -> Dict[str, List[Dict[str, Any]]]:
+        """各连接承载的路由和空闲时长"""
+        now = time.monotonic()
+        return {
+            elevator_type: [
+                {
+                    'shard_id': shard.shard_id,
+                    'routes': sorted(f"{building}/{group}" for building, group in shard.routes),
+                    'idle_seconds': round(now - shard.last_used, 3)
+                }
+                for shard in shards
+            ]
+            for elevator_type, shards in self._shards.items()
+        }
+
+    def drivers(self) -> List[ElevatorDriver]:
+        """当前打开的所有驱动"""
+        return [shard.driver for shards in self._shards.values() for shard in shards]
+
+    async def get(self, elevator_type: str, building_id: Optional[str] = None,
+                  group_id: Optional[str] = None) -> ElevatorDriver:
+        """获取承载该建筑/群组的共享驱动，首次使用时分配分片并按需建立连接"""
+        if self._closed:
+            raise RuntimeError("Driver pool is closed")
+
+        elevator_type = elevator_type.lower()
+        if elevator_type not in self._settings:
+            raise KeyError(elevator_type)
+
+        route = (building_id or DEFAULT_BUILDING_KEY, str(group_id or DEFAULT_GROUP_KEY))
+        key = (elevator_type,) + route
+        shard = self._routes.get(key)
+        if shard is not None:
+            shard.touch()
+            return shard.driver
+
+        lock = self._locks.setdefault(elevator_type, asyncio.Lock())
+        async with lock:
+            # 等待锁期间可能已有其他请求完成分配
+            shard = self._routes.get(key)
+            if shard is None:
+                shard = await self._assign(elevator_type, route)
+                self._routes[key] = shard
+            shard.touch()
+
+        self._ensure_reaper()
+        return shard.driver
+
+    async def _assign(self, elevator_type: str, route: Tuple[str, str]) -> _Shard:
+        """把路由分配给负载最低且未满的连接，全部已满且未达连接上限时新建连接"""
+        shards = self._shards.setdefault(elevator_type, [])
+        candidates = [shard for shard in shards if len(shard.routes) < self.max_routes_per_connection]
+        if not candidates and len(shards) >= self.max_connections:
+            # 已达连接上限，超额分配到负载最低的连接
+            candidates = shards
+
+        if candidates:
+            shard = min(candidates, key=lambda item: len(item.routes))
+        else:
+            shard = await self._open_shard(elevator_type)
+            shards.append(shard)
+
+        shard.routes.add(route)
+        logger.info(f"Route {route[0]}/{route[1]} assigned to {elevator_type} connection #{shard.shard_id}")
+        return shard
+
+    async def _open_shard(self, elevator_type: str) -> _Shard:
+        driver = ElevatorDriverFactory.create_driver(elevator_type, **self._settings[elevator_type])
+        result = await driver.initialize()
+        if not result.get('success'):
+            await driver.close()
+            raise ConnectionError(result.get('error', 'Driver initialization failed'))
+
+        self._shard_ids += 1
+        logger.info(f"Pooled connection opened: type={elevator_type}, shard={self._shard_ids}")
+        return _Shard(self._shard_ids, driver)
+
+    def _ensure_reaper(self):
+        if self.idle_timeout > 0 and (self._reaper_task is None or self._reaper_task.done()):
+            self._reaper_task = asyncio.create_task(self._reap_idle())
+
+    async def _reap_idle(self):
+        """定期关闭空闲且没有进行中工作的连接；空闲连接上无人读取的状态跟踪先释放，不算进行中的工作"""
+        interval = max(min(self.idle_timeout / 2, 30.0), 0.05)
+        while not self._closed and any(self._shards.values()):
+            await asyncio.sleep(interval)
+            now = time.monotonic()
+            for elevator_type, shards in list(self._shards.items()):
+                for shard in list(shards):
+                    if now - shard.last_used < self.idle_timeout:
+                        continue
+                    await shard.release_idle_tracking(self.idle_timeout)
+                    if shard.is_busy():
+                        continue
+                    async with self._locks.setdefault(elevator_type, asyncio.Lock()):
+                        # 等待锁期间可能被重新使用
+                        if shard not in shards or time.monotonic() - shard.last_used < self.idle_timeout:
+                            continue
+                        shards.remove(shard)
+                        for route in shard.routes:
+                            self._routes.pop((elevator_type,) + route, None)
+                    await self._close_shard(elevator_type, shard)
+
+    async def _close_shard(self, elevator_type: str, shard: _Shard):
+        try:
+            await shard.driver.close()
+            logger.info(f"Pooled connection closed: type={elevator_type}, shard={shard.shard_id}")
+        except Exception as e:
+            logger.error(f"Failed to close pooled connection {elevator_type}#{shard.shard_id}: {e}")
+
+    async def close_all(self):
+        """关闭所有池化的驱动连接"""
+        self._closed = True
+        if self._reaper_task is not None and not self._reaper_task.done():
+            self._reaper_task.cancel()
+        shards = [(elevator_type, shard) for elevator_type, items in self._shards.items() for shard in items]
+        self._shards.clear()
+        self._routes.clear()
+
+        for elevator_type, shard in shards:
+            await self._close_shard(elevator_type, shard)
@@ -1,18 +1,32 @@
 from abc import ABC, abstractmethod
 import requests
-import aiohttp
 import websockets
 import asyncio
-import json
 import uuid
 import yaml
 import time
 from typing import Dict, Optional, List, Any, Union
 from pydantic import BaseModel, Field
-from datetime import datetime, timedelta, timezone
+from datetime import datetime, timezone
 from tenacity import retry, stop_after_attempt, wait_exponential
 import logging
+import random
 from collections import deque
+from evidence_writer import get_evidence_writer
+import json_codec
+from token_manager import get_token_manager
+from subscription_leases import SubscriptionLeaseManager
+from frame_sender import FrameSender
+from message_builders import MessageBuilder
+from frame_dispatch import Frame, FrameDispatcher, frame_correlation_id, parse_frame, ping_key
+from building_cache import BuildingDataCache
+from building_topology import BuildingTopology
+from call_validation import VALIDATION_MODES, CallValidator, is_local_rejection, rejection_response
+from lift_state import LIFT_STATE_EVENT_TYPES, LIFT_STATE_SUBTOPICS, LiftStateStore
+from frame_passthrough import FramePassthrough
+from call_lifecycle import (CALL_FAILED, CALL_REJECTED, CALL_STATE_EVENT_TYPE, CALL_STATE_SUBTOPICS,
+                            CallRecord, CallTracker)
+from event_bus import EventBus, EventView, EventFilter, CHANNEL_GENERAL
 
 # 导入Token验证信息类
 try:
@@ -50,10 +64,27 @@ def log_evidence(phase: str, data: Dict[str, Any]):
     }
     EVIDENCE_BUFFER.append(evidence)
     
-    # 写入JSONL文件
+    # 序列化为字节后交给后台写入器批量写入JSONL文件
     try:
-        with open('kone_validation.log', 'a', encoding='utf-8') as f:
-            f.write(json.dumps(evidence, ensure_ascii=False) + '\n')
+        get_evidence_writer().write(json_codec.dumps_bytes(evidence, default=str) + b'\n')
+    except Exception as e:
+        logger.error(f"Failed to write evidence: {e}")
+
+def log_evidence_frame(frame: Frame):
+    """记录收到的事件帧 - 直接拼接原始帧，不解码正文也不重新序列化；缓冲区中保存原始帧文本"""
+    ts = datetime.now(timezone.utc).isoformat()
+    frame_type = frame.header.get('type', 'unknown')
+    EVIDENCE_BUFFER.append({'ts': ts, 'phase': 'event', 'type': frame_type, 'frame': frame.raw})
+    
+    try:
+        raw = frame.raw.encode('utf-8') if isinstance(frame.raw, str) else bytes(frame.raw)
+        if b'\n' in raw:
+            # 多行帧无法直接作为一行JSONL写入
+            raw = json_codec.dumps_bytes(frame.data, default=str)
+        get_evidence_writer().write(
+            b'{"ts":"' + ts.encode('ascii') + b'","phase":"event","type":'
+            + json_codec.dumps_bytes(frame_type, default=str) + b',"data":' + raw + b'}\n'
+        )
     except Exception as e:
         logger.error(f"Failed to write evidence: {e}")
 
@@ -110,6 +141,10 @@ class ElevatorCallRequest(BaseModel):
     group_size: Optional[int] = Field(1, description="Group size")
     allowed_lifts: Optional[List[int]] = Field(None, description="Allowed lifts")
 
+class ElevatorBatchCallRequest(BaseModel):
+    """批量呼叫请求，条数上限由 api.max_batch_calls 配置"""
+    calls: List[ElevatorCallRequest] = Field(..., min_length=1, description="Calls to dispatch")
+
 class ElevatorDriver(ABC):
     """电梯驱动抽象接口 - 严格遵循 WebSocket API v2"""
     
@@ -165,7 +200,11 @@ class KoneDriverV2(ElevatorDriver):
     
     def __init__(self, client_id: str, client_secret: str, 
                  token_endpoint: str = "https://dev.kone.com/api/v2/oauth2/token",
-                 ws_endpoint: str = "wss://dev.kone.com/stream-v2"):
+                 ws_endpoint: str = "wss://dev.kone.com/stream-v2",
+                 queue_limits: Optional[Dict[str, Dict[str, Any]]] = None,
+                 auto_reconnect: bool = True, reconnect_base_delay: float = 0.5,
+                 reconnect_max_delay: float = 30.0, pending_policy: str = 'fail',
+                 config_cache_ttl: float = 300.0, call_validation: str = 'enforce'):
         self.client_id = client_id
         self.client_secret = client_secret
         self.token_endpoint = token_endpoint
@@ -174,16 +213,85 @@ class KoneDriverV2(ElevatorDriver):
         self.token_expiry = None
         self.session_id = None
         self.websocket = None
-        self.event_queue = asyncio.Queue()
-        self.action_event_queue = asyncio.Queue()  # 专门用于action事件
-        self.subscription_event_queue = asyncio.Queue()  # 专门用于订阅事件
+        # 统一事件总线：action / subscription / general 三个有界通道
+        # queue_limits 示例: {'subscription': {'maxsize': 5000, 'policy': 'coalesce'}}
+        self.event_bus = EventBus(limits=queue_limits)
+        # 帧分类表，可通过 dispatcher.route() 扩展
+        self.dispatcher = FrameDispatcher()
         self.pending_requests = {}
+        # 呼叫事件关联表：request_id -> 等待该呼叫事件的Future（会话之后的状态事件由 call_tracker 按 session_id 跟踪）
+        self.call_waiters: Dict[str, asyncio.Future] = {}
         self.auth_token_info_list = []  # 存储Token验证信息
+        self._recorded_token = None  # 已记录验证信息的Token
+        
+        # 进程内共享的Token管理器
+        self.token_manager = get_token_manager(
+            client_id, client_secret, token_endpoint,
+            evidence_logger=log_evidence
+        )
+        self._token_acquired = True
         
         # WebSocket连接管理
         self.is_listening = False
         self.connection_lock = asyncio.Lock()
         
+        # 断线自动重连：抖动指数退避，重连后重放订阅
+        # pending_policy: 'fail' 断线时立即让进行中的请求失败；
+        # 'retry' 重连后重发 common-api / site-monitoring 请求（呼叫类请求不重发，避免重复呼梯）
+        if pending_policy not in ('fail', 'retry'):
+            raise ValueError("pending_policy must be 'fail' or 'retry'")
+        self.auto_reconnect = auto_reconnect
+        self.reconnect_base_delay = reconnect_base_delay
+        self.reconnect_max_delay = reconnect_max_delay
+        self.pending_policy = pending_policy
+        self.active_subscriptions: Dict[str, Dict[str, Any]] = {}  # sub -> 订阅参数
+        self._pending_messages: Dict[str, dict] = {}  # request_id -> 已发送的消息
+        self._closing = False
+        self._reconnect_task: Optional[asyncio.Task] = None
+        self._disconnected_at: Optional[float] = None
+        self.reconnect_count = 0
+        self.recovery_times = deque(maxlen=100)  # 每次恢复耗时（秒）
+        
+        # 建筑配置/动作缓存，内容变化时发布 building-data-changed 事件
+        self.building_cache = BuildingDataCache(ttl=config_cache_ttl)
+        self.building_cache.add_listener(self._on_building_data_changed)
+        # 由缓存配置编译的拓扑索引: (建筑, 群组) -> (内容哈希, 索引)
+        self._topologies: Dict[tuple, tuple] = {}
+        
+        # 呼叫预校验：enforce 本地拒绝必然失败的呼叫；strict 照常发送并在响应中附带预测；off 关闭。
+        # 规则只由建筑缓存中已有的 config/actions 编译，呼叫本身不会触发额外的上游请求；
+        # 缓存为空的建筑只做不依赖配置的检查，需要首个呼叫就完整校验时先 await get_call_validator() 预热
+        if call_validation not in VALIDATION_MODES:
+            raise ValueError(f"call_validation must be one of {VALIDATION_MODES}")
+        self.call_validation = call_validation
+        # (建筑, 群组) -> ((config哈希, actions哈希), 规则集)
+        self._call_validators: Dict[tuple, tuple] = {}
+        self.prevalidation_rejects = 0
+        
+        # 预序列化消息构建器，request_id 由进程内单调生成器分配
+        self.messages = MessageBuilder()
+        
+        # 每个连接唯一的写任务，按优先级通道发送
+        self.sender: Optional[FrameSender] = None
+        
+        # 订阅租约：合并主题并在300秒上限到期前自动续订
+        self.subscription_leases = SubscriptionLeaseManager(self)
+        
+        # 电梯实时状态：由监控事件持续更新，模式/位置/门状态直接读内存
+        self.lift_state = LiftStateStore()
+        self._lift_state_leases: Dict[tuple, str] = {}  # (建筑, 群组) -> 租约ID
+        # (建筑, 群组) -> 最近一次读取状态的时间（monotonic）；订阅发出前即登记，监听器只为这些群组应用状态帧
+        self._lift_state_reads: Dict[tuple, float] = {}
+        
+        # 原始帧直通：监控帧原样交给本地扇出，不重新序列化
+        self.passthrough = FramePassthrough()
+        
+        # 异步呼叫生命周期：由 monitor-call-state 事件推进，提交后不再占用调用方
+        self.call_tracker = CallTracker()
+        self.call_lifetime = 300.0  # 已受理的呼叫最长跟踪时长（秒）
+        self._call_state_leases: Dict[tuple, list] = {}  # (建筑, 群组) -> [租约ID, 跟踪中的呼叫数]
+        self._call_tasks: set = set()
+        
     def get_auth_token_info(self) -> List[AuthTokenInfo]:
         """获取Token验证信息列表"""
         return self.auth_token_info_list.copy()
@@ -216,154 +324,72 @@ class KoneDriverV2(ElevatorDriver):
         return auth_info
         
     async def _get_access_token(self) -> str:
-        """获取访问令牌"""
-        if self.access_token and self.token_expiry and datetime.now() < self.token_expiry - timedelta(minutes=5):
-            # Token仍然有效 - 记录重用信息
-            requested_scope = 'application/inventory callgiving/*'
+        """获取访问令牌 - 由共享Token管理器提供，命中内存时无需任何I/O"""
+        requested_scope = self.token_manager.scope
+        try:
+            token = await self.token_manager.get_token()
+        except Exception as e:
+            # Token请求失败也要记录
             auth_info = AuthTokenInfo(
                 requested_scope=requested_scope,
-                token_scopes=requested_scope,  # 假设缓存token有正确scope
-                is_match=True,
-                error_message=None,
-                token_type="Bearer",
-                expires_in=int((self.token_expiry - datetime.now()).total_seconds()),
+                token_scopes="",
+                is_match=False,
+                error_message=str(e),
                 timestamp=datetime.now().isoformat()
             )
             self.auth_token_info_list.append(auth_info)
-            return self.access_token
-            
-        # 尝试从配置文件加载缓存的token
-        cached_token, cached_expiry = self._load_cached_token()
-        if cached_token and cached_expiry and datetime.now() < cached_expiry - timedelta(minutes=5):
-            self.access_token = cached_token
-            self.token_expiry = cached_expiry
+            raise
+        
+        self.access_token = token
+        self.token_expiry = self.token_manager.token_expiry
+        
+        # 每个Token只记录一次验证信息
+        if token != self._recorded_token:
+            self._recorded_token = token
+            self._record_token_info(requested_scope)
+        
+        return token
+    
+    def _record_token_info(self, requested_scope: str):
+        """记录当前Token的验证信息"""
+        if self.token_manager.token_source == 'oauth':
+            # 新申请的Token - 验证scope
+            auth_info = self._validate_token_scope(requested_scope, self.token_manager.last_token_response)
             
-            # 记录缓存token使用信息
-            requested_scope = 'application/inventory callgiving/*'
+            if not auth_info.is_match:
+                log_evidence('auth_warning', {
+                    'message': 'Token scope mismatch',
+                    'requested_scope': requested_scope,
+                    'token_scopes': auth_info.token_scopes,
+                    'error': auth_info.error_message
+                })
+        else:
+            # 缓存Token - 假设有正确scope
             auth_info = AuthTokenInfo(
                 requested_scope=requested_scope,
-                token_scopes=requested_scope,  # 假设缓存token有正确scope
+                token_scopes=requested_scope,
                 is_match=True,
                 error_message=None,
                 token_type="Bearer",
-                expires_in=int((cached_expiry - datetime.now()).total_seconds()),
+                expires_in=int((self.token_expiry - datetime.now()).total_seconds()),
                 timestamp=datetime.now().isoformat()
             )
             self.auth_token_info_list.append(auth_info)
-            return cached_token
-            
-        # 请求新token
-        import base64
-        credentials = f"{self.client_id}:{self.client_secret}"
-        encoded = base64.b64encode(credentials.encode()).decode()
-        
-        headers = {
-            'Authorization': f'Basic {encoded}',
-            'Content-Type': 'application/x-www-form-urlencoded'
-        }
-        
-        requested_scope = 'application/inventory callgiving/*'
-        data = {
-            'grant_type': 'client_credentials',
-            'scope': requested_scope
-        }
-        
-        log_evidence('request', {
-            'method': 'POST',
-            'url': self.token_endpoint,
-            'headers': {k: v for k, v in headers.items() if 'Authorization' not in k},
-            'data': data
-        })
-        
-        async with aiohttp.ClientSession() as session:
-            async with session.post(self.token_endpoint, data=data, headers=headers) as response:
-                response_data = await response.json()
-                
-                log_evidence('response', {
-                    'status': response.status,
-                    'data': {k: v for k, v in response_data.items() if 'access_token' not in k}
-                })
-                
-                if response.status == 200:
-                    # 验证Token scope
-                    auth_info = self._validate_token_scope(requested_scope, response_data)
-                    
-                    self.access_token = response_data['access_token']
-                    expires_in = response_data.get('expires_in', 3600)
-                    self.token_expiry = datetime.now() + timedelta(seconds=expires_in)
-                    
-                    # 保存token到配置
-                    self._save_token_to_config(self.access_token, self.token_expiry)
-                    
-                    # 记录验证结果到日志
-                    if not auth_info.is_match:
-                        log_evidence('auth_warning', {
-                            'message': 'Token scope mismatch',
-                            'requested_scope': requested_scope,
-                            'token_scopes': auth_info.token_scopes,
-                            'error': auth_info.error_message
-                        })
-                    
-                    return self.access_token
-                else:
-                    # Token请求失败也要记录
-                    error_message = f"Token request failed: {response.status}"
-                    auth_info = AuthTokenInfo(
-                        requested_scope=requested_scope,
-                        token_scopes="",
-                        is_match=False,
-                        error_message=error_message,
-                        timestamp=datetime.now().isoformat()
-                    )
-                    self.auth_token_info_list.append(auth_info)
-                    raise Exception(error_message)
     
     def _load_cached_token(self) -> tuple[Optional[str], Optional[datetime]]:
         """从配置文件加载缓存的token"""
-        try:
-            with open('config.yaml', 'r') as f:
-                config = yaml.safe_load(f)
-            
-            cached = config.get('kone', {}).get('cached_token', {})
-            token = cached.get('access_token')
-            expires_str = cached.get('expires_at')
-            
-            if token and expires_str:
-                expires_at = datetime.fromisoformat(expires_str.replace('Z', '+00:00'))
-                return token, expires_at.replace(tzinfo=None)
-                
-        except Exception as e:
-            logger.error(f"Failed to load cached token: {e}")
-        
-        return None, None
-    
-    def _save_token_to_config(self, access_token: str, expires_at: datetime):
-        """保存token到配置文件"""
-        try:
-            with open('config.yaml', 'r') as f:
-                config = yaml.safe_load(f)
-            
-            if 'kone' not in config:
-                config['kone'] = {}
-            
-            # 脱敏处理 - 仅保存必要信息
-            config['kone']['cached_token'] = {
-                'access_token': access_token,
-                'expires_at': expires_at.isoformat(),
-                'token_type': 'Bearer'
-            }
-            
-            with open('config.yaml', 'w') as f:
-                yaml.safe_dump(config, f, default_flow_style=False, indent=2)
-                
-        except Exception as e:
-            logger.error(f"Failed to save token: {e}")
+        return self.token_manager.load_cached_token()
     
     async def _ensure_connection(self):
         """确保WebSocket连接"""
         async with self.connection_lock:
             if self.websocket and not self.websocket.closed and self.is_listening:
                 return
+            self._closing = False
+            if not self._token_acquired:
+                # 关闭后重新连接：重新登记为Token管理器的使用者
+                self.token_manager.acquire()
+                self._token_acquired = True
                 
             token = await self._get_access_token()
             uri = f"{self.ws_endpoint}?accessToken={token}"
@@ -378,9 +404,14 @@ class KoneDriverV2(ElevatorDriver):
                 # 如果之前有WebSocket连接，关闭它
                 if self.websocket:
                     self.is_listening = False
+                    if self._disconnected_at is None:
+                        self._disconnected_at = time.monotonic()
                     await self.websocket.close()
                 
                 self.websocket = await websockets.connect(uri, subprotocols=['koneapi'])
+                if self.sender is not None:
+                    self.sender.close()
+                self.sender = FrameSender(self.websocket)
                 
                 log_evidence('response', {
                     'status': 'connected',
@@ -393,6 +424,11 @@ class KoneDriverV2(ElevatorDriver):
                     asyncio.create_task(self._listen_events())
                     # 给事件监听器一点时间启动
                     await asyncio.sleep(0.1)
+                
+                # 断线后重新连上：重放订阅、重发可重试的请求（需在锁外执行）
+                if self._disconnected_at is not None:
+                    disconnected_at, self._disconnected_at = self._disconnected_at, None
+                    asyncio.create_task(self._restore_session(disconnected_at))
                     
             except Exception as e:
                 log_evidence('response', {
@@ -401,59 +437,201 @@ class KoneDriverV2(ElevatorDriver):
                 })
                 raise ConnectionError(f"Failed to establish WebSocket connection: {e}")
     
+    async def _send_frame(self, message: dict):
+        """交给当前连接的写任务发送；连接已关闭（sender 已释放）时抛出 ConnectionError"""
+        sender = self.sender
+        if sender is None:
+            raise ConnectionError("WebSocket connection is closed")
+        await sender.send(message)
+    
     async def _listen_events(self):
-        """监听WebSocket事件并分发到相应队列"""
+        """监听WebSocket事件：监控帧只解析头部即可路由，响应交给等待者，其余事件查表分类后以惰性帧发布到事件总线"""
+        websocket = self.websocket
+        dispatcher = self.dispatcher
+        pending_requests = self.pending_requests
+        lift_state = self.lift_state
+        lift_state_groups = self._lift_state_reads
+        passthrough = self.passthrough
+        call_tracker = self.call_tracker
         try:
-            async for message in self.websocket:
+            async for message in websocket:
                 try:
-                    data = json.loads(message)
-                    
-                    log_evidence('event', {
-                        'type': data.get('type', 'unknown'),
-                        'data': data
-                    })
-                    
-                    # 检查是否是响应消息
-                    response_request_id = None
-                    
-                    # 检查不同格式的request_id
-                    if data.get('requestId'):
-                        response_request_id = data.get('requestId')
-                    elif data.get('payload', {}).get('request_id'):
-                        response_request_id = data.get('payload', {}).get('request_id')
-                    elif data.get('callType') == 'ping' and data.get('data', {}).get('request_id'):
-                        # ping响应的特殊格式
-                        response_request_id = data.get('data', {}).get('request_id')
-                    
-                    # 如果是响应消息，放入对应的pending request
-                    if response_request_id and str(response_request_id) in self.pending_requests:
-                        future = self.pending_requests[str(response_request_id)]
-                        if not future.done():
-                            future.set_result(data)
-                    else:
-                        # 否则是事件，根据类型分发到不同队列
-                        if 'session_id' in data.get('data', {}):
-                            data['callType'] = 'action'
-                            await self.action_event_queue.put(data)
-                        elif 'type' in data and data['type'] in ['liftStatus', 'robotStatus', 'monitor-lift-status']:
-                            data['callType'] = 'subscription'
-                            await self.subscription_event_queue.put(data)
-                        elif 'eventType' in data:
-                            data['callType'] = 'notification'
-                            await self.subscription_event_queue.put(data)
-                        else:
-                            # 默认放入通用事件队列
-                            await self.event_queue.put(data)
-                    
-                except json.JSONDecodeError as e:
+                    frame = parse_frame(message)
+                except ValueError as e:
                     logger.error(f"Failed to decode message: {e}")
+                    continue
+                
+                log_evidence_frame(frame)
+                
+                # 响应消息交给对应的pending request
+                response_request_id = frame_correlation_id(frame)
+                if response_request_id:
+                    key = str(response_request_id)
+                    future = pending_requests.get(key)
+                    if future is not None and not future.done():
+                        future.set_result(frame.data)
+                        continue
+                    if ping_key(response_request_id) in pending_requests:
+                        # 进行中ping的状态确认，不是ping结果，已记录证据后丢弃
+                        continue
+                
+                # 以下消费者需要正文时才解码（每帧最多一次）
+                event_type = frame.header.get('type')
+                if event_type == CALL_STATE_EVENT_TYPE:
+                    if call_tracker.active():
+                        call_tracker.apply(frame.data)
+                elif self._resolve_call_waiter(frame):
+                    # 呼叫事件已直接交给发起该呼叫的调用方
+                    continue
+                
+                if event_type in LIFT_STATE_EVENT_TYPES and lift_state_groups:
+                    # 只为正在跟踪的群组解码，其余状态帧保持只解析头部
+                    header = frame.header
+                    if (header.get('buildingId') or '', str(header.get('groupId') or '1')) in lift_state_groups:
+                        lift_state.apply(frame.data)
+                if passthrough.active:
+                    payload = frame.data.get('data') if frame.decoded else None
+                    passthrough.publish(frame.header, message, payload)
+                
+                event = dispatcher.dispatch(frame)
+                await self.event_bus.put(event.channel, event)
                     
         except websockets.exceptions.ConnectionClosed:
             logger.warning("WebSocket connection closed")
-            self.is_listening = False
         except Exception as e:
             logger.error(f"Error in event listener: {e}")
+        
+        # 只处理当前连接的断开，被替换掉的旧连接不影响状态
+        if self.websocket is websocket:
             self.is_listening = False
+            self._on_connection_lost()
+    
+    def _on_connection_lost(self):
+        """连接断开：按策略处理进行中的请求，并在需要时后台重连"""
+        if self._closing:
+            return
+        
+        self._disconnected_at = time.monotonic()
+        log_evidence('event', {
+            'type': 'connection_lost',
+            'data': {'active_subscriptions': list(self.active_subscriptions.keys())}
+        })
+        
+        error = ConnectionError("WebSocket connection lost")
+        for request_id, future in list(self.pending_requests.items()):
+            message = self._pending_messages.get(request_id)
+            if self.pending_policy == 'retry' and message is not None and self._is_retryable(message):
+                continue
+            if not future.done():
+                future.set_exception(error)
+        for future in list(self.call_waiters.values()):
+            if not future.done():
+                future.set_exception(error)
+        
+        # 没有订阅和进行中的请求时不主动重连，下次发送时再按需连接
+        if not self.auto_reconnect or not (self._live_subscriptions() or self.pending_requests):
+            return
+        if self._reconnect_task is None or self._reconnect_task.done():
+            self._reconnect_task = asyncio.create_task(self._reconnect_loop())
+    
+    @staticmethod
+    def _is_retryable(message: dict) -> bool:
+        """只有查询类和订阅类请求可以安全重发"""
+        return message.get('type') in ('common-api', 'site-monitoring')
+    
+    def forget_subscription(self, sub: str):
+        """不再需要的订阅：重连后不再重放，也不再算作进行中的工作（服务器端订阅到期后自然结束）"""
+        self.active_subscriptions.pop(sub, None)
+    
+    def _live_subscriptions(self) -> List[Dict[str, Any]]:
+        """尚未到期的订阅"""
+        now = time.time()
+        return [sub for sub in self.active_subscriptions.values() if sub['expires_at'] > now]
+    
+    async def _reconnect_loop(self):
+        """抖动指数退避重连，直到成功或驱动被关闭"""
+        attempt = 0
+        while not self._closing:
+            delay = min(self.reconnect_max_delay, self.reconnect_base_delay * (2 ** attempt))
+            await asyncio.sleep(random.uniform(delay / 2, delay))
+            if self._closing:
+                return
+            try:
+                await self._ensure_connection()
+                return
+            except Exception as e:
+                attempt += 1
+                logger.warning(f"Reconnect attempt {attempt} failed: {e}")
+    
+    async def _restore_session(self, disconnected_at: float):
+        """重连成功后重放订阅、重发可重试请求，并记录恢复耗时"""
+        for sub in self._live_subscriptions():
+            remaining = int(sub['expires_at'] - time.time())
+            if remaining <= 0:
+                continue
+            try:
+                await self.subscribe(sub['building_id'], sub['subtopics'], remaining,
+                                     sub['group_id'], sub['sub'])
+            except Exception as e:
+                logger.error(f"Failed to replay subscription {sub['sub']}: {e}")
+        
+        if self.pending_policy == 'retry':
+            for request_id, message in list(self._pending_messages.items()):
+                future = self.pending_requests.get(request_id)
+                if future is not None and not future.done() and self._is_retryable(message):
+                    try:
+                        await self._send_frame(message)
+                    except Exception as e:
+                        logger.error(f"Failed to resend request {request_id}: {e}")
+        
+        recovery_seconds = time.monotonic() - disconnected_at
+        self.reconnect_count += 1
+        self.recovery_times.append(recovery_seconds)
+        log_evidence('event', {
+            'type': 'connection_recovered',
+            'data': {'recovery_ms': round(recovery_seconds * 1000, 3), 'reconnect_count': self.reconnect_count}
+        })
+    
+    def connection_stats(self) -> Dict[str, Any]:
+        """连接恢复统计"""
+        return {
+            'connected': bool(self.websocket and not self.websocket.closed and self.is_listening),
+            'reconnect_count': self.reconnect_count,
+            'last_recovery_ms': round(self.recovery_times[-1] * 1000, 3) if self.recovery_times else None,
+            'max_recovery_ms': round(max(self.recovery_times) * 1000, 3) if self.recovery_times else None,
+            'active_subscriptions': len(self._live_subscriptions())
+        }
+    
+    def has_active_work(self) -> bool:
+        """是否仍有进行中的请求、呼叫或有效订阅（连接池据此判断能否空闲关闭）"""
+        return bool(self.pending_requests or self.call_waiters
+                    or self._live_subscriptions() or self.subscription_leases.leases()
+                    or self.call_tracker.active())
+    
+    def _register_call_waiter(self, request_id: Any) -> asyncio.Future:
+        """为一次呼叫注册事件等待者，须在发送前注册以免错过事件"""
+        future = asyncio.get_running_loop().create_future()
+        self.call_waiters[str(request_id)] = future
+        return future
+    
+    def _resolve_call_waiter(self, frame: Frame) -> bool:
+        """按 request_id 将呼叫事件交给对应等待者，返回是否已处理；监控帧不是呼叫事件，不解码正文"""
+        if not self.call_waiters or frame.monitoring:
+            return False
+        data = frame.data
+        event_data = data.get('data')
+        if not isinstance(event_data, dict):
+            return False
+        request_id = event_data.get('request_id')
+        if request_id is None:
+            return False
+        future = self.call_waiters.pop(str(request_id), None)
+        if future is None or future.done():
+            return False
+        
+        # 原始数据同时被证据缓冲区引用，交给调用方的是带分类的副本
+        future.set_result(dict(data, callType='action'))
+        return True
     
     async def _send_message(self, message: dict) -> dict:
         """发送WebSocket消息并等待响应 - 使用事件驱动模式"""
@@ -478,12 +656,11 @@ class KoneDriverV2(ElevatorDriver):
             # 创建Future来等待响应
             future = asyncio.Future()
             self.pending_requests[str(request_id)] = future
+            self._pending_messages[str(request_id)] = message
             
-            # 发送消息
-            await self.websocket.send(json.dumps(message))
-            
-            # 等待响应
             try:
+                # 交给写任务按优先级发送，然后等待响应
+                await self._send_frame(message)
                 response = await asyncio.wait_for(future, timeout=10.0)
                 log_evidence('response', {
                     'request_id': request_id,
@@ -495,149 +672,229 @@ class KoneDriverV2(ElevatorDriver):
             finally:
                 # 清理pending request
                 self.pending_requests.pop(str(request_id), None)
+                self._pending_messages.pop(str(request_id), None)
                 
-        except websockets.exceptions.ConnectionClosed as e:
-            self.websocket = None
+        except (websockets.exceptions.ConnectionClosed, ConnectionError) as e:
+            # 断线由监听器统一处理（重连、重放订阅）
             self.is_listening = False
             raise ConnectionError(f"WebSocket connection closed: {e}")
         except Exception as e:
             raise Exception(f"WebSocket communication error: {e}")
     
     def _generate_numeric_request_id(self) -> int:
-        """生成数字request_id，类似testall.py"""
-        import random
-        return random.randint(100000000, 999999999)
+        """生成数字request_id - 单调递增，同一连接内不会重复"""
+        return self.messages.request_ids.next()
     
-    async def get_building_config(self, building_id: str, group_id: Optional[str] = None) -> dict:
-        """获取建筑配置"""
-        message = {
-            'type': 'common-api',
-            'buildingId': building_id,
-            'callType': 'config',
-            'groupId': group_id or '1',
-            'payload': {
-                'request_id': self._generate_numeric_request_id()  # payload中是数字
-            }
-        }
-        return await self._send_message(message)
+    async def get_building_config(self, building_id: str, group_id: Optional[str] = None,
+                                  refresh: bool = False, max_age: Optional[float] = None) -> dict:
+        """获取建筑配置 - TTL内返回缓存，refresh=True 强制向服务器请求"""
+        return await self.building_cache.get(
+            'config', building_id, group_id,
+            lambda: self._send_message(self.messages.common_api(building_id, 'config', group_id)),
+            max_age=max_age, refresh=refresh
+        )
     
-    async def get_actions(self, building_id: str, group_id: Optional[str] = None) -> dict:
-        """获取可用动作"""
-        message = {
-            'type': 'common-api', 
+    async def get_actions(self, building_id: str, group_id: Optional[str] = None,
+                          refresh: bool = False, max_age: Optional[float] = None) -> dict:
+        """获取可用动作 - TTL内返回缓存，refresh=True 强制向服务器请求"""
+        return await self.building_cache.get(
+            'actions', building_id, group_id,
+            lambda: self._send_message(self.messages.common_api(building_id, 'actions', group_id)),
+            max_age=max_age, refresh=refresh
+        )
+    
+    async def get_topology(self, building_id: str, group_id: Optional[str] = None,
+                           refresh: bool = False) -> BuildingTopology:
+        """获取建筑拓扑索引 - 由缓存的配置编译，配置内容不变时复用同一个索引"""
+        response = await self.get_building_config(building_id, group_id, refresh=refresh)
+        status = response.get('statusCode')
+        if isinstance(status, int) and status >= 400:
+            raise ValueError(f"Building config unavailable: {response.get('error', status)}")
+        return self._compile_topology(building_id, group_id, response)
+    
+    def _compile_topology(self, building_id: str, group_id: Optional[str], response: dict) -> BuildingTopology:
+        key = (building_id, group_id or '1')
+        digest = self.building_cache.content_hash('config', building_id, group_id)
+        cached = self._topologies.get(key)
+        if cached is not None and cached[0] == digest:
+            return cached[1]
+        topology = BuildingTopology.from_kone_config(building_id, response, group_id or '1')
+        self._topologies[key] = (digest, topology)
+        return topology
+    
+    def cached_call_validator(self, building_id: str, group_id: Optional[str] = None) -> Optional[CallValidator]:
+        """由建筑缓存中已有的config和actions（可能已过期）编译呼叫预校验规则，不向服务器请求；
+        二者内容不变时复用，都未缓存时返回None"""
+        group_id = group_id or '1'
+        cache = self.building_cache
+        hashes = (cache.content_hash('config', building_id, group_id),
+                  cache.content_hash('actions', building_id, group_id))
+        if hashes == (None, None):
+            return None
+        key = (building_id, group_id)
+        cached = self._call_validators.get(key)
+        if cached is not None and cached[0] == hashes:
+            return cached[1]
+        
+        topology = None
+        config = cache.peek('config', building_id, group_id)
+        if config is not None and not self._is_error_response(config):
+            topology = self._compile_topology(building_id, group_id, config)
+        actions = cache.peek('actions', building_id, group_id)
+        if actions is not None and self._is_error_response(actions):
+            actions = None
+        validator = CallValidator(building_id, group_id, topology, actions)
+        self._call_validators[key] = (hashes, validator)
+        return validator
+    
+    async def get_call_validator(self, building_id: str, group_id: Optional[str] = None) -> Optional[CallValidator]:
+        """预热并获取呼叫预校验规则 - 缓存缺失或过期时向服务器请求config和actions（每个建筑群组各一次往返），
+        再由缓存编译；请求失败返回None"""
+        try:
+            await asyncio.gather(self.get_building_config(building_id, group_id),
+                                 self.get_actions(building_id, group_id))
+        except Exception as e:
+            logger.warning(f"Call validation rules unavailable for {building_id}/{group_id}: {e}")
+            return None
+        return self.cached_call_validator(building_id, group_id)
+    
+    @staticmethod
+    def _is_error_response(response: dict) -> bool:
+        status = response.get('statusCode')
+        return isinstance(status, int) and status >= 400
+    
+    def _on_building_data_changed(self, kind: str, building_id: str, group_id: str,
+                                  previous_hash: Optional[str], content_hash: str, response: dict):
+        """建筑配置/动作内容变化：丢弃旧拓扑索引，记录证据并发布变化事件"""
+        if kind == 'config':
+            self._topologies.pop((building_id, group_id), None)
+        self._call_validators.pop((building_id, group_id), None)
+        event = {
+            'type': 'building-data-changed',
             'buildingId': building_id,
-            'callType': 'actions',
-            'groupId': group_id or '1',
-            'payload': {
-                'request_id': self._generate_numeric_request_id()  # payload中是数字
-            }
+            'groupId': group_id,
+            'kind': kind,
+            'previousHash': previous_hash,
+            'contentHash': content_hash
         }
-        return await self._send_message(message)
+        log_evidence('event', {'type': event['type'], 'data': event})
+        self.event_bus.publish(CHANNEL_GENERAL, event)
+    
+    @staticmethod
+    def _ping_key(request_id: Any) -> str:
+        """ping在pending_requests中的关联键，避免与状态确认的requestId冲突"""
+        return ping_key(request_id)
     
     async def ping(self, building_id: str, group_id: Optional[str] = None) -> dict:
-        """Ping测试 - 特殊处理，等待callType=ping的响应"""
+        """Ping测试 - 通过pending_requests关联callType=ping的响应，返回往返时延rtt_ms"""
         await self._ensure_connection()
         
-        request_id = self._generate_numeric_request_id()
-        
-        message = {
-            'type': 'common-api',
-            'buildingId': building_id,
-            'callType': 'ping',
-            'groupId': group_id or '1',
-            'payload': {
-                'request_id': request_id
-            }
-        }
+        message = self.messages.common_api(building_id, 'ping', group_id)
+        request_id = message['payload']['request_id']
         
         log_evidence('request', {
             'request_id': request_id,
             'message': message
         })
         
+        timeout_seconds = 10.0
+        key = self._ping_key(request_id)
+        future = asyncio.get_running_loop().create_future()
+        self.pending_requests[key] = future
+        
         try:
-            # 发送消息
-            await self.websocket.send(json.dumps(message))
+            sent_at = time.monotonic()
+            await self._send_frame(message)
             
-            # ping特殊处理：等待callType=ping的响应，忽略状态确认
-            timeout_seconds = 10.0
-            start_time = time.time()
+            try:
+                event = await asyncio.wait_for(future, timeout=timeout_seconds)
+            except asyncio.TimeoutError:
+                raise TimeoutError(f"No ping response received for request {request_id} within {timeout_seconds}s")
             
-            while time.time() - start_time < timeout_seconds:
-                try:
-                    event = await asyncio.wait_for(self.event_queue.get(), timeout=2.0)
-                    
-                    # 检查是否是我们要的ping响应
-                    if (event.get('callType') == 'ping' and 
-                        event.get('data', {}).get('request_id') == request_id):
-                        log_evidence('response', {
-                            'request_id': request_id,
-                            'response': event
-                        })
-                        return event
-                    else:
-                        # 不是我们要的响应，可能是状态确认或其他事件，继续等待
-                        continue
-                        
-                except asyncio.TimeoutError:
-                    continue
-                    
-            # 超时
-            raise TimeoutError(f"No ping response received for request {request_id} within {timeout_seconds}s")
+            response = dict(event)
+            response['rtt_ms'] = round((time.monotonic() - sent_at) * 1000, 3)
+            
+            log_evidence('response', {
+                'request_id': request_id,
+                'response': response
+            })
+            return response
             
+        except (websockets.exceptions.ConnectionClosed, ConnectionError) as e:
+            raise ConnectionError(f"WebSocket connection closed: {e}")
         except Exception as e:
             raise Exception(f"Ping communication error: {e}")
+        finally:
+            self.pending_requests.pop(key, None)
     
     async def subscribe(self, building_id: str, subtopics: List[str], duration: int = 300,
                        group_id: Optional[str] = None, sub: Optional[str] = None) -> dict:
         """订阅监控"""
-        message = {
-            'type': 'site-monitoring',
-            'buildingId': building_id,
-            'callType': 'monitor', 
-            'groupId': group_id or '1',
-            'requestId': str(int(time.time() * 1000)),  # 添加必需的requestId字段
-            'payload': {
-                'sub': sub or f'monitor_{int(time.time())}',
-                'duration': min(duration, 300),
-                'subtopics': subtopics
+        message = self.messages.site_monitoring(building_id, subtopics, duration, group_id, sub)
+        response = await self._send_message(message)
+        
+        # 记录有效订阅，断线重连后重放
+        if response.get('statusCode') in (200, 201):
+            payload = message['payload']
+            self.active_subscriptions[payload['sub']] = {
+                'sub': payload['sub'],
+                'building_id': building_id,
+                'group_id': message['groupId'],
+                'subtopics': list(subtopics),
+                'expires_at': time.time() + payload['duration']
             }
-        }
-        return await self._send_message(message)
+        return response
+    
+    async def subscribe_continuous(self, building_id: str, subtopics: List[str],
+                                   group_id: Optional[str] = None) -> str:
+        """持续订阅 - 由租约管理器合并主题并自动续订，返回租约ID"""
+        return await self.subscription_leases.acquire(building_id, subtopics, group_id)
+    
+    async def unsubscribe_continuous(self, lease_id: str):
+        """释放持续订阅租约"""
+        await self.subscription_leases.release(lease_id)
+    
+    async def track_lift_state(self, building_id: str, group_id: Optional[str] = None) -> str:
+        """开始（或继续）跟踪群组的电梯状态 - 每个群组只持有一个自动续订的监控租约，
+        由 untrack_lift_state 释放，或在长时间无人读取后由 release_idle_lift_state 释放"""
+        key = (building_id, group_id or '1')
+        self._lift_state_reads[key] = time.monotonic()
+        lease_id = self._lift_state_leases.get(key)
+        if lease_id is None:
+            try:
+                lease_id = await self.subscribe_continuous(building_id, LIFT_STATE_SUBTOPICS, group_id)
+            except BaseException:
+                if key not in self._lift_state_leases:
+                    self._lift_state_reads.pop(key, None)
+                raise
+            self._lift_state_leases[key] = lease_id
+        return lease_id
+    
+    async def untrack_lift_state(self, building_id: str, group_id: Optional[str] = None) -> bool:
+        """停止跟踪并释放监控租约，已有状态保留；没有在跟踪时返回False"""
+        key = (building_id, group_id or '1')
+        self._lift_state_reads.pop(key, None)
+        lease_id = self._lift_state_leases.pop(key, None)
+        if lease_id is None:
+            return False
+        await self.unsubscribe_continuous(lease_id)
+        return True
+    
+    async def release_idle_lift_state(self, idle: float) -> int:
+        """释放超过 idle 秒没有读取的群组的状态跟踪，返回释放的群组数（连接池空闲回收前调用）"""
+        now = time.monotonic()
+        idle_keys = [key for key, read_at in self._lift_state_reads.items() if now - read_at >= idle]
+        for key in idle_keys:
+            await self.untrack_lift_state(*key)
+        return len(idle_keys)
     
     async def call_action_no_wait(self, building_id: str, area: int, action: int,
                          destination: Optional[int] = None, delay: Optional[int] = None,
                          allowed_lifts: Optional[List[int]] = None, group_size: int = 1,
                          terminal: int = 1, group_id: Optional[str] = None) -> dict:
         """动作呼叫 - 不等待事件，用于测试订阅"""
-        call_data = {
-            'action': action
-        }
-        
-        if destination is not None:
-            call_data['destination'] = destination
-            
-        if delay is not None:
-            call_data['delay'] = delay
-            
-        if allowed_lifts is not None:
-            call_data['allowed_lifts'] = allowed_lifts
-            
-        call_data['group_size'] = group_size
-        
-        message = {
-            'type': 'lift-call-api-v2',
-            'buildingId': building_id,
-            'callType': 'action',
-            'groupId': group_id or '1',
-            'payload': {
-                'request_id': self._generate_numeric_request_id(),
-                'area': area,
-                'time': datetime.now(timezone.utc).isoformat().replace('+00:00', 'Z'),
-                'terminal': terminal,
-                'call': call_data
-            }
-        }
+        message = self.messages.lift_call(building_id, area, action, destination, delay,
+                                          allowed_lifts, group_size, terminal, group_id)
         
         # 只发送消息并返回状态确认，不等待事件
         return await self._send_message(message)
@@ -646,77 +903,77 @@ class KoneDriverV2(ElevatorDriver):
                          destination: Optional[int] = None, delay: Optional[int] = None,
                          allowed_lifts: Optional[List[int]] = None, group_size: int = 1,
                          terminal: int = 1, group_id: Optional[str] = None) -> dict:
-        """动作呼叫"""
-        call_data = {
-            'action': action
-        }
-        
-        if destination is not None:
-            call_data['destination'] = destination
-            
-        if delay is not None:
-            if not (0 <= delay <= 30):
+        """动作呼叫 - 发送前按预校验模式检查；规则取自建筑缓存，不为校验额外请求服务器"""
+        if self.call_validation == 'off':
+            if delay is not None and not (0 <= delay <= 30):
                 raise ValueError("Delay must be between 0 and 30 seconds")
-            call_data['delay'] = delay
-            
-        if allowed_lifts:
-            call_data['allowed_lifts'] = allowed_lifts
-            
-        call_data['group_size'] = group_size
+            return await self._send_call(building_id, area, action, destination, delay,
+                                         allowed_lifts, group_size, terminal, group_id)
         
-        message = {
-            'type': 'lift-call-api-v2',
-            'buildingId': building_id,
-            'callType': 'action',
-            'groupId': group_id or '1',
-            'payload': {
-                'request_id': self._generate_numeric_request_id(),  # 数字格式，符合官方规范
-                'area': area,
-                'time': datetime.now(timezone.utc).isoformat().replace('+00:00', 'Z'),
-                'terminal': terminal,  # action类型需要terminal字段
-                'call': call_data
-            }
-        }
+        validator = self.cached_call_validator(building_id, group_id)
+        rejection = (validator or CallValidator(building_id, group_id or '1')).check(
+            area, action, destination, delay, allowed_lifts
+        )
+        if rejection is None:
+            return await self._send_call(building_id, area, action, destination, delay,
+                                         allowed_lifts, group_size, terminal, group_id)
         
-        # 发送消息并获取状态确认
-        status_response = await self._send_message(message)
+        if self.call_validation == 'enforce':
+            self.prevalidation_rejects += 1
+            response = rejection_response(rejection, building_id, group_id, self.messages.request_ids.next())
+            log_evidence('prevalidation', {
+                'building_id': building_id,
+                'group_id': group_id,
+                'call': {'area': area, 'action': action, 'destination': destination,
+                         'delay': delay, 'allowed_lifts': allowed_lifts},
+                'response': response
+            })
+            return response
         
-        # 如果状态确认成功，等待实际的呼叫事件
-        if status_response.get('statusCode') == 201:
+        # strict：仍然发送，由服务器给出实际结果，响应中附带本地预测便于比对
+        response = dict(await self._send_call(building_id, area, action, destination, delay,
+                                              allowed_lifts, group_size, terminal, group_id))
+        response['prevalidation'] = rejection.to_dict(sent=True)
+        return response
+    
+    async def _send_call(self, building_id: str, area: int, action: int,
+                         destination: Optional[int], delay: Optional[int],
+                         allowed_lifts: Optional[List[int]], group_size: int,
+                         terminal: int, group_id: Optional[str]) -> dict:
+        """发送呼叫并等待本次呼叫的事件"""
+        message = self.messages.lift_call(building_id, area, action, destination, delay,
+                                          allowed_lifts or None, group_size, terminal, group_id)
+        request_id = message['payload']['request_id']
+        
+        # 先注册等待者，监听器收到本次呼叫的事件后直接唤醒
+        call_event = self._register_call_waiter(request_id)
+        try:
+            # 发送消息并获取状态确认
+            status_response = await self._send_message(message)
+            
+            # 如果状态确认成功，等待本次呼叫的事件
+            if status_response.get('statusCode') != 201:
+                return status_response
+            
             try:
-                # 等待包含sessionId的事件
-                timeout_seconds = 10.0
-                start_time = time.time()
-                
-                while time.time() - start_time < timeout_seconds:
-                    try:
-                        event = await asyncio.wait_for(self.action_event_queue.get(), timeout=2.0)
-                        
-                        # 检查是否是呼叫相关的事件
-                        if event.get('data', {}).get('session_id'):
-                            # 合并状态响应和事件数据，提取session_id到根级别
-                            combined_response = status_response.copy()
-                            combined_response.update(event)
-                            
-                            # 确保sessionId在根级别可访问
-                            if 'session_id' in event.get('data', {}):
-                                combined_response['sessionId'] = event['data']['session_id']
-                            elif 'sessionId' in event:
-                                combined_response['sessionId'] = event['sessionId']
-                                
-                            return combined_response
-                        
-                    except asyncio.TimeoutError:
-                        continue
-                        
+                event = await asyncio.wait_for(call_event, timeout=10.0)
+            except asyncio.TimeoutError:
                 # 如果没有收到事件，返回状态响应
                 return status_response
-                
-            except Exception as e:
-                logger.warning(f"Failed to get call event: {e}")
-                return status_response
-        else:
-            return status_response
+            
+            # 合并状态响应和事件数据，提取session_id到根级别
+            combined_response = status_response.copy()
+            combined_response.update(event)
+            
+            # 确保sessionId在根级别可访问
+            if 'session_id' in event.get('data', {}):
+                combined_response['sessionId'] = event['data']['session_id']
+            elif 'sessionId' in event:
+                combined_response['sessionId'] = event['sessionId']
+            
+            return combined_response
+        finally:
+            self.call_waiters.pop(str(request_id), None)
     
     async def hold_open(self, building_id: str, lift_deck: str, served_area: int,
                        hard_time: int, soft_time: Optional[int] = None,
@@ -739,25 +996,8 @@ class KoneDriverV2(ElevatorDriver):
         else:
             lift_deck_num = lift_deck
         
-        payload = {
-            'request_id': self._generate_numeric_request_id(),  # 数字格式，符合官方规范
-            'served_area': served_area,
-            'lift_deck': lift_deck_num,
-            'hard_time': hard_time,
-            'time': datetime.now(timezone.utc).isoformat().replace('+00:00', 'Z')
-            # 不包含terminal字段，官方文档中没有此字段
-        }
-        
-        if soft_time is not None:
-            payload['soft_time'] = soft_time
-        
-        message = {
-            'type': 'lift-call-api-v2',
-            'buildingId': building_id,
-            'callType': 'hold_open',
-            'groupId': group_id or '1',
-            'payload': payload
-        }
+        message = self.messages.hold_open(building_id, lift_deck_num, served_area, hard_time,
+                                          soft_time, group_id)
         return await self._send_message(message)
     
     async def delete_call(self, building_id: str, session_id: str,
@@ -773,47 +1013,66 @@ class KoneDriverV2(ElevatorDriver):
         else:
             numeric_session_id = session_id
             
-        message = {
-            'type': 'lift-call-api-v2', 
-            'buildingId': building_id,
-            'callType': 'delete',
-            'groupId': group_id or '1',
-            'payload': {
-                # 根据官方文档，只需要session_id
-                'session_id': numeric_session_id
-            }
-        }
+        message = self.messages.delete_call(building_id, numeric_session_id, group_id)
         return await self._send_message(message)
     
-    async def next_event(self, timeout: float = 30.0) -> Optional[dict]:
-        """获取下一个事件 - 从所有队列获取"""
+    async def next_event(self, timeout: float = 30.0, channels: Optional[List[str]] = None,
+                         priority: bool = False) -> Optional[dict]:
+        """获取下一个事件 - 同时等待所有通道，默认按到达顺序，priority=True 时订阅事件优先"""
+        return await self.event_bus.get(channels=channels, timeout=timeout, priority=priority)
+    
+    def event_view(self, predicate: Optional[EventFilter] = None,
+                   channels: Optional[List[str]] = None, maxsize: int = 0) -> EventView:
+        """创建独立的过滤事件视图，predicate 接收 (channel, event)，用完需调用 close()"""
+        return self.event_bus.view(predicate, channels, maxsize)
+    
+    async def events(self, predicate: Optional[EventFilter] = None,
+                     channels: Optional[List[str]] = None, maxsize: int = 0):
+        """异步迭代匹配的事件: async for event in driver.events(...)"""
+        view = self.event_view(predicate, channels, maxsize)
         try:
-            # 先尝试从订阅事件队列获取
-            try:
-                event = await asyncio.wait_for(self.subscription_event_queue.get(), timeout=0.1)
-                return event
-            except asyncio.TimeoutError:
-                pass
-                
-            # 尝试从action事件队列获取（可能是call状态变化事件）
-            try:
-                event = await asyncio.wait_for(self.action_event_queue.get(), timeout=0.1)
-                return event
-            except asyncio.TimeoutError:
-                pass
-                
-            # 如果专用队列都为空，从通用事件队列获取
-            event = await asyncio.wait_for(self.event_queue.get(), timeout=timeout)
-            return event
-        except asyncio.TimeoutError:
-            return None
+            async for event in view:
+                yield event
+        finally:
+            view.close()
+    
+    def queue_stats(self) -> Dict[str, Dict[str, Any]]:
+        """事件通道统计：当前长度、容量、溢出策略、丢弃数和合并数"""
+        return self.event_bus.stats()
+    
+    def send_queue_stats(self) -> Dict[str, Any]:
+        """发送队列统计：各优先级通道深度、峰值深度和发送数"""
+        if self.sender is None:
+            return {}
+        return self.sender.stats()
     
     async def close(self):
         """关闭连接"""
+        self._closing = True
+        self.subscription_leases.close()
+        self._lift_state_leases.clear()
+        self._lift_state_reads.clear()
+        self.passthrough.close()
+        for task in list(self._call_tasks):
+            task.cancel()
+        self._call_tasks.clear()
+        self._call_state_leases.clear()
+        self.call_tracker.close()
+        self.active_subscriptions.clear()
+        self._disconnected_at = None
+        if self._reconnect_task is not None and not self._reconnect_task.done():
+            self._reconnect_task.cancel()
+        if self.sender is not None:
+            self.sender.close()
+            self.sender = None
         if self.websocket:
             await self.websocket.close()
             self.websocket = None
         self.is_listening = False
+        self.event_bus.close()
+        if self._token_acquired:
+            self._token_acquired = False
+            self.token_manager.release()
 
     # Legacy method support for backward compatibility
     async def initialize(self) -> dict:
@@ -848,6 +1107,15 @@ class KoneDriverV2(ElevatorDriver):
                 group_id=request.group_id
             )
             
+            # 预校验在本地拒绝的呼叫
+            if is_local_rejection(response):
+                return {
+                    'success': False,
+                    'status_code': 400,
+                    'error': response['data']['error'],
+                    'data': response
+                }
+            
             return {
                 'success': True,
                 'status_code': 201,
@@ -859,6 +1127,91 @@ class KoneDriverV2(ElevatorDriver):
                 'status_code': 500,
                 'error': str(e)
             }
+
+    async def call_batch(self, requests: List[ElevatorCallRequest]) -> List[dict]:
+        """批量呼叫 - 各呼叫在共享连接上并发发送，预校验规则按群组取自建筑缓存（同一群组只编译一次）；
+        结果与请求顺序一致，每项附带 session_id 和 latency_ms"""
+
+        async def timed_call(request: ElevatorCallRequest) -> dict:
+            started = time.perf_counter()
+            result = await self.call(request)
+            data = result.get('data')
+            result['session_id'] = data.get('sessionId') if isinstance(data, dict) else None
+            result['latency_ms'] = round((time.perf_counter() - started) * 1000, 3)
+            return result
+
+        return list(await asyncio.gather(*(timed_call(request) for request in requests)))
+
+    def submit_call(self, request: ElevatorCallRequest) -> CallRecord:
+        """异步呼叫 - 立即返回呼叫记录，后台发送并由 monitor-call-state 事件推进状态"""
+        record = self.call_tracker.create(request.building_id, request.group_id, request.dict())
+        task = asyncio.create_task(self._track_call(record, request))
+        self._call_tasks.add(task)
+        task.add_done_callback(self._call_tasks.discard)
+        return record
+    
+    async def _track_call(self, record: CallRecord, request: ElevatorCallRequest):
+        """后台执行一次异步呼叫，持有呼叫状态订阅直到呼叫结束或超过 call_lifetime"""
+        tracker = self.call_tracker
+        key = (request.building_id, request.group_id or '1')
+        try:
+            # 先订阅呼叫状态再发送，避免错过早到的事件
+            await self._acquire_call_state(*key)
+        except Exception as e:
+            tracker.finish(record, CALL_FAILED, f'Call state subscription failed: {e}')
+            return
+        try:
+            result = await self.call(request)
+            data = result.get('data') if isinstance(result.get('data'), dict) else {}
+            if not result['success']:
+                state = CALL_REJECTED if result.get('status_code') == 400 else CALL_FAILED
+                tracker.finish(record, state, result.get('error'), data or None)
+                return
+            if (data.get('statusCode') or 201) >= 400:
+                tracker.finish(record, CALL_REJECTED, data.get('error') or f"statusCode {data['statusCode']}", data)
+                return
+            if data.get('sessionId') is None:
+                tracker.finish(record, CALL_FAILED, 'No call event received', data)
+                return
+            
+            tracker.bind_session(record, data['sessionId'], data)
+            deadline = time.monotonic() + self.call_lifetime
+            while not record.terminal:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    tracker.finish(record, CALL_FAILED, 'Call state timeout')
+                    break
+                await tracker.wait_for_change(record.call_id, record.version, remaining)
+        except asyncio.CancelledError:
+            tracker.finish(record, CALL_FAILED, 'Call tracking cancelled')
+            raise
+        except Exception as e:
+            tracker.finish(record, CALL_FAILED, str(e))
+        finally:
+            await self._release_call_state(*key)
+    
+    async def _acquire_call_state(self, building_id: str, group_id: str):
+        key = (building_id, group_id)
+        entry = self._call_state_leases.get(key)
+        if entry is None:
+            lease_id = await self.subscribe_continuous(building_id, CALL_STATE_SUBTOPICS, group_id)
+            entry = self._call_state_leases.get(key)
+            if entry is None:
+                self._call_state_leases[key] = [lease_id, 1]
+                return
+            # 并发的首次订阅：保留先登记的租约
+            await self.unsubscribe_continuous(lease_id)
+        entry[1] += 1
+    
+    async def _release_call_state(self, building_id: str, group_id: str):
+        key = (building_id, group_id)
+        entry = self._call_state_leases.get(key)
+        if entry is None:
+            return
+        entry[1] -= 1
+        if entry[1] <= 0:
+            del self._call_state_leases[key]
+            await self.unsubscribe_continuous(entry[0])
     
     async def cancel(self, building_id: str, session_id: str) -> dict:
         """Legacy cancel method"""
@@ -876,31 +1229,91 @@ class KoneDriverV2(ElevatorDriver):
                 'error': str(e)
             }
     
-    async def get_mode(self, building_id: str, group_id: str) -> dict:
-        """Legacy get_mode method - use monitoring subscription"""
+    async def refresh_lift_state(self, building_id: str, group_id: Optional[str] = None,
+                                 max_age: Optional[float] = None, timeout: float = 10.0) -> bool:
+        """确保状态存储中有该群组的状态；没有或超过 max_age 秒时重发订阅并等待推送，返回是否有状态"""
+        await self.track_lift_state(building_id, group_id)
+        store = self.lift_state
+        updated_at = store.updated_at(building_id, group_id)
+        if updated_at is not None and (max_age is None or time.time() - updated_at <= max_age):
+            return True
+        
+        # 只在数据过旧时才重发订阅，刚开始跟踪时订阅已经发出
+        version = store.version(building_id, group_id)
+        if updated_at is not None:
+            await self.subscription_leases.resubscribe(building_id, group_id)
+        deadline = time.monotonic() + timeout
+        while store.version(building_id, group_id) == version:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or await store.wait_for_update(building_id, group_id, remaining) is None:
+                break
+        return store.updated_at(building_id, group_id) is not None
+    
+    def lift_state_freshness(self, building_id: str, group_id: Optional[str] = None) -> Dict[str, Any]:
+        """状态新鲜度：最后更新时间（ISO 8601）和距今秒数"""
+        updated_at = self.lift_state.updated_at(building_id, group_id)
+        if updated_at is None:
+            return {'updated_at': None, 'age_seconds': None}
+        return {
+            'updated_at': datetime.fromtimestamp(updated_at, timezone.utc).isoformat().replace('+00:00', 'Z'),
+            'age_seconds': round(max(0.0, time.time() - updated_at), 3)
+        }
+    
+    async def get_lift_state(self, building_id: str, group_id: Optional[str] = None,
+                             max_age: Optional[float] = None, timeout: float = 10.0) -> dict:
+        """群组内各电梯的完整状态（模式、位置、门状态等），来自实时状态存储"""
+        try:
+            if not await self.refresh_lift_state(building_id, group_id, max_age, timeout):
+                return {
+                    'success': False,
+                    'status_code': 404,
+                    'error': 'No lift state received'
+                }
+            snapshot = self.lift_state.snapshot(building_id, group_id)
+            snapshot['freshness'] = self.lift_state_freshness(building_id, group_id)
+            return {
+                'success': True,
+                'status_code': 200,
+                'data': snapshot
+            }
+        except Exception as e:
+            return {
+                'success': False,
+                'status_code': 500,
+                'error': str(e)
+            }
+    
+    async def get_mode(self, building_id: str, group_id: str, timeout: float = 10.0,
+                       max_age: Optional[float] = None) -> dict:
+        """Legacy get_mode method - 读取实时状态存储，首次查询或超过 max_age 时等待状态推送"""
         try:
-            # Subscribe to lift status to get mode
-            response = await self.subscribe(
-                building_id=building_id,
-                subtopics=['lift_+/status'],
-                duration=30,
-                group_id=group_id
-            )
+            has_state = await self.refresh_lift_state(building_id, group_id, max_age, timeout)
             
-            # Wait for status event
-            event = await self.next_event(timeout=10.0)
-            if event and event.get('type') == 'monitor-lift-status':
-                lift_mode = event.get('payload', {}).get('lift_mode', 'unknown')
+            modes = self.lift_state.modes(building_id, group_id)
+            if has_state and not modes:
+                # 只收到位置/门状态等事件时，再等一次状态事件
+                deadline = time.monotonic() + timeout
+                while not modes:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0 or await self.lift_state.wait_for_update(building_id, group_id, remaining) is None:
+                        break
+                    modes = self.lift_state.modes(building_id, group_id)
+            
+            if not modes:
                 return {
-                    'success': True,
-                    'status_code': 200,
-                    'data': {'mode': lift_mode}
+                    'success': False,
+                    'status_code': 404,
+                    'error': 'No status event received'
                 }
-            
             return {
-                'success': False,
-                'status_code': 404,
-                'error': 'No status event received'
+                'success': True,
+                'status_code': 200,
+                'data': {
+                    'mode': next(iter(modes.values())),
+                    'lifts': modes,
+                    'version': self.lift_state.version(building_id, group_id),
+                    'freshness': self.lift_state_freshness(building_id, group_id)
+                }
             }
         except Exception as e:
             return {
@@ -929,36 +1342,56 @@ class KoneDriverV2(ElevatorDriver):
 class ElevatorDriverFactory:
     """电梯驱动工厂类"""
     
+    # 电梯类型 -> 驱动实现类
+    DRIVER_CLASSES = {
+        'kone': KoneDriverV2
+    }
+    
     @staticmethod
     def create_driver(elevator_type: str, **kwargs) -> ElevatorDriver:
         """根据类型创建电梯驱动"""
-        if elevator_type.lower() == 'kone':
-            return KoneDriverV2(**kwargs)
-        else:
+        driver_class = ElevatorDriverFactory.DRIVER_CLASSES.get(elevator_type.lower())
+        if driver_class is None:
             raise ValueError(f"Unsupported elevator type: {elevator_type}")
+        return driver_class(**kwargs)
     
     @staticmethod
-    def create_from_config(config_path: str = 'config.yaml') -> Dict[str, ElevatorDriver]:
-        """从配置文件创建驱动实例"""
+    def load_driver_settings(config_path: str = 'config.yaml') -> Dict[str, Dict[str, Any]]:
+        """读取配置文件，返回每种电梯类型的驱动构造参数"""
         try:
             with open(config_path, 'r') as f:
                 config = yaml.safe_load(f)
             
-            drivers = {}
+            settings = {}
             kone_config = config.get('kone', {})
             if kone_config:
-                drivers['kone'] = KoneDriverV2(
-                    client_id=kone_config['client_id'],
-                    client_secret=kone_config['client_secret'],
-                    token_endpoint=kone_config.get('token_endpoint', 'https://dev.kone.com/api/v2/oauth2/token'),
-                    ws_endpoint=kone_config.get('ws_endpoint', 'wss://dev.kone.com/stream-v2')
-                )
+                settings['kone'] = {
+                    'client_id': kone_config['client_id'],
+                    'client_secret': kone_config['client_secret'],
+                    'token_endpoint': kone_config.get('token_endpoint', 'https://dev.kone.com/api/v2/oauth2/token'),
+                    'ws_endpoint': kone_config.get('ws_endpoint', 'wss://dev.kone.com/stream-v2')
+                }
+                if kone_config.get('event_queues'):
+                    settings['kone']['queue_limits'] = kone_config['event_queues']
+                if kone_config.get('config_cache_ttl') is not None:
+                    settings['kone']['config_cache_ttl'] = kone_config['config_cache_ttl']
+                if kone_config.get('call_validation'):
+                    settings['kone']['call_validation'] = kone_config['call_validation']
             
-            return drivers
+            return settings
             
         except Exception as e:
-            logger.error(f"Failed to create drivers from config: {e}")
+            logger.error(f"Failed to load driver settings from config: {e}")
             return {}
+    
+    @staticmethod
+    def create_from_config(config_path: str = 'config.yaml') -> Dict[str, ElevatorDriver]:
+        """从配置文件创建驱动实例"""
+        settings = ElevatorDriverFactory.load_driver_settings(config_path)
+        return {
+            elevator_type: ElevatorDriverFactory.create_driver(elevator_type, **kwargs)
+            for elevator_type, kwargs in settings.items()
+        }
 
 # Legacy support - 保持向后兼容
 KoneDriver = KoneDriverV2
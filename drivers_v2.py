@@ -3,7 +3,6 @@ import requests
 import aiohttp
 import websockets
 import asyncio
-import json
 import uuid
 import yaml
 import time
@@ -13,6 +12,9 @@ from datetime import datetime, timedelta, timezone
 from tenacity import retry, stop_after_attempt, wait_exponential
 import logging
 from collections import deque
+from evidence_writer import get_evidence_writer
+import json_codec
+from token_manager import get_token_manager
 
 # 配置日志
 logging.basicConfig(
@@ -34,10 +36,9 @@ def log_evidence(phase: str, data: Dict[str, Any]):
     }
     EVIDENCE_BUFFER.append(evidence)
     
-    # 写入JSONL文件
+    # 序列化后交给后台写入器批量写入JSONL文件
     try:
-        with open('kone_validation.log', 'a', encoding='utf-8') as f:
-            f.write(json.dumps(evidence, ensure_ascii=False) + '\n')
+        get_evidence_writer().write(json_codec.dumps_bytes(evidence, default=str) + b'\n')
     except Exception as e:
         logger.error(f"Failed to write evidence: {e}")
 
@@ -163,106 +164,32 @@ class KoneDriverV2(ElevatorDriver):
         self.is_listening = False
         self.connection_lock = asyncio.Lock()
         
+        # 进程内共享的Token管理器
+        self.token_manager = get_token_manager(
+            client_id, client_secret, token_endpoint,
+            evidence_logger=log_evidence
+        )
+        self._token_acquired = True
+        
     async def _get_access_token(self) -> str:
         """获取访问令牌"""
-        if self.access_token and self.token_expiry and datetime.now() < self.token_expiry - timedelta(minutes=5):
-            return self.access_token
-            
-        # 尝试从配置文件加载缓存的token
-        cached_token, cached_expiry = self._load_cached_token()
-        if cached_token and cached_expiry and datetime.now() < cached_expiry - timedelta(minutes=5):
-            self.access_token = cached_token
-            self.token_expiry = cached_expiry
-            return cached_token
-            
-        # 请求新token
-        import base64
-        credentials = f"{self.client_id}:{self.client_secret}"
-        encoded = base64.b64encode(credentials.encode()).decode()
-        
-        headers = {
-            'Authorization': f'Basic {encoded}',
-            'Content-Type': 'application/x-www-form-urlencoded'
-        }
-        
-        data = {
-            'grant_type': 'client_credentials',
-            'scope': 'application/inventory callgiving/*'
-        }
-        
-        log_evidence('request', {
-            'method': 'POST',
-            'url': self.token_endpoint,
-            'headers': {k: v for k, v in headers.items() if 'Authorization' not in k},
-            'data': data
-        })
-        
-        async with aiohttp.ClientSession() as session:
-            async with session.post(self.token_endpoint, data=data, headers=headers) as response:
-                response_data = await response.json()
-                
-                log_evidence('response', {
-                    'status': response.status,
-                    'data': {k: v for k, v in response_data.items() if 'access_token' not in k}
-                })
-                
-                if response.status == 200:
-                    self.access_token = response_data['access_token']
-                    expires_in = response_data.get('expires_in', 3600)
-                    self.token_expiry = datetime.now() + timedelta(seconds=expires_in)
-                    
-                    # 保存token到配置
-                    self._save_token_to_config(self.access_token, self.token_expiry)
-                    return self.access_token
-                else:
-                    raise Exception(f"Token request failed: {response.status}")
+        self.access_token = await self.token_manager.get_token()
+        self.token_expiry = self.token_manager.token_expiry
+        return self.access_token
     
     def _load_cached_token(self) -> tuple[Optional[str], Optional[datetime]]:
         """从配置文件加载缓存的token"""
-        try:
-            with open('config.yaml', 'r') as f:
-                config = yaml.safe_load(f)
-            
-            cached = config.get('kone', {}).get('cached_token', {})
-            token = cached.get('access_token')
-            expires_str = cached.get('expires_at')
-            
-            if token and expires_str:
-                expires_at = datetime.fromisoformat(expires_str.replace('Z', '+00:00'))
-                return token, expires_at.replace(tzinfo=None)
-                
-        except Exception as e:
-            logger.error(f"Failed to load cached token: {e}")
-        
-        return None, None
-    
-    def _save_token_to_config(self, access_token: str, expires_at: datetime):
-        """保存token到配置文件"""
-        try:
-            with open('config.yaml', 'r') as f:
-                config = yaml.safe_load(f)
-            
-            if 'kone' not in config:
-                config['kone'] = {}
-            
-            # 脱敏处理 - 仅保存必要信息
-            config['kone']['cached_token'] = {
-                'access_token': access_token,
-                'expires_at': expires_at.isoformat(),
-                'token_type': 'Bearer'
-            }
-            
-            with open('config.yaml', 'w') as f:
-                yaml.safe_dump(config, f, default_flow_style=False, indent=2)
-                
-        except Exception as e:
-            logger.error(f"Failed to save token: {e}")
+        return self.token_manager.load_cached_token()
     
     async def _ensure_connection(self):
         """确保WebSocket连接"""
         async with self.connection_lock:
             if self.websocket and not self.websocket.closed:
                 return
+            if not self._token_acquired:
+                # 关闭后重新连接：重新登记为Token管理器的使用者
+                self.token_manager.acquire()
+                self._token_acquired = True
                 
             token = await self._get_access_token()
             uri = f"{self.ws_endpoint}?accessToken={token}"
@@ -298,7 +225,7 @@ class KoneDriverV2(ElevatorDriver):
         try:
             async for message in self.websocket:
                 try:
-                    data = json.loads(message)
+                    data = json_codec.loads(message)
                     
                     log_evidence('event', {
                         'type': data.get('type', 'unknown'),
@@ -307,7 +234,7 @@ class KoneDriverV2(ElevatorDriver):
                     
                     await self.event_queue.put(data)
                     
-                except json.JSONDecodeError as e:
+                except ValueError as e:
                     logger.error(f"Failed to decode message: {e}")
                     
         except websockets.exceptions.ConnectionClosed:
@@ -328,7 +255,7 @@ class KoneDriverV2(ElevatorDriver):
             'message': message
         })
         
-        await self.websocket.send(json.dumps(message))
+        await self.websocket.send(json_codec.dumps(message))
         
         # 等待响应
         timeout = 30.0
@@ -510,6 +437,9 @@ class KoneDriverV2(ElevatorDriver):
             await self.websocket.close()
             self.websocket = None
         self.is_listening = False
+        if self._token_acquired:
+            self._token_acquired = False
+            self.token_manager.release()
 
     # Legacy method support for backward compatibility
     async def initialize(self) -> dict:
@@ -0,0 +1,340 @@
+"""
+驱动事件总线
+监听器把事件按通道（subscription / action / general）发布到同一个总线，
+消费者一次等待即可覆盖所有通道，无需逐个队列轮询；
+另外支持按条件过滤的独立视图和异步迭代接口。
+每个通道有容量上限和溢出策略：阻塞、丢弃最旧、丢弃最新、按键合并，并统计丢弃/合并数量。
+通道中保存紧凑的 Event 对象（可以只含帧头部、正文尚未解码），只有消费者取出时才物化为带 callType 分类的事件字典；
+物化返回副本，原始数据同时被状态存储、直通和证据日志引用，不被修改
+"""
+
+import asyncio
+import itertools
+from collections import deque
+from typing import Any, AsyncIterator, Callable, Deque, Dict, Hashable, Iterable, List, Optional, Tuple, Union
+
+# 默认通道，顺序即优先级（与原先 next_event 的检查顺序一致）
+CHANNEL_SUBSCRIPTION = 'subscription'
+CHANNEL_ACTION = 'action'
+CHANNEL_GENERAL = 'general'
+DEFAULT_CHANNELS = (CHANNEL_SUBSCRIPTION, CHANNEL_ACTION, CHANNEL_GENERAL)
+
+EventFilter = Callable[[str, dict], bool]
+CoalesceKey = Callable[[dict], Optional[Hashable]]
+
+# 溢出策略
+POLICY_BLOCK = 'block'              # 发布方等待消费者腾出空间
+POLICY_DROP_OLDEST = 'drop_oldest'  # 丢弃队列中最旧的事件
+POLICY_DROP_NEWEST = 'drop_newest'  # 丢弃新到达的事件
+POLICY_COALESCE = 'coalesce'        # 同一键只保留最新事件，满时退化为丢弃最旧
+OVERFLOW_POLICIES = (POLICY_BLOCK, POLICY_DROP_OLDEST, POLICY_DROP_NEWEST, POLICY_COALESCE)
+
+# 默认通道限制：订阅事件按主题合并，呼叫事件不可合并
+DEFAULT_CHANNEL_LIMITS: Dict[str, Dict[str, Any]] = {
+    CHANNEL_SUBSCRIPTION: {'maxsize': 10000, 'policy': POLICY_COALESCE},
+    CHANNEL_ACTION: {'maxsize': 1000, 'policy': POLICY_DROP_OLDEST},
+    CHANNEL_GENERAL: {'maxsize': 10000, 'policy': POLICY_DROP_OLDEST},
+}
+
+
+class Event:
+    """总线中的事件：事件字典或惰性帧（有 header 和 data 属性，见 frame_dispatch.Frame）+ 分类，取出时才物化"""
+
+    __slots__ = ('channel', 'kind', 'source', '_data')
+
+    def __init__(self, channel: str, kind: Optional[str], source: Any):
+        self.channel = channel
+        self.kind = kind
+        self.source = source
+        self._data: Optional[dict] = None
+
+    @property
+    def header(self) -> dict:
+        """路由用的顶层字段，不触发正文解码"""
+        source = self.source
+        return source if isinstance(source, dict) else source.header
+
+    def materialize(self) -> dict:
+        """返回事件字典；有分类时返回写入了 callType 的副本（只做一次），原始数据保持不变"""
+        if self._data is None:
+            source = self.source
+            data = source if isinstance(source, dict) else source.data
+            if self.kind is not None and data.get('callType') != self.kind:
+                data = dict(data, callType=self.kind)
+            self._data = data
+        return self._data
+
+
+def default_coalesce_key(event: dict) -> Optional[Hashable]:
+    """按 建筑/群组/主题（或电梯）/事件类型 合并，无法区分来源的事件不合并"""
+    topic = event.get('subtopic') or event.get('topic')
+    if topic is None:
+        payload = event.get('payload') if isinstance(event.get('payload'), dict) else event.get('data')
+        if isinstance(payload, dict):
+            topic = payload.get('lift_id') or payload.get('area')
+    if topic is None:
+        return None
+    return (event.get('buildingId'), event.get('groupId'), topic, event.get('type') or event.get('callType'))
+
+
+class _Waitable:
+    """带唤醒机制的基类：等待者挂起在Future上，有新事件时被唤醒"""
+
+    def __init__(self):
+        self._waiters: List[asyncio.Future] = []
+
+    def _wakeup(self):
+        waiters, self._waiters = self._waiters, []
+        for waiter in waiters:
+            if not waiter.done():
+                waiter.set_result(None)
+
+    async def _wait(self, deadline: Optional[float]) -> bool:
+        """等待下一次唤醒，超时返回False"""
+        loop = asyncio.get_running_loop()
+        waiter = loop.create_future()
+        self._waiters.append(waiter)
+        try:
+            if deadline is None:
+                await waiter
+                return True
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                return False
+            await asyncio.wait_for(waiter, timeout=remaining)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+
+
+class EventView(_Waitable):
+    """某个消费者的过滤视图，接收创建之后发布的匹配事件（不影响共享通道）；
+    发布时只按通道筛选，predicate 在取出时才对物化后的事件求值，发布路径不解码正文"""
+
+    def __init__(self, bus: 'EventBus', predicate: Optional[EventFilter] = None,
+                 channels: Optional[Iterable[str]] = None, maxsize: int = 0):
+        super().__init__()
+        self._bus = bus
+        self.predicate = predicate
+        self.channels = frozenset(channels) if channels else None
+        self.maxsize = maxsize
+        self.dropped = 0
+        self._items: Deque[Tuple[str, Event]] = deque()
+        self.closed = False
+
+    def _offer(self, channel: str, event: Event):
+        if self.channels is not None and channel not in self.channels:
+            return
+        if self.maxsize and len(self._items) >= self.maxsize:
+            # 视图满时丢弃最旧事件，慢消费者不会拖住发布方
+            self._items.popleft()
+            self.dropped += 1
+        self._items.append((channel, event))
+        self._wakeup()
+
+    def qsize(self) -> int:
+        return len(self._items)
+
+    async def get(self, timeout: Optional[float] = None) -> Optional[dict]:
+        """获取下一个匹配事件，超时或视图关闭返回None"""
+        loop = asyncio.get_running_loop()
+        deadline = None if timeout is None else loop.time() + timeout
+        predicate = self.predicate
+        while True:
+            while self._items:
+                channel, event = self._items.popleft()
+                data = event.materialize()
+                if predicate is None or predicate(channel, data):
+                    return data
+            if self.closed or not await self._wait(deadline):
+                return None
+
+    def close(self):
+        """关闭视图并唤醒等待者"""
+        if not self.closed:
+            self.closed = True
+            self._bus._remove_view(self)
+            self._wakeup()
+
+    def __aiter__(self) -> AsyncIterator[dict]:
+        return self
+
+    async def __anext__(self) -> dict:
+        event = await self.get()
+        if event is None:
+            raise StopAsyncIteration
+        return event
+
+
+class _Channel(_Waitable):
+    """有界通道，等待者为等待空间的发布方（仅 block 策略使用）"""
+
+    def __init__(self, name: str, maxsize: int = 0, policy: str = POLICY_DROP_OLDEST,
+                 coalesce_key: Optional[CoalesceKey] = None):
+        if policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy: {policy}")
+        super().__init__()
+        self.name = name
+        self.maxsize = maxsize
+        self.policy = policy
+        self.coalesce_key = coalesce_key or default_coalesce_key
+        # 每条记录为 [序号, Event, 合并键]，序号用于跨通道按到达顺序取出
+        self.items: Deque[list] = deque()
+        self.keyed: Dict[Hashable, list] = {}
+        self.dropped = 0
+        self.coalesced = 0
+
+    def full(self) -> bool:
+        return bool(self.maxsize) and len(self.items) >= self.maxsize
+
+    def offer(self, sequence: int, event: Event) -> bool:
+        """非阻塞入队，返回事件是否被接收（合并也算接收）"""
+        key = None
+        if self.policy == POLICY_COALESCE:
+            # 默认合并键只读头部；自定义合并键接收物化后的事件
+            if self.coalesce_key is default_coalesce_key:
+                key = default_coalesce_key(event.header)
+            else:
+                key = self.coalesce_key(event.materialize())
+            entry = self.keyed.get(key) if key is not None else None
+            if entry is not None:
+                # 保留原位置，替换为最新事件
+                entry[1] = event
+                self.coalesced += 1
+                return True
+
+        if self.full():
+            if self.policy == POLICY_DROP_NEWEST or self.policy == POLICY_BLOCK:
+                self.dropped += 1
+                return False
+            self._discard(self.items.popleft())
+            self.dropped += 1
+
+        entry = [sequence, event, key]
+        self.items.append(entry)
+        if key is not None:
+            self.keyed[key] = entry
+        return True
+
+    def pop(self) -> Event:
+        entry = self.items.popleft()
+        self._discard(entry)
+        self._wakeup()
+        return entry[1]
+
+    def _discard(self, entry: list):
+        key = entry[2]
+        if key is not None and self.keyed.get(key) is entry:
+            del self.keyed[key]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'size': len(self.items),
+            'maxsize': self.maxsize,
+            'policy': self.policy,
+            'dropped': self.dropped,
+            'coalesced': self.coalesced
+        }
+
+
+class EventBus(_Waitable):
+    """多通道事件总线：共享通道为竞争消费，视图为广播消费"""
+
+    def __init__(self, channels: Tuple[str, ...] = DEFAULT_CHANNELS,
+                 limits: Optional[Dict[str, Dict[str, Any]]] = None):
+        super().__init__()
+        self.channels = channels
+        limits = limits or {}
+        self._channels: Dict[str, _Channel] = {}
+        for channel in channels:
+            options = dict(DEFAULT_CHANNEL_LIMITS.get(channel, {}))
+            options.update(limits.get(channel, {}))
+            self._channels[channel] = _Channel(channel, **options)
+        self._views: List[EventView] = []
+        self._sequence = itertools.count()
+
+    def publish(self, channel: str, event: Union[Event, dict]) -> bool:
+        """非阻塞发布；block 策略的通道已满时按丢弃最新处理，需要背压请用 put()"""
+        if not isinstance(event, Event):
+            event = Event(channel, None, event)
+        for view in self._views:
+            view._offer(channel, event)
+        accepted = self._channels[channel].offer(next(self._sequence), event)
+        if accepted:
+            self._wakeup()
+        return accepted
+
+    async def put(self, channel: str, event: Union[Event, dict]) -> bool:
+        """发布事件；block 策略的通道已满时等待消费者腾出空间"""
+        target = self._channels[channel]
+        while target.policy == POLICY_BLOCK and target.full():
+            await target._wait(None)
+        return self.publish(channel, event)
+
+    def qsize(self, channel: Optional[str] = None) -> int:
+        if channel is not None:
+            return len(self._channels[channel].items)
+        return sum(len(target.items) for target in self._channels.values())
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """各通道的容量、策略和丢弃/合并计数"""
+        return {name: target.stats() for name, target in self._channels.items()}
+
+    def get_nowait(self, channels: Optional[Iterable[str]] = None, priority: bool = False) -> Optional[dict]:
+        """立即取出一个事件；priority=True 按通道优先级，否则按到达顺序"""
+        event = self.get_event_nowait(channels, priority)
+        return event.materialize() if event is not None else None
+
+    def get_event_nowait(self, channels: Optional[Iterable[str]] = None,
+                         priority: bool = False) -> Optional[Event]:
+        """同 get_nowait，但返回未物化的 Event 对象"""
+        selected = self.channels if channels is None else tuple(channels)
+        best = None
+        for channel in selected:
+            target = self._channels[channel]
+            if not target.items:
+                continue
+            if priority:
+                return target.pop()
+            if best is None or target.items[0][0] < best.items[0][0]:
+                best = target
+        return best.pop() if best is not None else None
+
+    async def get(self, channels: Optional[Iterable[str]] = None, timeout: Optional[float] = None,
+                  priority: bool = False) -> Optional[dict]:
+        """同时等待所选通道，任一通道有事件立即返回，超时返回None"""
+        event = await self.get_event(channels, timeout, priority)
+        return event.materialize() if event is not None else None
+
+    async def get_event(self, channels: Optional[Iterable[str]] = None, timeout: Optional[float] = None,
+                        priority: bool = False) -> Optional[Event]:
+        """同 get，但返回未物化的 Event 对象（可按 kind/channel 判断后再决定是否读取数据）"""
+        selected = self.channels if channels is None else tuple(channels)
+        loop = asyncio.get_running_loop()
+        deadline = None if timeout is None else loop.time() + timeout
+        while True:
+            event = self.get_event_nowait(selected, priority)
+            if event is not None:
+                return event
+            if not await self._wait(deadline):
+                return None
+
+    def view(self, predicate: Optional[EventFilter] = None,
+             channels: Optional[Iterable[str]] = None, maxsize: int = 0) -> EventView:
+        """创建过滤视图，predicate 接收 (channel, event) 并在取出时求值；
+        maxsize>0 时满了丢弃最旧事件（按通道筛选后、predicate 过滤前的事件计数）"""
+        view = EventView(self, predicate, channels, maxsize)
+        self._views.append(view)
+        return view
+
+    def _remove_view(self, view: EventView):
+        if view in self._views:
+            self._views.remove(view)
+
+    def close(self):
+        """关闭所有视图"""
+        for view in list(self._views):
+            view.close()
@@ -0,0 +1,220 @@
+"""
+监控事件扇出
+同一 (驱动, 建筑, 群组) 的所有本地订阅者（SSE / WebSocket 客户端）共享一个上游订阅：
+每组主题在租约管理器中只登记一次；订阅者的主题过滤器登记在主题前缀树中，
+驱动监听器直通的原始帧按路由头主题一次匹配出所有订阅者，同一份帧对象放入各订阅者的有界缓冲区，不做任何反序列化/序列化；
+缓冲区满的慢客户端被断开，不影响其他订阅者
+"""
+
+import asyncio
+import itertools
+import logging
+from collections import deque
+from typing import Any, Deque, Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+from frame_passthrough import PassthroughFrame
+from topic_trie import TopicTrie, minimal_topics
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SUBSCRIBER_BUFFER = 256
+
+CLOSE_SLOW_CONSUMER = 'slow consumer'
+CLOSE_FEED_STOPPED = 'upstream feed stopped'
+
+
+class FanoutSubscriber:
+    """一个本地订阅者：主题过滤 + 有界缓冲区"""
+
+    def __init__(self, subscriber_id: str, feed: '_Feed', topics: Iterable[str], maxsize: int):
+        self.subscriber_id = subscriber_id
+        self.topics: Tuple[str, ...] = tuple(topics)
+        self.maxsize = maxsize
+        self.delivered = 0
+        self.closed = False
+        self.close_reason: Optional[str] = None
+        self._feed = feed
+        self._items: Deque[PassthroughFrame] = deque()
+        self._waiter: Optional[asyncio.Future] = None
+
+    def offer(self, item: PassthroughFrame) -> bool:
+        """放入缓冲区；缓冲区已满时断开该订阅者并返回False"""
+        if self.closed:
+            return False
+        if len(self._items) >= self.maxsize:
+            self.close(CLOSE_SLOW_CONSUMER)
+            return False
+        self._items.append(item)
+        self._wake()
+        return True
+
+    def qsize(self) -> int:
+        return len(self._items)
+
+    async def get(self, timeout: Optional[float] = None) -> Optional[PassthroughFrame]:
+        """下一条事件；超时或订阅者已关闭返回None（上游停止前已缓冲的事件仍可取完）"""
+        if not self._items and not self.closed:
+            self._waiter = asyncio.get_running_loop().create_future()
+            try:
+                await asyncio.wait_for(self._waiter, timeout)
+            except asyncio.TimeoutError:
+                return None
+            finally:
+                self._waiter = None
+        if self._items:
+            self.delivered += 1
+            return self._items.popleft()
+        return None
+
+    def close(self, reason: Optional[str] = None):
+        if self.closed:
+            return
+        self.closed = True
+        self.close_reason = reason
+        if reason == CLOSE_SLOW_CONSUMER:
+            # 慢客户端直接断开，丢弃积压的事件
+            self._items.clear()
+            self._feed.hub.slow_disconnects += 1
+            logger.warning(f"Fan-out subscriber {self.subscriber_id} disconnected: {reason}")
+        self._feed.detach(self)
+        self._wake()
+
+    def _wake(self):
+        if self._waiter is not None and not self._waiter.done():
+            self._waiter.set_result(None)
+
+
+class _Feed:
+    """一个 (驱动, 建筑, 群组) 的上游订阅和分发任务"""
+
+    def __init__(self, hub: 'EventFanoutHub', driver, building_id: str, group_id: str):
+        self.hub = hub
+        self.driver = driver
+        self.building_id = building_id
+        self.group_id = group_id
+        self.subscribers: List[FanoutSubscriber] = []
+        self.topic_leases: Dict[FrozenSet[str], Tuple[str, int]] = {}  # 主题集 -> (租约ID, 引用数)
+        self.events = 0
+        self.stopped = False
+        # 主题过滤器 -> 订阅者，匹配耗时取决于主题层数而非订阅者数量
+        self._routes: TopicTrie[FanoutSubscriber] = TopicTrie()
+        self._lock = asyncio.Lock()
+        driver.passthrough.add_sink(building_id, group_id, self._on_frame, on_close=self.stop)
+
+    def _on_frame(self, item: PassthroughFrame):
+        """由驱动监听器调用：只看路由头中的主题，原始帧原样放入匹配订阅者的缓冲区"""
+        matched = self._routes.match(item.header.topic)
+        if not matched:
+            return
+        self.events += 1
+        # match 返回新列表，offer 因慢消费者关闭订阅者时修改前缀树不影响本次遍历
+        for subscriber in matched:
+            subscriber.offer(item)
+
+    def attach(self, subscriber: FanoutSubscriber):
+        self.subscribers.append(subscriber)
+        for topic_filter in subscriber.topics:
+            self._routes.add(topic_filter, subscriber)
+
+    async def acquire_topics(self, topics: FrozenSet[str]):
+        async with self._lock:
+            lease = self.topic_leases.get(topics)
+            if lease is None:
+                lease_id = await self.driver.subscribe_continuous(self.building_id, list(topics), self.group_id)
+                self.topic_leases[topics] = (lease_id, 1)
+            else:
+                self.topic_leases[topics] = (lease[0], lease[1] + 1)
+
+    def detach_only(self, subscriber: FanoutSubscriber):
+        """移除订阅者但不释放主题（主题尚未登记成功时使用）"""
+        if subscriber in self.subscribers:
+            self.subscribers.remove(subscriber)
+            for topic_filter in subscriber.topics:
+                self._routes.remove(topic_filter, subscriber)
+
+    def detach(self, subscriber: FanoutSubscriber):
+        self.detach_only(subscriber)
+        asyncio.ensure_future(self._release_topics(frozenset(subscriber.topics)))
+
+    async def _release_topics(self, topics: FrozenSet[str]):
+        async with self._lock:
+            lease = self.topic_leases.get(topics)
+            if lease is not None:
+                if lease[1] > 1:
+                    self.topic_leases[topics] = (lease[0], lease[1] - 1)
+                else:
+                    del self.topic_leases[topics]
+                    await self.driver.unsubscribe_continuous(lease[0])
+            if not self.subscribers and not self.topic_leases:
+                self.stop()
+
+    def stop(self):
+        """停止分发（驱动关闭或没有订阅者），仍在的订阅者以 upstream feed stopped 关闭"""
+        if self.stopped:
+            return
+        self.stopped = True
+        self.hub._remove_feed(self)
+        self.driver.passthrough.remove_sink(self.building_id, self.group_id, self._on_frame)
+        for subscriber in list(self.subscribers):
+            subscriber.close(CLOSE_FEED_STOPPED)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'building_id': self.building_id,
+            'group_id': self.group_id,
+            'subscribers': len(self.subscribers),
+            'topic_sets': [sorted(topics) for topics in self.topic_leases],
+            'events': self.events,
+            'max_buffered': max((subscriber.qsize() for subscriber in self.subscribers), default=0)
+        }
+
+
+class EventFanoutHub:
+    """本地事件订阅中心：上游订阅数随建筑数增长，与客户端数无关"""
+
+    def __init__(self, buffer_size: int = DEFAULT_SUBSCRIBER_BUFFER):
+        self.buffer_size = buffer_size
+        self.slow_disconnects = 0
+        self._feeds: Dict[Tuple[int, str, str], _Feed] = {}
+        self._ids = itertools.count(1)
+
+    async def subscribe(self, driver, building_id: str, group_id: Optional[str],
+                        topics: Iterable[str], buffer_size: Optional[int] = None) -> FanoutSubscriber:
+        """登记一个本地订阅者；该建筑群组的上游订阅不存在时建立"""
+        topics = minimal_topics(topics)
+        if not topics:
+            raise ValueError("At least one subtopic is required")
+        group_id = str(group_id or '1')
+        key = (id(driver), building_id, group_id)
+        feed = self._feeds.get(key)
+        if feed is None:
+            feed = self._feeds[key] = _Feed(self, driver, building_id, group_id)
+
+        subscriber = FanoutSubscriber(f"sub-{next(self._ids)}", feed, topics, buffer_size or self.buffer_size)
+        feed.attach(subscriber)
+        try:
+            await feed.acquire_topics(frozenset(topics))
+        except Exception:
+            feed.detach_only(subscriber)
+            if not feed.subscribers and not feed.topic_leases:
+                feed.stop()
+            raise
+        return subscriber
+
+    def _remove_feed(self, feed: _Feed):
+        for key, existing in list(self._feeds.items()):
+            if existing is feed:
+                del self._feeds[key]
+
+    def stats(self) -> Dict[str, Any]:
+        feeds = list(self._feeds.values())
+        return {
+            'upstream_feeds': len(feeds),
+            'subscribers': sum(len(feed.subscribers) for feed in feeds),
+            'slow_disconnects': self.slow_disconnects,
+            'feeds': [feed.stats() for feed in feeds]
+        }
+
+    def close(self):
+        for feed in list(self._feeds.values()):
+            feed.stop()
@@ -0,0 +1,211 @@
+"""
+证据日志后台写入器
+证据记录先进入有界内存队列，由后台线程按数量或时间批量写入JSONL文件，并按大小轮转
+事件循环上的调用方只做入队操作，不再每条记录打开/关闭一次文件
+"""
+
+import asyncio
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+from typing import List, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+# 队列中的控制标记
+_STOP = object()
+
+
+class EvidenceWriter:
+    """有界队列 + 批量提交 + 文件轮转的证据写入器"""
+
+    def __init__(self, path: str = 'kone_validation.log', max_queue: int = 10000,
+                 batch_size: int = 256, flush_interval: float = 0.5,
+                 max_bytes: int = 50 * 1024 * 1024, backup_count: int = 5,
+                 fsync: bool = False):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.fsync = fsync
+
+        # 统计信息
+        self.written = 0
+        self.dropped = 0
+        self.write_failed = 0  # 写文件失败而丢失的记录数
+        self.batches = 0
+
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue)
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self._file = None
+        self._size = 0
+        self._closed = False
+
+    def write(self, line: Union[bytes, str]) -> bool:
+        """提交一行证据（UTF-8字节或str），队列已满时丢弃并计数，绝不阻塞调用方"""
+        if self._closed:
+            return False
+        self._ensure_started()
+
+        try:
+            self._queue.put_nowait(line)
+            return True
+        except queue.Full:
+            self.dropped += 1
+            if self.dropped == 1 or self.dropped % 1000 == 0:
+                logger.warning(f"Evidence queue full, dropped {self.dropped} records so far")
+            return False
+
+    def flush(self, timeout: Optional[float] = 5.0) -> bool:
+        """等待当前已入队的记录全部落盘（阻塞调用线程，事件循环中请用 aflush）"""
+        if self._thread is None or not self._thread.is_alive():
+            return True
+        done = threading.Event()
+        try:
+            self._queue.put(done, timeout=timeout)
+        except queue.Full:
+            return False
+        return done.wait(timeout)
+
+    async def aflush(self, timeout: Optional[float] = 5.0) -> bool:
+        """flush 的异步版本：在线程池中等待，不阻塞事件循环"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self.flush, timeout)
+
+    def close(self, timeout: Optional[float] = 5.0):
+        """写完剩余记录并停止后台线程"""
+        if self._closed:
+            return
+        self._closed = True
+        if self._thread is not None and self._thread.is_alive():
+            # 关闭标记必须入队，队列满时等待写线程腾出空间
+            self._queue.put(_STOP)
+            self._thread.join(timeout)
+
+    def stats(self) -> dict:
+        """写入统计"""
+        return {
+            'written': self.written,
+            'dropped': self.dropped,
+            'write_failed': self.write_failed,
+            'batches': self.batches,
+            'queued': self._queue.qsize()
+        }
+
+    def _ensure_started(self):
+        """首次写入时启动后台线程"""
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='evidence-writer', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        """后台线程：收集一批记录后统一写入"""
+        running = True
+        while running:
+            try:
+                item = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                continue
+
+            batch: List[Union[bytes, str]] = []
+            waiters: List[threading.Event] = []
+            deadline = time.monotonic() + self.flush_interval
+
+            while True:
+                if item is _STOP:
+                    running = False
+                    break
+                if isinstance(item, threading.Event):
+                    # flush请求：立即提交当前批次
+                    waiters.append(item)
+                    break
+                batch.append(item)
+                if len(batch) >= self.batch_size:
+                    break
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+
+            if batch:
+                self._write_batch(batch)
+            for waiter in waiters:
+                waiter.set()
+
+        self._close_file()
+
+    def _write_batch(self, batch: List[Union[bytes, str]]):
+        """将一批记录写入文件，必要时先轮转"""
+        data = b''.join(item if isinstance(item, bytes) else item.encode('utf-8') for item in batch)
+        try:
+            if self._file is None:
+                self._open_file()
+            if self.max_bytes and self._size and self._size + len(data) > self.max_bytes:
+                self._rotate()
+
+            self._file.write(data)
+            self._file.flush()
+            if self.fsync:
+                os.fsync(self._file.fileno())
+
+            self._size += len(data)
+            self.written += len(batch)
+            self.batches += 1
+        except Exception as e:
+            self.write_failed += len(batch)
+            logger.error(f"Failed to write evidence, dropped {len(batch)} records "
+                         f"({self.write_failed} so far): {e}")
+            self._close_file()
+
+    def _open_file(self):
+        self._file = open(self.path, 'ab')
+        self._size = self._file.tell()
+
+    def _close_file(self):
+        if self._file is not None:
+            try:
+                self._file.close()
+            except Exception:
+                pass
+            self._file = None
+
+    def _rotate(self):
+        """按 path.1 ... path.N 轮转日志文件"""
+        self._close_file()
+        if self.backup_count > 0:
+            for index in range(self.backup_count - 1, 0, -1):
+                source = f"{self.path}.{index}"
+                if os.path.exists(source):
+                    os.replace(source, f"{self.path}.{index + 1}")
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+        self._open_file()
+
+
+# 进程级共享写入器
+_default_writer: Optional[EvidenceWriter] = None
+_default_lock = threading.Lock()
+
+
+def get_evidence_writer() -> EvidenceWriter:
+    """获取进程共享的证据写入器"""
+    global _default_writer
+    if _default_writer is None:
+        with _default_lock:
+            if _default_writer is None:
+                _default_writer = EvidenceWriter()
+                atexit.register(_default_writer.close)
+    return _default_writer
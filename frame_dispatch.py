@@ -0,0 +1,196 @@
+"""
+WebSocket 帧分发表
+监控帧只解码正文之前的顶层头部（type / callType / requestId / 主题 / 建筑 / 群组）用于路由，
+正文在消费者读取时才完整解码；按 type / callType / 主题前缀 / 主题过滤器查表决定事件的通道和分类。
+分类只记录在 Event 上，物化时返回带 callType 的副本，不修改共享的原始数据
+"""
+
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+import json_codec
+from event_bus import CHANNEL_ACTION, CHANNEL_GENERAL, CHANNEL_SUBSCRIPTION, Event
+from topic_trie import TopicTrie
+
+# (通道, 分类)；分类即物化时写入的 callType，None 表示保持原样
+Route = Tuple[str, Optional[str]]
+
+ROUTE_ACTION: Route = (CHANNEL_ACTION, 'action')
+ROUTE_SUBSCRIPTION: Route = (CHANNEL_SUBSCRIPTION, 'subscription')
+ROUTE_NOTIFICATION: Route = (CHANNEL_SUBSCRIPTION, 'notification')
+ROUTE_GENERAL: Route = (CHANNEL_GENERAL, None)
+
+
+def ping_key(request_id: Any) -> str:
+    """ping在pending_requests中的关联键，避免与状态确认的requestId冲突"""
+    return f"ping:{request_id}"
+
+
+class Frame:
+    """一帧：原始文本 + 顶层头部字段，正文在第一次读取 data 时才完整解码（解码结果只读共享）"""
+
+    __slots__ = ('raw', 'header', '_data')
+
+    def __init__(self, raw: Union[str, bytes], header: dict, data: Optional[dict] = None):
+        self.raw = raw
+        self.header = header
+        self._data = data
+
+    @property
+    def decoded(self) -> bool:
+        return self._data is not None
+
+    @property
+    def data(self) -> dict:
+        if self._data is None:
+            data = json_codec.loads(self.raw)
+            if not isinstance(data, dict):
+                raise ValueError(f"Unexpected frame: {self.raw!r}")
+            self._data = data
+        return self._data
+
+    @property
+    def monitoring(self) -> bool:
+        return is_monitoring_header(self.header)
+
+
+def is_monitoring_header(header: dict) -> bool:
+    """site-monitoring 推送：带主题，或 type 为 monitor-*，或 callType 为 monitor"""
+    if header.get('subtopic') or header.get('topic') or header.get('callType') == 'monitor':
+        return True
+    event_type = header.get('type')
+    return isinstance(event_type, str) and event_type.startswith('monitor-')
+
+
+def _routable_header(header: Any) -> bool:
+    """头部足以路由监控帧：是监控帧，且主题、建筑和群组都在正文之前（否则需要完整解码才能拿到）"""
+    return isinstance(header, dict) and is_monitoring_header(header) \
+        and bool(header.get('subtopic') or header.get('topic')) \
+        and 'buildingId' in header and 'groupId' in header
+
+
+def _ends_with_body(text: str) -> bool:
+    """最后一个顶层字段的值是对象/数组，即正文之后没有标量字段
+    （标量以引号、数字或字母结尾，不会以 } / ] 结尾）"""
+    text = text.rstrip()
+    if not text.endswith('}'):
+        return False
+    last = text[:-1].rstrip()
+    return bool(last) and last[-1] in '}]'
+
+
+def _body_start(text: str) -> int:
+    """顶层第一个对象/数组值的起始位置，没有时返回-1"""
+    brace = text.find('{', 1)
+    bracket = text.find('[', 1)
+    if bracket != -1 and (brace == -1 or bracket < brace):
+        return bracket
+    return brace
+
+
+def parse_frame(raw: Union[str, bytes]) -> Frame:
+    """解析一帧：路由字段都在正文之前、正文之后没有标量字段的监控帧只解码顶层头部，
+    其他帧（响应、呼叫事件、字段顺序不同的监控帧等）完整解码；无法解析时抛出 ValueError。
+    不逐字符扫描顶层键：纯Python扫描比 orjson 完整解码还慢"""
+    text = raw if isinstance(raw, str) else bytes(raw).decode('utf-8')
+    body = _body_start(text)
+    if body > 0 and _ends_with_body(text):
+        cut = text.rfind(',', 0, body)
+        if cut > 0:
+            try:
+                header = json_codec.loads(text[:cut] + '}')
+            except ValueError:
+                header = None
+            if _routable_header(header):
+                return Frame(raw, header)
+    data = json_codec.loads(text)
+    if not isinstance(data, dict):
+        raise ValueError(f"Unexpected frame: {raw!r}")
+    return Frame(raw, data, data)
+
+
+def frame_correlation_id(frame: Frame) -> Optional[Any]:
+    """帧的关联键；监控帧只看顶层 requestId，不为此解码正文"""
+    if not frame.decoded:
+        return frame.header.get('requestId') or None
+    return correlation_id(frame.data)
+
+
+def correlation_id(data: dict) -> Optional[Any]:
+    """响应帧的关联键：ping结果 / requestId / payload.request_id，普通事件返回None"""
+    if data.get('callType') == 'ping':
+        event_data = data.get('data')
+        if isinstance(event_data, dict) and event_data.get('request_id'):
+            return ping_key(event_data['request_id'])
+    request_id = data.get('requestId')
+    if request_id:
+        return request_id
+    payload = data.get('payload')
+    if isinstance(payload, dict):
+        return payload.get('request_id') or None
+    return None
+
+
+class FrameDispatcher:
+    """事件分类表：呼叫事件 > type > eventType > 主题过滤器 > 主题前缀 > callType > 默认"""
+
+    def __init__(self):
+        self.type_routes: Dict[str, Route] = {
+            # 呼叫状态事件带 session_id，与呼叫事件同走 action 通道
+            'monitor-call-state': ROUTE_ACTION,
+            'liftStatus': ROUTE_SUBSCRIPTION,
+            'robotStatus': ROUTE_SUBSCRIPTION,
+            'monitor-lift-status': ROUTE_SUBSCRIPTION,
+        }
+        self.call_type_routes: Dict[str, Route] = {
+            # 其余 site-monitoring 推送（位置、呼叫状态等）同样进入订阅通道，可按主题合并
+            'monitor': ROUTE_SUBSCRIPTION,
+        }
+        self.topic_routes: List[Tuple[str, Route]] = []
+        # 主题过滤器（支持 + / #）-> (登记序号, 分类)，多条匹配时先登记的优先
+        self.topic_filters: TopicTrie[Tuple[int, Route]] = TopicTrie()
+        self.default_route: Route = ROUTE_GENERAL
+
+    def route(self, route: Route, type: Optional[str] = None, call_type: Optional[str] = None,
+              topic_prefix: Optional[str] = None, topic_filter: Optional[str] = None):
+        """注册一条分类规则；topic_filter 为 MQTT 风格过滤器，如 lift_+/doors"""
+        if type is not None:
+            self.type_routes[type] = route
+        if call_type is not None:
+            self.call_type_routes[call_type] = route
+        if topic_prefix is not None:
+            self.topic_routes.append((topic_prefix, route))
+        if topic_filter is not None:
+            self.topic_filters.add(topic_filter, (len(self.topic_filters), route))
+
+    def classify(self, frame: Union[Frame, dict]) -> Route:
+        """按顶层字段分类，结果与帧是否已被其他消费者解码无关：
+        只有非监控帧（总是完整解码）才检查正文中的 session_id，监控帧只看头部"""
+        data = frame.header if isinstance(frame, Frame) else frame
+        if not is_monitoring_header(data):
+            event_data = data.get('data')
+            if isinstance(event_data, dict) and 'session_id' in event_data:
+                return ROUTE_ACTION
+
+        route = self.type_routes.get(data.get('type'))
+        if route is not None:
+            return route
+        if 'eventType' in data:
+            return ROUTE_NOTIFICATION
+
+        if self.topic_routes or self.topic_filters:
+            topic = data.get('subtopic') or data.get('topic')
+            if isinstance(topic, str):
+                if self.topic_filters:
+                    matched = self.topic_filters.match(topic)
+                    if matched:
+                        return min(matched)[1]
+                for prefix, topic_route in self.topic_routes:
+                    if topic.startswith(prefix):
+                        return topic_route
+
+        return self.call_type_routes.get(data.get('callType'), self.default_route)
+
+    def dispatch(self, frame: Union[Frame, dict]) -> Event:
+        """分类并包装为未物化的 Event"""
+        channel, kind = self.classify(frame)
+        return Event(channel, kind, frame)
@@ -0,0 +1,124 @@
+"""
+原始帧直通
+监听器只解析了头部的监控帧，连同原始帧文本和最小路由头（建筑、群组、主题、电梯、类型）交给直通接收者；
+下游扇出只看路由头做过滤，把同一份原始帧原样转发给所有匹配的客户端，不再反序列化/重新序列化
+"""
+
+import logging
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+from lift_state import lift_id_of
+
+logger = logging.getLogger(__name__)
+
+
+class RoutingHeader:
+    """路由头：过滤所需的全部字段"""
+
+    __slots__ = ('building_id', 'group_id', 'topic', 'lift_id', 'type')
+
+    def __init__(self, building_id: str, group_id: str, topic: str,
+                 lift_id: Optional[str], type: Optional[str]):
+        self.building_id = building_id
+        self.group_id = group_id
+        self.topic = topic
+        self.lift_id = lift_id
+        self.type = type
+
+
+def routing_header(header: dict, payload: Optional[dict] = None) -> Optional[RoutingHeader]:
+    """从帧的顶层字段取路由头；没有主题的帧（响应、呼叫事件等）不直通。
+    电梯ID优先取自主题，正文已解码时才回退到负载中的 lift_id"""
+    topic = header.get('subtopic') or header.get('topic')
+    if not isinstance(topic, str):
+        return None
+    return RoutingHeader(
+        header.get('buildingId') or '',
+        str(header.get('groupId') or '1'),
+        topic,
+        lift_id_of(header, payload if isinstance(payload, dict) else {}),
+        header.get('type')
+    )
+
+
+class PassthroughFrame:
+    """原始帧 + 路由头，所有下游共享同一个对象"""
+
+    __slots__ = ('header', 'frame')
+
+    def __init__(self, header: RoutingHeader, frame: Union[str, bytes]):
+        self.header = header
+        self.frame = frame
+
+    @property
+    def text(self) -> str:
+        # WebSocket文本帧本身就是str，只有二进制帧才需要解码
+        frame = self.frame
+        return frame if isinstance(frame, str) else frame.decode('utf-8')
+
+
+FrameSink = Callable[[PassthroughFrame], None]
+CloseCallback = Callable[[], None]
+GroupKey = Tuple[str, str]
+
+
+class FramePassthrough:
+    """按 (建筑, 群组) 登记的直通接收者，监听器每帧只做一次字典查找"""
+
+    def __init__(self):
+        self._sinks: Dict[GroupKey, List[Tuple[FrameSink, Optional[CloseCallback]]]] = {}
+        self.frames = 0
+        self.forwarded = 0
+
+    @property
+    def active(self) -> bool:
+        return bool(self._sinks)
+
+    def add_sink(self, building_id: str, group_id: Optional[str], sink: FrameSink,
+                 on_close: Optional[CloseCallback] = None):
+        """登记接收者；on_close 在驱动关闭时调用"""
+        self._sinks.setdefault((building_id, str(group_id or '1')), []).append((sink, on_close))
+
+    def remove_sink(self, building_id: str, group_id: Optional[str], sink: FrameSink):
+        key = (building_id, str(group_id or '1'))
+        sinks = [entry for entry in self._sinks.get(key, []) if entry[0] is not sink]
+        if sinks:
+            self._sinks[key] = sinks
+        else:
+            self._sinks.pop(key, None)
+
+    def publish(self, header: dict, frame: Union[str, bytes], payload: Optional[dict] = None) -> bool:
+        """把一帧交给对应建筑群组的接收者，没有接收者时返回False；header 为帧的顶层字段"""
+        header = routing_header(header, payload)
+        if header is None:
+            return False
+        sinks = self._sinks.get((header.building_id, header.group_id))
+        if not sinks:
+            return False
+        self.frames += 1
+        item = PassthroughFrame(header, frame)
+        for sink, _ in sinks:
+            try:
+                sink(item)
+                self.forwarded += 1
+            except Exception as e:
+                logger.error(f"Passthrough sink failed: {e}")
+        return True
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'sink_groups': len(self._sinks),
+            'frames': self.frames,
+            'forwarded': self.forwarded
+        }
+
+    def close(self):
+        """驱动关闭：通知所有接收者并清空"""
+        sinks, self._sinks = self._sinks, {}
+        for entries in sinks.values():
+            for _, on_close in entries:
+                if on_close is not None:
+                    try:
+                        on_close()
+                    except Exception as e:
+                        logger.error(f"Passthrough close callback failed: {e}")
@@ -0,0 +1,142 @@
+"""
+WebSocket 单写者发送循环
+每个连接只有一个写任务，按优先级通道排空发送队列：
+门操作与取消呼叫最先发送，其次是呼叫，最后是配置和监控类请求。
+写任务一次唤醒把同一通道中已就绪的帧连续写出、只等待一次缓冲区排空，并统计各通道的队列深度。
+批量写出依赖 websockets 12 legacy 协议对象（WebSocketCommonProtocol）的非公开方法
+write_frame_sync / ensure_open / drain，requirements.txt 固定了 websockets==12.0；
+连接对象没有这些方法时（如 websockets 13+ 的新实现）回退为逐帧调用公开的 send()
+"""
+
+import asyncio
+import logging
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from websockets.frames import Opcode
+
+import json_codec
+
+logger = logging.getLogger(__name__)
+
+# 发送通道，数值越小优先级越高
+LANE_URGENT = 0      # 开门保持 / 取消呼叫
+LANE_CALL = 1        # 电梯呼叫
+LANE_BACKGROUND = 2  # 配置、ping、监控订阅
+LANE_NAMES = ('urgent', 'call', 'background')
+
+URGENT_CALL_TYPES = frozenset({'hold_open', 'delete'})
+
+
+def frame_lane(message: dict) -> int:
+    """按消息类型选择发送通道"""
+    if message.get('type') == 'lift-call-api-v2':
+        return LANE_URGENT if message.get('callType') in URGENT_CALL_TYPES else LANE_CALL
+    return LANE_BACKGROUND
+
+
+class FrameSender:
+    """绑定到单个WebSocket连接的写任务"""
+
+    def __init__(self, websocket, max_batch: int = 32):
+        self.websocket = websocket
+        self.max_batch = max_batch
+        self.sent = 0
+        self.batches = 0
+        self.max_depth = 0
+
+        self._lanes: List[Deque[Tuple[bytes, asyncio.Future]]] = [deque() for _ in LANE_NAMES]
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = asyncio.create_task(self._run())
+        self._error: Optional[BaseException] = None
+
+    def depth(self) -> int:
+        return sum(len(lane) for lane in self._lanes)
+
+    async def send(self, message: dict, lane: Optional[int] = None):
+        """入队并等待该帧写出；连接已断开时抛出写入时的异常"""
+        if self._error is not None:
+            raise self._error
+        if lane is None:
+            lane = frame_lane(message)
+
+        future = asyncio.get_running_loop().create_future()
+        # 构建器生成的消息已带预序列化的帧；其余消息入队时即序列化为UTF-8字节
+        frame = getattr(message, 'frame', None) or json_codec.dumps_bytes(message)
+        self._lanes[lane].append((frame, future))
+        self.max_depth = max(self.max_depth, self.depth())
+        self._wakeup.set()
+        await future
+
+    def stats(self) -> Dict[str, Any]:
+        """各通道队列深度和发送统计"""
+        return {
+            'depth': {name: len(lane) for name, lane in zip(LANE_NAMES, self._lanes)},
+            'max_depth': self.max_depth,
+            'sent': self.sent,
+            'batches': self.batches
+        }
+
+    def close(self, error: Optional[BaseException] = None):
+        """停止写任务，队列中未发送的帧以 error 失败"""
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+        self._task = None
+        self._fail_all(error or ConnectionError("WebSocket sender closed"))
+
+    def _next_batch(self) -> List[Tuple[bytes, asyncio.Future]]:
+        """取出最高优先级非空通道中已就绪的帧，跳过已被取消的等待者"""
+        for lane in self._lanes:
+            batch = []
+            while lane and len(batch) < self.max_batch:
+                item = lane.popleft()
+                if not item[1].done():
+                    batch.append(item)
+            if batch:
+                return batch
+        return []
+
+    async def _run(self):
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            while True:
+                batch = self._next_batch()
+                if not batch:
+                    break
+                try:
+                    await self._write(batch)
+                except Exception as e:
+                    for _, future in batch:
+                        if not future.done():
+                            future.set_exception(e)
+                    # 连接已不可用，剩余帧同样失败
+                    self._fail_all(e)
+                    return
+                for _, future in batch:
+                    if not future.done():
+                        future.set_result(None)
+                self.sent += len(batch)
+                self.batches += 1
+
+    async def _write(self, batch: List[Tuple[bytes, asyncio.Future]]):
+        """连续写出一批帧，只在最后等待一次缓冲区排空；字节直接作为文本帧写出（legacy 协议内部接口，见模块说明）"""
+        websocket = self.websocket
+        write_frame_sync = getattr(websocket, 'write_frame_sync', None)
+        if write_frame_sync is None or not hasattr(websocket, 'ensure_open') or not hasattr(websocket, 'drain'):
+            for frame, _ in batch:
+                await websocket.send(frame.decode('utf-8'))
+            return
+
+        await websocket.ensure_open()
+        for frame, _ in batch:
+            write_frame_sync(True, Opcode.TEXT, frame)
+        await websocket.drain()
+
+    def _fail_all(self, error: BaseException):
+        self._error = error
+        for lane in self._lanes:
+            while lane:
+                _, future = lane.popleft()
+                if not future.done():
+                    future.set_exception(error)
@@ -0,0 +1,100 @@
+"""
+可插拔JSON编解码器
+安装了 orjson 时使用原生实现，否则回退到标准库 json；可通过环境变量 KONE_JSON_CODEC 指定。
+编码结果统一为UTF-8字节，WebSocket帧和证据日志直接写出字节，无需再转成 str
+"""
+
+import json
+import logging
+import os
+from typing import Any, Callable, Dict, List, Optional, Union
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - 可选依赖
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+JsonInput = Union[bytes, bytearray, memoryview, str]
+
+
+class JsonCodec:
+    """一组编解码函数：loads 接受 bytes 或 str，dumps_bytes 返回UTF-8字节"""
+
+    __slots__ = ('name', 'loads', 'dumps_bytes', 'dumps_pretty')
+
+    def __init__(self, name: str,
+                 loads: Callable[[JsonInput], Any],
+                 dumps_bytes: Callable[..., bytes],
+                 dumps_pretty: Callable[..., str]):
+        self.name = name
+        self.loads = loads
+        self.dumps_bytes = dumps_bytes
+        self.dumps_pretty = dumps_pretty
+
+    def dumps(self, obj: Any, default: Optional[Callable[[Any], Any]] = None) -> str:
+        return self.dumps_bytes(obj, default).decode('utf-8')
+
+
+def _stdlib_dumps_bytes(obj: Any, default: Optional[Callable[[Any], Any]] = None) -> bytes:
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':'), default=default).encode('utf-8')
+
+
+def _stdlib_dumps_pretty(obj: Any, default: Optional[Callable[[Any], Any]] = None) -> str:
+    return json.dumps(obj, indent=2, ensure_ascii=False, default=default)
+
+
+_CODECS: Dict[str, JsonCodec] = {
+    'json': JsonCodec('json', json.loads, _stdlib_dumps_bytes, _stdlib_dumps_pretty),
+}
+
+if orjson is not None:
+    _ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS
+
+    def _orjson_dumps_bytes(obj: Any, default: Optional[Callable[[Any], Any]] = None) -> bytes:
+        return orjson.dumps(obj, default=default, option=_ORJSON_OPTIONS)
+
+    def _orjson_dumps_pretty(obj: Any, default: Optional[Callable[[Any], Any]] = None) -> str:
+        return orjson.dumps(obj, default=default, option=_ORJSON_OPTIONS | orjson.OPT_INDENT_2).decode('utf-8')
+
+    _CODECS['orjson'] = JsonCodec('orjson', orjson.loads, _orjson_dumps_bytes, _orjson_dumps_pretty)
+
+
+def available_codecs() -> List[str]:
+    """当前环境可用的编解码器"""
+    return list(_CODECS.keys())
+
+
+def get_codec(name: Optional[str] = None) -> JsonCodec:
+    """按名称获取编解码器，未指定时优先使用原生实现"""
+    if name is None:
+        return _CODECS.get('orjson') or _CODECS['json']
+    if name not in _CODECS:
+        raise ValueError(f"JSON codec not available: {name}. Available codecs: {available_codecs()}")
+    return _CODECS[name]
+
+
+def set_codec(name: Optional[str] = None) -> JsonCodec:
+    """切换进程使用的编解码器"""
+    global codec, loads, dumps, dumps_bytes, dumps_pretty
+    codec = get_codec(name)
+    loads = codec.loads
+    dumps = codec.dumps
+    dumps_bytes = codec.dumps_bytes
+    dumps_pretty = codec.dumps_pretty
+    logger.info(f"JSON codec: {codec.name}")
+    return codec
+
+
+codec: JsonCodec
+loads: Callable[[JsonInput], Any]
+dumps: Callable[..., str]
+dumps_bytes: Callable[..., bytes]
+dumps_pretty: Callable[..., str]
+
+try:
+    set_codec(os.environ.get('KONE_JSON_CODEC') or None)
+except ValueError as e:
+    logger.warning(f"{e}, falling back to default codec")
+    set_codec()
@@ -7,6 +7,8 @@ from typing import Dict, List, Optional
 from dataclasses import dataclass
 import yaml
 
+from area_id_set import AreaIdSet
+
 @dataclass
 class VirtualBuilding:
     """虚拟建筑配置"""
@@ -15,7 +17,7 @@ class VirtualBuilding:
     purpose: str
     description: str
     group_ids: List[str] = None
-    area_ids: List[int] = None
+    area_ids: AreaIdSet = None  # 区间集合，连续区域不逐个展开
     terminal_ids: List[int] = None
     media_configs: List[Dict] = None
     special_features: List[str] = None
@@ -26,7 +28,7 @@ class MediaConfig:
     media_id: str
     media_cc: str = None
     media_type: str = "RFID"
-    floors: List[int] = None
+    floors: AreaIdSet = None
 
 class KoneVirtualBuildingManager:
     """KONE虚拟建筑配置管理器"""
@@ -56,7 +58,7 @@ class KoneVirtualBuildingManager:
             purpose="测试直通型轿厢呼叫 (Through-Type Car Calls)",
             description="用于呼叫1200-12010，测试直通型轿厢呼叫功能",
             group_ids=["1"],
-            area_ids=list(range(1200, 12011)),
+            area_ids=AreaIdSet.closed_range(1200, 12010),
             special_features=["through_car_calls"]
         )
         
@@ -67,29 +69,30 @@ class KoneVirtualBuildingManager:
             purpose="测试转运呼叫 (Transfer Calls)",
             description="用于呼叫10000-40000，测试转运呼叫功能",
             group_ids=["1"],
-            area_ids=list(range(10000, 40001)),
+            area_ids=AreaIdSet.closed_range(10000, 40000),
             special_features=["transfer_calls"]
         )
         
         # 4. 门禁测试 (Access Control)
+        access_areas = AreaIdSet.closed_range(40000, 41000)
         buildings["access_control"] = VirtualBuilding(
             building_id="joykVHPoOW7",
             name="门禁测试建筑",
             purpose="测试门禁控制 (Access Control)",
             description="用于测试RFID门禁系统，支持多种Media配置",
             group_ids=["1"],
-            area_ids=list(range(40000, 41001)),
+            area_ids=access_areas,
             media_configs=[
                 {
                     "media_id": "0009",
                     "media_cc": "2b", 
                     "media_type": "RFID",
-                    "floors": list(range(40000, 41001))
+                    "floors": access_areas
                 },
                 {
                     "media_id": "0007",
                     "media_type": "RFID",
-                    "floors": list(range(40000, 41001))
+                    "floors": access_areas
                 }
             ],
             special_features=["access_control", "rfid_media"]
@@ -103,7 +106,7 @@ class KoneVirtualBuildingManager:
             description="支持多个群组和终端的复杂配置测试",
             group_ids=["1", "2"],
             terminal_ids=[10011, 11013],
-            area_ids=[53000, 54000, 55000, 56000, 17020, 18020, 19020],
+            area_ids=AreaIdSet([53000, 54000, 55000, 56000, 17020, 18020, 19020]),
             special_features=["multi_group", "multiple_terminals"]
         )
         
@@ -185,7 +188,7 @@ class KoneVirtualBuildingManager:
                 summary.append(f"- **Group IDs**: {', '.join(building.group_ids)}")
             
             if building.area_ids:
-                area_range = f"{min(building.area_ids)}-{max(building.area_ids)}"
+                area_range = f"{building.area_ids.first}-{building.area_ids.last}"
                 summary.append(f"- **Area IDs**: {area_range} ({len(building.area_ids)}个)")
             
             if building.terminal_ids:
@@ -0,0 +1,191 @@
+"""
+电梯实时状态存储
+由 site-monitoring 推送的 monitor-lift-status / lift-position / door-state / deck-position /
+next-stop-eta 事件持续更新每个 建筑/群组/电梯 的状态，每次更新递增版本号；
+模式、位置、门状态查询直接读内存快照，不再每次订阅并等待事件
+"""
+
+import asyncio
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+# 事件类型 -> 状态中的分区
+LIFT_STATE_EVENT_TYPES = {
+    'monitor-lift-status': 'status',
+    'monitor-lift-position': 'position',
+    'monitor-door-state': 'doors',
+    'monitor-deck-position': 'deck_position',
+    'monitor-next-stop-eta': 'next_stop_eta',
+}
+
+# 维持状态所需的订阅主题
+LIFT_STATE_SUBTOPICS = [
+    'lift_+/status',
+    'lift_+/position',
+    'lift_+/doors',
+    'lift_+/deck_position',
+    'lift_+/next_stop_eta',
+]
+
+GroupKey = Tuple[str, str]
+
+
+def lift_id_of(event: dict, payload: dict) -> Optional[str]:
+    """电梯ID：优先取主题 lift_1/status 中的编号，其次取负载中的 lift_id"""
+    topic = event.get('subtopic') or event.get('topic')
+    if isinstance(topic, str) and topic.startswith('lift_'):
+        return topic[5:].split('/', 1)[0]
+    lift_id = payload.get('lift_id')
+    return str(lift_id) if lift_id is not None else None
+
+
+class LiftState:
+    """单部电梯的当前状态，snapshot() 按版本缓存"""
+
+    __slots__ = ('building_id', 'group_id', 'lift_id', 'version', 'updated_at',
+                 'status', 'position', 'deck_position', 'next_stop_eta', 'doors', '_snapshot')
+
+    def __init__(self, building_id: str, group_id: str, lift_id: str):
+        self.building_id = building_id
+        self.group_id = group_id
+        self.lift_id = lift_id
+        self.version = 0
+        self.updated_at: Optional[float] = None
+        self.status: Dict[str, Any] = {}
+        self.position: Dict[str, Any] = {}
+        self.deck_position: Dict[str, Any] = {}
+        self.next_stop_eta: Dict[str, Any] = {}
+        self.doors: Dict[str, Dict[str, Any]] = {}  # "区域:侧" -> 门状态
+        self._snapshot: Optional[Dict[str, Any]] = None
+
+    @property
+    def mode(self) -> Optional[Any]:
+        return self.status.get('lift_mode')
+
+    @property
+    def fault_active(self) -> Optional[bool]:
+        return self.status.get('fault_active')
+
+    def apply(self, section: str, payload: Dict[str, Any], received_at: float):
+        if section == 'doors':
+            door_key = f"{payload.get('area')}:{payload.get('lift_side', 1)}"
+            self.doors[door_key] = dict(payload)
+        else:
+            setattr(self, section, dict(payload))
+        self.version += 1
+        self.updated_at = received_at
+        self._snapshot = None
+
+    def snapshot(self) -> Dict[str, Any]:
+        """当前版本的只读视图（同一版本重复读取返回同一个字典，调用方不应修改）"""
+        if self._snapshot is None:
+            self._snapshot = {
+                'lift_id': self.lift_id,
+                'version': self.version,
+                'updated_at': self.updated_at,
+                'mode': self.mode,
+                'fault_active': self.fault_active,
+                'status': self.status,
+                'position': self.position,
+                'deck_position': self.deck_position,
+                'next_stop_eta': self.next_stop_eta,
+                'doors': list(self.doors.values())
+            }
+        return self._snapshot
+
+
+class LiftStateStore:
+    """按 (建筑, 群组) 组织的电梯状态，由监听器调用 apply() 更新"""
+
+    def __init__(self):
+        self._groups: Dict[GroupKey, Dict[str, LiftState]] = {}
+        self._versions: Dict[GroupKey, int] = {}
+        self._updated_at: Dict[GroupKey, float] = {}
+        self._waiters: Dict[GroupKey, List[asyncio.Future]] = {}
+        self.applied = 0
+
+    def apply(self, event: dict) -> Optional[LiftState]:
+        """应用一条监控事件；不是电梯状态事件时返回None"""
+        section = LIFT_STATE_EVENT_TYPES.get(event.get('type'))
+        if section is None:
+            return None
+        payload = event.get('data')
+        if not isinstance(payload, dict):
+            payload = event.get('payload')
+        if not isinstance(payload, dict):
+            return None
+        lift_id = lift_id_of(event, payload)
+        if lift_id is None:
+            return None
+
+        key = (event.get('buildingId') or '', str(event.get('groupId') or '1'))
+        lifts = self._groups.setdefault(key, {})
+        state = lifts.get(lift_id)
+        if state is None:
+            state = lifts[lift_id] = LiftState(key[0], key[1], lift_id)
+
+        now = time.time()
+        state.apply(section, payload, now)
+        self._versions[key] = self._versions.get(key, 0) + 1
+        self._updated_at[key] = now
+        self.applied += 1
+
+        waiters = self._waiters.pop(key, None)
+        if waiters:
+            for waiter in waiters:
+                if not waiter.done():
+                    waiter.set_result(state)
+        return state
+
+    def get(self, building_id: str, group_id: Optional[str], lift_id: Any) -> Optional[LiftState]:
+        return self._groups.get((building_id, group_id or '1'), {}).get(str(lift_id))
+
+    def lifts(self, building_id: str, group_id: Optional[str] = None) -> Dict[str, LiftState]:
+        return dict(self._groups.get((building_id, group_id or '1'), {}))
+
+    def version(self, building_id: str, group_id: Optional[str] = None) -> int:
+        return self._versions.get((building_id, group_id or '1'), 0)
+
+    def updated_at(self, building_id: str, group_id: Optional[str] = None) -> Optional[float]:
+        """该群组最后一次更新的时间戳（epoch秒），没有状态时为None"""
+        return self._updated_at.get((building_id, group_id or '1'))
+
+    def modes(self, building_id: str, group_id: Optional[str] = None) -> Dict[str, Any]:
+        """各电梯的 lift_mode（只包含收到过状态事件的电梯）"""
+        return {
+            lift_id: state.mode
+            for lift_id, state in self._groups.get((building_id, group_id or '1'), {}).items()
+            if state.status
+        }
+
+    def snapshot(self, building_id: str, group_id: Optional[str] = None) -> Dict[str, Any]:
+        """群组快照：版本号、最后更新时间和各电梯状态"""
+        key = (building_id, group_id or '1')
+        return {
+            'building_id': building_id,
+            'group_id': key[1],
+            'version': self._versions.get(key, 0),
+            'updated_at': self._updated_at.get(key),
+            'lifts': {lift_id: state.snapshot() for lift_id, state in self._groups.get(key, {}).items()}
+        }
+
+    async def wait_for_update(self, building_id: str, group_id: Optional[str] = None,
+                              timeout: float = 10.0) -> Optional[LiftState]:
+        """等待该群组的下一次更新，超时返回None"""
+        key = (building_id, group_id or '1')
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.setdefault(key, []).append(waiter)
+        try:
+            return await asyncio.wait_for(waiter, timeout)
+        except asyncio.TimeoutError:
+            return None
+        finally:
+            waiters = self._waiters.get(key)
+            if waiters and waiter in waiters:
+                waiters.remove(waiter)
+
+    def clear(self, building_id: Optional[str] = None):
+        for key in [key for key in self._groups if building_id is None or key[0] == building_id]:
+            # 版本号保留，重新收到事件后继续递增
+            self._groups.pop(key, None)
+            self._updated_at.pop(key, None)
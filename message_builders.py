@@ -0,0 +1,171 @@
+"""
+WebSocket API v2 消息构建器
+按 elevator-websocket-api-v2.yaml 手工编写的 common-api / site-monitoring / lift-call-api-v2 消息字段，
+tests/test_message_builders.py 用规范中的消息定义校验构建结果（字段名、类型、枚举和必填项）。
+消息头（type/buildingId/callType/groupId）按建筑和群组预先序列化并缓存，发送时只拼接可变字段；
+request_id 由进程内单调递增的生成器分配，同一连接内不会重复
+"""
+
+import itertools
+import time
+from functools import lru_cache
+from typing import Any, Dict, List, Optional
+
+import json_codec
+
+# 与原先随机生成的 request_id 保持同样的9位数字范围
+REQUEST_ID_MIN = 100000000
+REQUEST_ID_MAX = 999999999
+
+
+class RequestIdGenerator:
+    """单调递增、不重复的数字 request_id（到达上限后回绕）"""
+
+    def __init__(self, start: Optional[int] = None):
+        span = REQUEST_ID_MAX - REQUEST_ID_MIN + 1
+        if start is None:
+            # 以启动时刻为起点，进程重启后不会从同一个值开始
+            start = time.time_ns() // 1_000_000
+        self._offset = (start - REQUEST_ID_MIN) % span
+        self._span = span
+        # itertools.count 的递增在GIL下是原子的，多线程共享也不会重复
+        self._counter = itertools.count(self._offset)
+
+    def next(self) -> int:
+        return REQUEST_ID_MIN + next(self._counter) % self._span
+
+
+_timestamp_second = -1
+_timestamp_prefix = ''
+
+
+def utc_timestamp() -> str:
+    """ISO 8601 UTC时间戳（微秒精度，Z结尾），同一秒内复用已格式化的日期部分"""
+    global _timestamp_second, _timestamp_prefix
+    now_ns = time.time_ns()
+    second, remainder = divmod(now_ns, 1_000_000_000)
+    if second != _timestamp_second:
+        _timestamp_prefix = time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(second))
+        _timestamp_second = second
+    return f"{_timestamp_prefix}.{remainder // 1000:06d}Z"
+
+
+class BuiltMessage(dict):
+    """构建好的消息：仍是普通dict（证据记录、重发都照常使用），同时携带预序列化的帧。
+    通过下标修改顶层字段会丢弃预序列化的帧；修改嵌套的payload前请调用 invalidate()"""
+
+    __slots__ = ('frame',)
+
+    def __init__(self, fields: Dict[str, Any], frame: Optional[bytes]):
+        super().__init__(fields)
+        self.frame = frame
+
+    def invalidate(self):
+        self.frame = None
+
+    def __setitem__(self, key, value):
+        self.frame = None
+        super().__setitem__(key, value)
+
+    def __delitem__(self, key):
+        self.frame = None
+        super().__delitem__(key)
+
+
+@lru_cache(maxsize=1024)
+def _header(message_type: str, building_id: str, call_type: str, group_id: str) -> bytes:
+    """预序列化的消息头，末尾留给可变字段：b'{"type":...,"groupId":"1",'"""
+    encoded = json_codec.dumps_bytes({
+        'type': message_type,
+        'buildingId': building_id,
+        'callType': call_type,
+        'groupId': group_id
+    })
+    return encoded[:-1] + b','
+
+
+class MessageBuilder:
+    """各类API消息的构建器，所有驱动默认共享同一个 request_id 生成器"""
+
+    def __init__(self, request_ids: Optional[RequestIdGenerator] = None):
+        self.request_ids = request_ids or default_request_ids
+
+    def _build(self, message_type: str, building_id: str, call_type: str, group_id: Optional[str],
+               payload: Dict[str, Any], request_id: Optional[str] = None) -> BuiltMessage:
+        group_id = group_id or '1'
+        fields = {
+            'type': message_type,
+            'buildingId': building_id,
+            'callType': call_type,
+            'groupId': group_id
+        }
+        frame = _header(message_type, building_id, call_type, group_id)
+        if request_id is not None:
+            fields['requestId'] = request_id
+            frame += b'"requestId":' + json_codec.dumps_bytes(request_id) + b','
+        fields['payload'] = payload
+        frame += b'"payload":' + json_codec.dumps_bytes(payload) + b'}'
+        return BuiltMessage(fields, frame)
+
+    def common_api(self, building_id: str, call_type: str, group_id: Optional[str] = None) -> BuiltMessage:
+        """common-api 请求（config / actions / ping），payload中是数字request_id"""
+        request_id = self.request_ids.next()
+        # common-api的requestId必须是字符串
+        return self._build('common-api', building_id, call_type, group_id,
+                           {'request_id': request_id}, str(request_id))
+
+    def site_monitoring(self, building_id: str, subtopics: List[str], duration: int = 300,
+                        group_id: Optional[str] = None, sub: Optional[str] = None) -> BuiltMessage:
+        """site-monitoring 订阅请求"""
+        payload = {
+            'sub': sub or f'monitor_{int(time.time())}',
+            'duration': min(duration, 300),
+            'subtopics': subtopics
+        }
+        return self._build('site-monitoring', building_id, 'monitor', group_id,
+                           payload, str(self.request_ids.next()))
+
+    def lift_call(self, building_id: str, area: int, action: int,
+                  destination: Optional[int] = None, delay: Optional[int] = None,
+                  allowed_lifts: Optional[List[int]] = None, group_size: int = 1,
+                  terminal: int = 1, group_id: Optional[str] = None) -> BuiltMessage:
+        """lift-call-api-v2 action 呼叫"""
+        call_data: Dict[str, Any] = {'action': action}
+        if destination is not None:
+            call_data['destination'] = destination
+        if delay is not None:
+            call_data['delay'] = delay
+        if allowed_lifts is not None:
+            call_data['allowed_lifts'] = allowed_lifts
+        call_data['group_size'] = group_size
+
+        payload = {
+            'request_id': self.request_ids.next(),
+            'area': area,
+            'time': utc_timestamp(),
+            'terminal': terminal,
+            'call': call_data
+        }
+        return self._build('lift-call-api-v2', building_id, 'action', group_id, payload)
+
+    def hold_open(self, building_id: str, lift_deck: int, served_area: int, hard_time: int,
+                  soft_time: Optional[int] = None, group_id: Optional[str] = None) -> BuiltMessage:
+        """lift-call-api-v2 hold_open（官方文档中没有terminal字段）"""
+        payload = {
+            'request_id': self.request_ids.next(),
+            'served_area': served_area,
+            'lift_deck': lift_deck,
+            'hard_time': hard_time,
+            'time': utc_timestamp()
+        }
+        if soft_time is not None:
+            payload['soft_time'] = soft_time
+        return self._build('lift-call-api-v2', building_id, 'hold_open', group_id, payload)
+
+    def delete_call(self, building_id: str, session_id: int, group_id: Optional[str] = None) -> BuiltMessage:
+        """lift-call-api-v2 delete，根据官方文档只需要session_id"""
+        return self._build('lift-call-api-v2', building_id, 'delete', group_id, {'session_id': session_id})
+
+
+# 进程内共享的 request_id 生成器
+default_request_ids = RequestIdGenerator()
@@ -4,7 +4,7 @@ KONE 测试报告生成器
 负责生成多种格式的测试报告：Markdown、JSON、HTML、Excel
 """
 
-import json
+import json_codec
 import logging
 from datetime import datetime
 from typing import Dict, List, Any, Optional
@@ -799,9 +799,8 @@ Ensuring the quality and security of a solution is every developer's responsibil
                 if hasattr(result, 'request_timestamp') and result.request_timestamp:
                     report += f"- **Timestamp:** {result.request_timestamp}\n"
                 report += "- **Parameters:**\n"
-                import json
                 report += "```json\n"
-                report += json.dumps(result.request_parameters, indent=2, ensure_ascii=False)
+                report += json_codec.dumps_pretty(result.request_parameters)
                 report += "\n```\n\n"
             
             # 添加响应详情
@@ -813,7 +812,7 @@ Ensuring the quality and security of a solution is every developer's responsibil
                     report += f"- **Response Time:** {result.response_timestamp}\n"
                 report += "- **Response Data:**\n"
                 report += "```json\n"
-                report += json.dumps(result.response_data, indent=2, ensure_ascii=False)
+                report += json_codec.dumps_pretty(result.response_data)
                 report += "\n```\n\n"
             
             # 添加错误信息（如果有）
@@ -940,7 +939,7 @@ Ensuring the quality and security of a solution is every developer's responsibil
             ]
         }
         
-        return json.dumps(json_data, indent=2, ensure_ascii=False)
+        return json_codec.dumps_pretty(json_data)
     
     def _generate_html_report(self, report_data: Dict[str, Any]) -> str:
         """
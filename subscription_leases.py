@@ -0,0 +1,220 @@
+"""
+site-monitoring 订阅租约管理器
+订阅最长 300 秒，规范要求订阅方在到期前重新激活主题。
+租约管理器记录所有订阅需求，按 (建筑, 群组) 合并主题，用尽量少的订阅帧在到期前自动续订。
+租约登记是同步的状态修改；订阅帧按 (建筑, 群组) 各自加锁发送，一个建筑响应慢不影响其他建筑
+"""
+
+import asyncio
+import itertools
+import logging
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from topic_trie import TopicTrie, minimal_topics
+
+logger = logging.getLogger(__name__)
+
+# KONE 规定的订阅最长时长（秒）
+MAX_SUBSCRIPTION_DURATION = 300
+
+
+class _LeaseGroup:
+    """同一 (建筑, 群组) 下所有租约合并后的订阅"""
+
+    def __init__(self, building_id: str, group_id: str, sub: str):
+        self.building_id = building_id
+        self.group_id = group_id
+        self.sub = sub
+        self.topic_refs: Dict[str, int] = {}  # 主题 -> 引用计数
+        self.active_topics: List[str] = []    # 最近一次实际订阅的主题
+        self._active_trie: TopicTrie[str] = TopicTrie()
+        self.expires_at = 0.0
+        self.renew_at = 0.0
+
+    def desired_topics(self) -> List[str]:
+        return minimal_topics(self.topic_refs.keys())
+
+    def covers(self, topics: Iterable[str]) -> bool:
+        """当前已生效的订阅是否已覆盖这些主题"""
+        return all(self._active_trie.covering(topic) for topic in topics)
+
+    def activate(self, topics: List[str]):
+        """记录实际订阅的主题"""
+        trie: TopicTrie[str] = TopicTrie()
+        for topic in topics:
+            trie.add(topic, topic)
+        self.active_topics = topics
+        self._active_trie = trie
+
+
+class SubscriptionLeaseManager:
+    """订阅租约：记录订阅需求，合并主题并在到期前自动续订"""
+
+    def __init__(self, driver, renew_margin: float = 30.0,
+                 duration: int = MAX_SUBSCRIPTION_DURATION, retry_delay: float = 5.0):
+        self.driver = driver
+        self.renew_margin = renew_margin
+        self.duration = min(duration, MAX_SUBSCRIPTION_DURATION)
+        self.retry_delay = retry_delay
+        self.renewals = 0
+        self.renew_failures = 0
+
+        self._groups: Dict[Tuple[str, str], _LeaseGroup] = {}
+        self._leases: Dict[str, Tuple[Tuple[str, str], List[str]]] = {}
+        self._lease_ids = itertools.count(1)
+        # (建筑, 群组) -> 发送锁：同一群组的订阅帧依次发送，不同群组互不等待
+        self._locks: Dict[Tuple[str, str], asyncio.Lock] = {}
+        self._renew_task: Optional[asyncio.Task] = None
+        self._renewing: Dict[Tuple[str, str], asyncio.Task] = {}  # 进行中的续订
+        self._wakeup = asyncio.Event()
+
+    async def acquire(self, building_id: str, subtopics: List[str], group_id: Optional[str] = None) -> str:
+        """登记一组订阅主题，返回租约ID；只有出现新主题时才立即发送订阅帧"""
+        key = (building_id, group_id or '1')
+        group = self._groups.get(key)
+        if group is None:
+            group = _LeaseGroup(key[0], key[1], sub=f"lease_{key[0]}_{key[1]}")
+            self._groups[key] = group
+
+        for topic in subtopics:
+            group.topic_refs[topic] = group.topic_refs.get(topic, 0) + 1
+
+        lease_id = f"lease-{next(self._lease_ids)}"
+        self._leases[lease_id] = (key, list(subtopics))
+
+        try:
+            async with self._group_lock(key):
+                # 等锁期间其他调用方可能已经发出覆盖这些主题的订阅
+                if not group.covers(subtopics) or group.expires_at <= time.time():
+                    await self._subscribe(group)
+        except BaseException:
+            self._drop_lease(lease_id)
+            raise
+
+        self._ensure_renewer()
+        return lease_id
+
+    async def release(self, lease_id: str):
+        """释放租约；主题不再被引用后，下次续订时不再包含它（现有订阅自然到期）"""
+        self._drop_lease(lease_id)
+
+    async def resubscribe(self, building_id: str, group_id: Optional[str] = None) -> bool:
+        """立即重发该群组的合并订阅（服务器会重新推送当前状态），没有租约时返回False"""
+        key = (building_id, group_id or '1')
+        group = self._groups.get(key)
+        if group is None:
+            return False
+        async with self._group_lock(key):
+            await self._subscribe(group)
+        return True
+
+    def leases(self) -> List[Dict[str, Any]]:
+        """当前合并后的订阅状态"""
+        now = time.time()
+        return [
+            {
+                'building_id': group.building_id,
+                'group_id': group.group_id,
+                'sub': group.sub,
+                'subtopics': list(group.active_topics),
+                'expires_in': max(0.0, round(group.expires_at - now, 3))
+            }
+            for group in self._groups.values()
+        ]
+
+    def close(self):
+        """停止续订"""
+        if self._renew_task is not None and not self._renew_task.done():
+            self._renew_task.cancel()
+        self._renew_task = None
+        for task in list(self._renewing.values()):
+            task.cancel()
+        self._renewing.clear()
+        self._groups.clear()
+        self._leases.clear()
+        self._locks.clear()
+
+    def _drop_lease(self, lease_id: str):
+        entry = self._leases.pop(lease_id, None)
+        if entry is None:
+            return
+        key, topics = entry
+        group = self._groups.get(key)
+        if group is None:
+            return
+        for topic in topics:
+            count = group.topic_refs.get(topic, 0) - 1
+            if count > 0:
+                group.topic_refs[topic] = count
+            else:
+                group.topic_refs.pop(topic, None)
+        if not group.topic_refs:
+            del self._groups[key]
+            lock = self._locks.get(key)
+            if lock is not None and not lock.locked():
+                del self._locks[key]
+            self.driver.forget_subscription(group.sub)
+
+    def _group_lock(self, key: Tuple[str, str]) -> asyncio.Lock:
+        lock = self._locks.get(key)
+        if lock is None:
+            lock = self._locks[key] = asyncio.Lock()
+        return lock
+
+    async def _subscribe(self, group: _LeaseGroup):
+        """发送一次合并后的订阅帧"""
+        topics = group.desired_topics()
+        response = await self.driver.subscribe(group.building_id, topics, self.duration,
+                                               group.group_id, group.sub)
+        if response.get('statusCode') not in (200, 201):
+            raise ConnectionError(f"Subscription {group.sub} rejected: {response}")
+        group.activate(topics)
+        group.expires_at = time.time() + self.duration
+        group.renew_at = group.expires_at - self.renew_margin
+        self._wakeup.set()
+
+    def _ensure_renewer(self):
+        if self._renew_task is None or self._renew_task.done():
+            self._renew_task = asyncio.create_task(self._renew_loop())
+
+    async def _renew_loop(self):
+        """在最早到期的订阅到期前 renew_margin 秒续订"""
+        while self._groups:
+            now = time.time()
+            waiting = []
+            for key, group in self._groups.items():
+                if key in self._renewing:
+                    continue
+                if group.renew_at > now:
+                    waiting.append(group.renew_at)
+                    continue
+                # 各群组独立续订，一个建筑无响应不会推迟其他建筑
+                task = asyncio.create_task(self._renew(group))
+                self._renewing[key] = task
+                task.add_done_callback(lambda _, key=key: self._renew_done(key))
+
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=min(waiting) - now if waiting else None)
+            except asyncio.TimeoutError:
+                pass
+
+    def _renew_done(self, key: Tuple[str, str]):
+        self._renewing.pop(key, None)
+        self._wakeup.set()
+
+    async def _renew(self, group: _LeaseGroup):
+        key = (group.building_id, group.group_id)
+        async with self._group_lock(key):
+            # 等锁期间租约可能已全部释放，或已被其他调用方重新订阅
+            if self._groups.get(key) is not group or group.renew_at > time.time():
+                return
+            try:
+                await self._subscribe(group)
+                self.renewals += 1
+            except Exception as e:
+                self.renew_failures += 1
+                logger.warning(f"Failed to renew subscription {group.sub}: {e}")
+                # 稍后重试，尽量在到期前补上
+                group.renew_at = time.time() + self.retry_delay
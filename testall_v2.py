@@ -163,7 +163,9 @@ class KoneValidationSuite:
             client_id=kone_config['client_id'],
             client_secret=kone_config['client_secret'],
             token_endpoint=kone_config.get('token_endpoint', 'https://dev.kone.com/api/v2/oauth2/token'),
-            ws_endpoint=kone_config.get('ws_endpoint', 'wss://dev.kone.com/stream-v2')
+            ws_endpoint=kone_config.get('ws_endpoint', 'wss://dev.kone.com/stream-v2'),
+            # 一致性测试需要观察服务器对非法呼叫的实际处理，预校验只做预测不拦截
+            call_validation='strict'
         )
         
         # 使用实际可用的建筑（KONE指引中的建筑在当前环境中不存在）
@@ -382,9 +384,9 @@ class KoneValidationSuite:
         success_count = 0
         error_messages = []
         
-        # 1. 测试Config API
+        # 1. 测试Config API（绕过缓存，验证真实往返）
         try:
-            config_resp = await self.driver.get_building_config(self.building_id, self.group_id)
+            config_resp = await self.driver.get_building_config(self.building_id, self.group_id, refresh=True)
             result.add_observation({'phase': 'config_response', 'data': config_resp})
             
             # 添加API调用信息
@@ -426,7 +428,7 @@ class KoneValidationSuite:
         }
         
         try:
-            actions_resp = await self.driver.get_actions(self.building_id, self.group_id)
+            actions_resp = await self.driver.get_actions(self.building_id, self.group_id, refresh=True)
             result.add_observation({'phase': 'actions_response', 'data': actions_resp})
             
             # 添加API调用信息
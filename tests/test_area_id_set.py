@@ -0,0 +1,63 @@
+"""
+区域ID区间集合单元测试：区间合并、成员判断和集合运算（与 Python set 的结果对照）
+"""
+
+import random
+
+import pytest
+
+from area_id_set import AreaIdSet
+
+
+def test_intervals_are_merged_and_described():
+    areas = AreaIdSet([1000, 1001, 1002, range(1200, 1300), 1300, 5000])
+    assert areas.intervals() == [(1000, 1003), (1200, 1301), (5000, 5001)]
+    assert areas.describe() == '1000-1002, 1200-1300, 5000'
+    assert len(areas) == 3 + 101 + 1
+    assert areas.first == 1000 and areas.last == 5000
+
+
+def test_membership():
+    areas = AreaIdSet.closed_range(1200, 12010)
+    assert 1200 in areas and 12010 in areas and 5000 in areas
+    assert 1199 not in areas and 12011 not in areas
+    assert '5000' not in areas
+    assert 1 not in AreaIdSet()
+    assert not AreaIdSet()
+
+
+def test_stepped_ranges_are_expanded():
+    areas = AreaIdSet([range(1000, 5000, 1000)])
+    assert list(areas) == [1000, 2000, 3000, 4000]
+
+
+def test_equality_and_hash():
+    left = AreaIdSet([range(1, 5), 7])
+    right = AreaIdSet.from_intervals([(7, 8), (1, 3), (3, 5)])
+    assert left == right
+    assert hash(left) == hash(right)
+    assert left != AreaIdSet([1])
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_set_operations_match_python_sets(seed):
+    rng = random.Random(seed)
+
+    def random_set():
+        items = []
+        for _ in range(rng.randint(0, 6)):
+            start = rng.randint(0, 200)
+            items.append(range(start, start + rng.randint(1, 30)))
+        items.extend(rng.randint(0, 230) for _ in range(rng.randint(0, 5)))
+        return AreaIdSet(items)
+
+    left, right = random_set(), random_set()
+    plain_left, plain_right = set(left), set(right)
+
+    assert set(left | right) == plain_left | plain_right
+    assert set(left & right) == plain_left & plain_right
+    assert set(left - right) == plain_left - plain_right
+    assert (left <= right) == (plain_left <= plain_right)
+    assert left.isdisjoint(right) == plain_left.isdisjoint(plain_right)
+    assert len(left) == len(plain_left)
+    assert all(area in left for area in plain_left)
@@ -0,0 +1,101 @@
+"""
+建筑数据缓存单元测试：TTL 命中、并发单飞、错误响应不缓存和内容变化通知
+"""
+
+import asyncio
+
+from building_cache import BuildingDataCache, content_hash
+
+
+def _fetcher(responses):
+    """按顺序返回给定响应的 fetch，带一次让出以便并发请求重叠"""
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0)
+        return dict(responses[min(len(calls), len(responses)) - 1])
+
+    return fetch, calls
+
+
+def test_ttl_hits_and_refresh():
+    async def run():
+        cache = BuildingDataCache(ttl=60)
+        fetch, calls = _fetcher([{'statusCode': 201, 'data': {'v': 1}}])
+        first = await cache.get('config', 'building:b', None, fetch)
+        second = await cache.get('config', 'building:b', '1', fetch)
+        assert first == second == {'statusCode': 201, 'data': {'v': 1}}
+        assert len(calls) == 1
+        assert cache.peek('config', 'building:b') == first
+
+        await cache.get('config', 'building:b', None, fetch, max_age=0)
+        await cache.get('config', 'building:b', None, fetch, refresh=True)
+        assert len(calls) == 3
+        assert cache.stats()['hits'] == 1
+
+    asyncio.run(run())
+
+
+def test_concurrent_misses_share_one_fetch():
+    async def run():
+        cache = BuildingDataCache()
+        fetch, calls = _fetcher([{'statusCode': 201, 'data': {'v': 1}}])
+        results = await asyncio.gather(*(cache.get('actions', 'building:b', None, fetch) for _ in range(10)))
+        assert len(calls) == 1
+        assert cache.fetches == 1
+        assert all(result == results[0] for result in results)
+
+    asyncio.run(run())
+
+
+def test_error_responses_are_not_cached():
+    async def run():
+        cache = BuildingDataCache()
+        fetch, calls = _fetcher([{'statusCode': 404, 'data': {'error': 'x'}}, {'statusCode': 201, 'data': {}}])
+        assert (await cache.get('config', 'building:b', None, fetch))['statusCode'] == 404
+        assert cache.peek('config', 'building:b') is None
+        assert (await cache.get('config', 'building:b', None, fetch))['statusCode'] == 201
+        assert len(calls) == 2
+
+    asyncio.run(run())
+
+
+def test_listeners_are_notified_on_content_change_only():
+    async def run():
+        cache = BuildingDataCache()
+        changes = []
+        cache.add_listener(lambda *args: changes.append(args))
+        fetch, _ = _fetcher([
+            {'statusCode': 201, 'requestId': 1, 'data': {'v': 1}},
+            {'statusCode': 201, 'requestId': 2, 'data': {'v': 1}},
+            {'statusCode': 201, 'requestId': 3, 'data': {'v': 2}},
+        ])
+        for _ in range(3):
+            await cache.get('config', 'building:b', None, fetch, refresh=True)
+
+        assert len(changes) == 1
+        kind, building_id, group_id, old, new, response = changes[0]
+        assert (kind, building_id, group_id) == ('config', 'building:b', '1')
+        assert new == content_hash(response) == cache.content_hash('config', 'building:b')
+        assert old != new
+        assert cache.changes == 1
+
+    asyncio.run(run())
+
+
+def test_invalidate_by_building_and_kind():
+    async def run():
+        cache = BuildingDataCache()
+        fetch, _ = _fetcher([{'statusCode': 201, 'data': {}}])
+        for kind in ('config', 'actions'):
+            for building_id in ('building:a', 'building:b'):
+                await cache.get(kind, building_id, None, fetch)
+
+        cache.invalidate(building_id='building:a', kind='config')
+        assert cache.peek('config', 'building:a') is None
+        assert cache.peek('actions', 'building:a') is not None
+        cache.invalidate(kind='actions')
+        assert cache.stats()['entries'] == 1
+
+    asyncio.run(run())
@@ -0,0 +1,82 @@
+"""
+建筑拓扑索引单元测试：区域/楼层/侧/群组查表和合法行程判断
+"""
+
+from building_topology import (
+    ERROR_GROUP_MISMATCH, ERROR_INVALID_AREA, ERROR_SAME_FLOOR, AreaInfo, BuildingTopology
+)
+
+VIRTUAL_CONFIG = {
+    'building': {'id': 'L1QinntdEOg'},
+    'elevator_groups': {
+        'group_1': {'lifts': [{'id': 'A', 'lift_id': 1}, {'id': 'B', 'lift_id': 2}]},
+    },
+    'floors': {
+        'f_1': {'level': 1, 'areas': [
+            {'area_id': 1000, 'side': 1, 'short_name': '1', 'exit': True},
+            {'area_id': 1010, 'side': 2, 'short_name': '1R', 'exit': True},
+        ]},
+        'f_2': {'level': 2, 'areas': [
+            {'area_id': 2000, 'side': 1},
+            {'area_id': 2010, 'side': 2},
+        ]},
+        'f_3': {'level': 3, 'areas': [
+            {'area_id': 3000, 'side': 1, 'group': 2},
+        ]},
+    },
+}
+
+
+def test_from_virtual_config_indexes_areas_floors_and_groups():
+    topology = BuildingTopology.from_virtual_config(VIRTUAL_CONFIG)
+    assert topology.building_id == 'L1QinntdEOg'
+    assert topology.areas[1010] == AreaInfo(1010, 1, 2, None, '1R', True)
+    assert topology.floor_areas[2] == frozenset({2000, 2010})
+    assert topology.groups == {'1': (1, 2)}
+    assert topology.floor_of(3000) == 3
+    assert topology.floor_of(9999) is None
+    assert 1000 in topology and 9999 not in topology
+
+
+def test_check_call_rules():
+    topology = BuildingTopology.from_virtual_config(VIRTUAL_CONFIG)
+    assert topology.check_call(1000, 2010) is None
+    assert topology.check_call(1000) is None
+    assert topology.check_call(1000, 1000) == ERROR_SAME_FLOOR
+    # 同层对侧同样没有行程（验证指南 Test 12）
+    assert topology.check_call(1000, 1010) == ERROR_SAME_FLOOR
+    assert topology.check_call(1000, 9999) == ERROR_INVALID_AREA
+    assert topology.check_call(9999, 1000) == ERROR_INVALID_AREA
+    # 3000 只属于群组2
+    assert topology.check_call(3000, 1000, group_id='1') == ERROR_GROUP_MISMATCH
+    assert topology.check_call(3000, 1000, group_id='2') is None
+    assert topology.check_call(1000, 3000) is None
+
+
+def test_valid_pairs_are_precomputed_per_zone():
+    topology = BuildingTopology.from_virtual_config(VIRTUAL_CONFIG)
+    assert topology.is_valid_pair(1000, 2000)
+    assert topology.is_valid_pair(2010, 1000)
+    assert not topology.is_valid_pair(2000, 2010)
+    assert not topology.is_valid_pair(1000, 9999)
+    assert topology.stats()['valid_zone_pairs'] == len(topology.valid_pairs)
+
+
+def test_from_kone_config():
+    response = {
+        'statusCode': 201,
+        'data': {
+            'destinations': [
+                {'area_id': 1000, 'group_floor_id': 1, 'group_side': 1, 'short_name': '1'},
+                {'area_id': 5000, 'group_floor_id': 5, 'group_side': 1},
+                {'short_name': 'no area'},
+            ],
+            'groups': [{'group_id': 1, 'lifts': [{'lift_id': 1}, {'lift_id': 2}]}],
+        }
+    }
+    topology = BuildingTopology.from_kone_config('building:b', response, '1')
+    assert set(topology.areas) == {1000, 5000}
+    assert topology.areas[5000].group == '1'
+    assert topology.groups == {'1': (1, 2)}
+    assert topology.check_call(1000, 5000, '1') is None
+    assert topology.check_call(1000, 5000, '2') == ERROR_GROUP_MISMATCH
@@ -0,0 +1,133 @@
+"""
+呼叫生命周期单元测试：状态推进、先到事件的补放、终止状态、长轮询和记录淘汰
+"""
+
+import asyncio
+
+from call_lifecycle import (
+    CALL_ACCEPTED, CALL_CANCELED, CALL_FAILED, CALL_REJECTED, CALL_SERVED, CALL_SUBMITTED,
+    CALL_STATE_EVENT_TYPE, CallTracker
+)
+
+
+def call_state(session_id, state: str, **fields) -> dict:
+    return {
+        'type': CALL_STATE_EVENT_TYPE,
+        'subtopic': f'call_state/{session_id}/{state}',
+        'buildingId': 'b',
+        'groupId': '1',
+        'data': dict(fields)
+    }
+
+
+def new_call(tracker: CallTracker):
+    return tracker.create('b', '1', {'source': 1000, 'destination': 5000})
+
+
+def test_full_lifecycle_from_submitted_to_served():
+    tracker = CallTracker()
+    record = new_call(tracker)
+    assert record.state == CALL_SUBMITTED
+    assert tracker.active() == 1
+
+    tracker.bind_session(record, 42, {'statusCode': 201})
+    assert record.state == CALL_ACCEPTED and record.session_id == '42'
+
+    for state in ('being_assigned', 'assigned', 'being_fixed', 'fixed'):
+        assert tracker.apply(call_state(42, state, allocated_lift_deck=[1001010], eta='t')) is record
+    assert record.allocated_lift_deck == [1001010]
+
+    tracker.apply(call_state(42, CALL_SERVED))
+    assert record.terminal
+    assert [entry['state'] for entry in record.history] == [
+        CALL_SUBMITTED, CALL_ACCEPTED, 'being_assigned', 'assigned', 'being_fixed', 'fixed', CALL_SERVED
+    ]
+    assert tracker.active() == 0
+    assert record.to_dict()['terminal'] is True
+
+
+def test_state_from_payload_takes_precedence_over_topic():
+    tracker = CallTracker()
+    record = new_call(tracker)
+    tracker.bind_session(record, 7)
+    tracker.apply(call_state(7, 'assigned', call_state=CALL_CANCELED, cancel_reason='NO_LIFTS'))
+    assert record.state == CALL_CANCELED
+    assert record.cancel_reason == 'NO_LIFTS'
+
+
+def test_terminal_records_ignore_later_events():
+    tracker = CallTracker()
+    record = new_call(tracker)
+    tracker.bind_session(record, 7)
+    tracker.apply(call_state(7, CALL_CANCELED))
+    version = record.version
+
+    assert tracker.apply(call_state(7, 'assigned')) is None  # 会话已解除绑定
+    assert record.state == CALL_CANCELED and record.version == version
+
+
+def test_events_before_session_binding_are_replayed():
+    tracker = CallTracker()
+    record = new_call(tracker)
+    assert tracker.apply(call_state(9, 'being_assigned')) is None
+    assert tracker.apply(call_state(9, 'assigned', eta='soon')) is None
+
+    tracker.bind_session(record, 9)
+    assert record.state == 'assigned'
+    assert record.eta == 'soon'
+
+
+def test_unrelated_events_are_not_buffered_without_unbound_calls():
+    tracker = CallTracker()
+    record = new_call(tracker)
+    tracker.bind_session(record, 1)
+    assert tracker.apply(call_state(2, 'assigned')) is None
+    assert not tracker._orphans
+
+
+def test_local_finish_and_close():
+    tracker = CallTracker()
+    rejected = new_call(tracker)
+    tracker.finish(rejected, CALL_REJECTED, 'SAME_SOURCE_AND_DEST_FLOOR')
+    assert rejected.state == CALL_REJECTED and rejected.error == 'SAME_SOURCE_AND_DEST_FLOOR'
+    tracker.finish(rejected, CALL_FAILED, 'ignored')
+    assert rejected.state == CALL_REJECTED
+
+    pending = new_call(tracker)
+    tracker.close('driver closed')
+    assert pending.state == CALL_FAILED and pending.error == 'driver closed'
+
+
+def test_wait_for_change_long_poll():
+    async def scenario():
+        tracker = CallTracker()
+        record = new_call(tracker)
+
+        # 已有更新的版本立即返回
+        assert await tracker.wait_for_change(record.call_id, 0, timeout=1) is record
+
+        waiter = asyncio.ensure_future(tracker.wait_for_change(record.call_id, record.version, timeout=1))
+        await asyncio.sleep(0.01)
+        assert not waiter.done()
+        tracker.bind_session(record, 5)
+        assert (await waiter).state == CALL_ACCEPTED
+
+        version = record.version
+        assert await tracker.wait_for_change(record.call_id, version, timeout=0.01) is record
+        assert record.version == version
+        assert await tracker.wait_for_change('unknown', 0, timeout=0.01) is None
+        assert not tracker._waiters
+
+    asyncio.run(scenario())
+
+
+def test_finished_records_are_evicted_first():
+    tracker = CallTracker(max_records=3)
+    first = new_call(tracker)
+    tracker.finish(first, CALL_REJECTED, 'x')
+    live = [new_call(tracker) for _ in range(2)]
+    new_call(tracker)
+
+    assert tracker.get(first.call_id) is None
+    assert all(tracker.get(record.call_id) is record for record in live)
+    assert len(tracker) == 3
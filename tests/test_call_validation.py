@@ -0,0 +1,86 @@
+"""
+呼叫预校验单元测试：由 config + actions 编译的规则，以及与服务器拒绝形状一致的本地拒绝响应
+"""
+
+import pytest
+
+from building_topology import ERROR_SAME_FLOOR, BuildingTopology
+from call_validation import CallValidator, is_local_rejection, rejection_response
+
+CONFIG = {
+    'statusCode': 201,
+    'data': {
+        'destinations': [{'area_id': floor * 1000, 'group_floor_id': floor, 'group_side': 1}
+                         for floor in range(1, 11)],
+        'groups': [{'group_id': 1, 'lifts': [{'lift_id': 1}, {'lift_id': 2}]}],
+    }
+}
+ACTIONS = {
+    'statusCode': 201,
+    'data': {
+        'call_types': [
+            {'action_id': 2},
+            {'action_id': 4, 'enabled': False},
+            {'action_id': 2001},
+            {'action_id': 2002},
+        ]
+    }
+}
+
+
+@pytest.fixture
+def validator() -> CallValidator:
+    topology = BuildingTopology.from_kone_config('building:b', CONFIG, '1')
+    return CallValidator('building:b', '1', topology, ACTIONS)
+
+
+@pytest.mark.parametrize('call, code', [
+    (dict(area=1000, action=2, destination=5000), None),
+    (dict(area=1000, action=200, destination=5000), 'UNKNOWN_CALL_ACTION'),
+    (dict(area=1000, action=0, destination=5000), 'UNKNOWN_CALL_ACTION'),
+    (dict(area=1000, action=4, destination=5000), 'DISABLED_CALL_ACTION'),
+    (dict(area=1000, action=2, destination=1000), ERROR_SAME_FLOOR),
+    (dict(area=1000, action=2, destination=5000, delay=31), 'INVALID_DELAY'),
+    (dict(area=1000, action=2, destination=5000, delay=30), None),
+    (dict(area=1000, action=2, destination=5000, allowed_lifts=[1, 9]), 'INVALID_ALLOWED_LIFTS'),
+    (dict(area=1000, action=2002), 'INVALID_DIRECTION'),
+    (dict(area=10000, action=2001), 'INVALID_DIRECTION'),
+    (dict(area=5000, action=2001), None),
+])
+def test_rules(validator, call, code):
+    rejection = validator.check(**call)
+    assert (rejection.code if rejection else None) == code
+
+
+def test_unknown_actions_are_not_rejected_without_actions_response():
+    validator = CallValidator('building:b', '1')
+    assert validator.check(1000, 200, 5000) is None
+    assert validator.check(1000, 2, 5000, delay=40).code == 'INVALID_DELAY'
+
+
+def test_messages_match_server_text(validator):
+    assert validator.check(1000, 4, 5000).message == 'Ignoring call, disabled call action: 4'
+    assert validator.check(1000, 0, 5000).message == 'Ignoring call, unknown call action: UNDEFINED'
+
+
+def test_rejection_response_has_upstream_shape(validator):
+    response = rejection_response(validator.check(1000, 2, 1000), 'building:b', None, 17)
+    assert response['statusCode'] == 201
+    assert response['requestId'] == 17
+    assert response['callType'] == 'action'
+    assert response['groupId'] == '1'
+    assert response['data']['request_id'] == 17
+    assert response['data']['success'] is False
+    assert response['data']['error'] == ERROR_SAME_FLOOR
+    assert response['data']['cancel_reason'] == ERROR_SAME_FLOOR
+    assert is_local_rejection(response)
+
+    disabled = rejection_response(validator.check(1000, 4, 5000), 'building:b', '1', 18)
+    assert 'cancel_reason' not in disabled['data']
+
+
+def test_strict_mode_prediction_is_not_a_local_rejection(validator):
+    response = {'statusCode': 201, 'data': {'success': False},
+                'prevalidation': validator.check(1000, 4, 5000).to_dict(sent=True)}
+    assert not is_local_rejection(response)
+    assert not is_local_rejection({'statusCode': 201, 'data': {'success': True}})
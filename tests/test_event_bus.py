@@ -0,0 +1,145 @@
+"""
+事件总线单元测试：通道溢出策略（阻塞、丢弃最旧、丢弃最新、按键合并）、跨通道顺序和过滤视图
+"""
+
+import asyncio
+
+import pytest
+
+from event_bus import (
+    CHANNEL_ACTION, CHANNEL_GENERAL, CHANNEL_SUBSCRIPTION,
+    POLICY_BLOCK, POLICY_COALESCE, POLICY_DROP_NEWEST, POLICY_DROP_OLDEST,
+    Event, EventBus
+)
+
+
+def bus_with(policy: str, maxsize: int = 2, channel: str = CHANNEL_GENERAL, **options) -> EventBus:
+    return EventBus(limits={channel: dict(maxsize=maxsize, policy=policy, **options)})
+
+
+def drain(bus: EventBus, channel: str = CHANNEL_GENERAL) -> list:
+    events = []
+    while True:
+        event = bus.get_nowait([channel])
+        if event is None:
+            return events
+        events.append(event)
+
+
+def status(lift: int, seq: int) -> dict:
+    return {'subtopic': f'lift_{lift}/status', 'buildingId': 'b', 'groupId': '1',
+            'type': 'monitor-lift-status', 'data': {'seq': seq}}
+
+
+def test_drop_oldest_keeps_newest_events():
+    bus = bus_with(POLICY_DROP_OLDEST)
+    for seq in range(4):
+        assert bus.publish(CHANNEL_GENERAL, {'seq': seq})
+    assert [event['seq'] for event in drain(bus)] == [2, 3]
+    assert bus.stats()[CHANNEL_GENERAL]['dropped'] == 2
+
+
+def test_drop_newest_rejects_when_full():
+    bus = bus_with(POLICY_DROP_NEWEST)
+    accepted = [bus.publish(CHANNEL_GENERAL, {'seq': seq}) for seq in range(4)]
+    assert accepted == [True, True, False, False]
+    assert [event['seq'] for event in drain(bus)] == [0, 1]
+    assert bus.stats()[CHANNEL_GENERAL]['dropped'] == 2
+
+
+def test_block_waits_for_consumer_on_put():
+    async def scenario():
+        bus = bus_with(POLICY_BLOCK, maxsize=1)
+        await bus.put(CHANNEL_GENERAL, {'seq': 0})
+        blocked = asyncio.ensure_future(bus.put(CHANNEL_GENERAL, {'seq': 1}))
+        await asyncio.sleep(0.01)
+        assert not blocked.done()
+
+        assert (await bus.get(timeout=1))['seq'] == 0
+        assert await asyncio.wait_for(blocked, 1)
+        assert (await bus.get(timeout=1))['seq'] == 1
+        assert bus.stats()[CHANNEL_GENERAL]['dropped'] == 0
+
+    asyncio.run(scenario())
+
+
+def test_block_publish_without_backpressure_drops_newest():
+    bus = bus_with(POLICY_BLOCK, maxsize=1)
+    assert bus.publish(CHANNEL_GENERAL, {'seq': 0})
+    assert not bus.publish(CHANNEL_GENERAL, {'seq': 1})
+    assert bus.stats()[CHANNEL_GENERAL]['dropped'] == 1
+
+
+def test_coalesce_keeps_latest_per_topic_in_original_position():
+    bus = bus_with(POLICY_COALESCE, maxsize=10, channel=CHANNEL_SUBSCRIPTION)
+    for seq, lift in enumerate([1, 2, 1, 1, 3]):
+        bus.publish(CHANNEL_SUBSCRIPTION, status(lift, seq))
+
+    events = drain(bus, CHANNEL_SUBSCRIPTION)
+    assert [(event['subtopic'], event['data']['seq']) for event in events] == \
+        [('lift_1/status', 3), ('lift_2/status', 1), ('lift_3/status', 4)]
+    assert bus.stats()[CHANNEL_SUBSCRIPTION]['coalesced'] == 2
+
+
+def test_coalesce_without_key_falls_back_to_drop_oldest():
+    bus = bus_with(POLICY_COALESCE, maxsize=2, channel=CHANNEL_SUBSCRIPTION)
+    for seq in range(3):
+        bus.publish(CHANNEL_SUBSCRIPTION, {'seq': seq})
+    assert [event['seq'] for event in drain(bus, CHANNEL_SUBSCRIPTION)] == [1, 2]
+    assert bus.stats()[CHANNEL_SUBSCRIPTION] == {
+        'size': 0, 'maxsize': 2, 'policy': POLICY_COALESCE, 'dropped': 1, 'coalesced': 0
+    }
+
+
+def test_coalesce_with_custom_key():
+    bus = bus_with(POLICY_COALESCE, maxsize=10, channel=CHANNEL_SUBSCRIPTION,
+                   coalesce_key=lambda event: event.get('lift'))
+    for seq, lift in enumerate([1, 1, 2]):
+        bus.publish(CHANNEL_SUBSCRIPTION, {'lift': lift, 'seq': seq})
+    assert [event['seq'] for event in drain(bus, CHANNEL_SUBSCRIPTION)] == [1, 2]
+
+
+def test_unknown_policy_is_rejected():
+    with pytest.raises(ValueError):
+        bus_with('drop_everything')
+
+
+def test_arrival_order_and_priority_across_channels():
+    bus = EventBus()
+    bus.publish(CHANNEL_GENERAL, {'seq': 0})
+    bus.publish(CHANNEL_ACTION, {'seq': 1})
+    bus.publish(CHANNEL_SUBSCRIPTION, {'seq': 2})
+    assert bus.get_nowait(priority=True)['seq'] == 2
+    assert bus.get_nowait()['seq'] == 0
+    assert bus.get_nowait()['seq'] == 1
+    assert bus.get_nowait() is None
+
+
+def test_materialize_copies_instead_of_mutating_source():
+    source = {'type': 'monitor-call-state', 'data': {'session_id': 1}}
+    bus = EventBus()
+    bus.publish(CHANNEL_ACTION, Event(CHANNEL_ACTION, 'action', source))
+    event = bus.get_nowait()
+    assert event['callType'] == 'action'
+    assert 'callType' not in source
+
+
+def test_view_applies_predicate_on_read_and_drops_oldest_when_full():
+    async def scenario():
+        bus = EventBus()
+        view = bus.view(lambda channel, event: event['seq'] % 2 == 0,
+                        channels=[CHANNEL_GENERAL], maxsize=3)
+        for seq in range(5):
+            bus.publish(CHANNEL_GENERAL, {'seq': seq})
+        bus.publish(CHANNEL_ACTION, {'seq': 100})
+
+        assert view.dropped == 2
+        assert (await view.get(timeout=0.1))['seq'] == 2
+        assert (await view.get(timeout=0.1))['seq'] == 4
+        assert await view.get(timeout=0.01) is None
+        # 视图是广播消费，共享通道中的事件不受影响
+        assert bus.qsize(CHANNEL_GENERAL) == 5
+        view.close()
+        assert await view.get(timeout=0.01) is None
+
+    asyncio.run(scenario())
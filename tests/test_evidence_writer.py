@@ -0,0 +1,54 @@
+"""
+证据写入器单元测试：批量落盘、写失败计数和不阻塞事件循环的 flush
+"""
+
+import asyncio
+
+from evidence_writer import EvidenceWriter
+
+
+def test_records_are_written_in_batches(tmp_path):
+    path = tmp_path / 'evidence.log'
+    writer = EvidenceWriter(str(path), batch_size=10)
+    for index in range(25):
+        assert writer.write(f'{{"n":{index}}}\n')
+    assert writer.flush()
+    writer.close()
+
+    assert path.read_text().count('\n') == 25
+    assert writer.stats()['written'] == 25
+    assert writer.stats()['write_failed'] == 0
+
+
+def test_failed_writes_are_counted(tmp_path):
+    # 目标路径是目录，打开文件必然失败
+    writer = EvidenceWriter(str(tmp_path))
+    for _ in range(3):
+        writer.write(b'{}\n')
+    assert writer.flush()
+    writer.close()
+
+    assert writer.stats()['written'] == 0
+    assert writer.stats()['write_failed'] == 3
+
+
+def test_aflush_runs_off_the_event_loop(tmp_path):
+    async def run():
+        writer = EvidenceWriter(str(tmp_path / 'evidence.log'))
+        writer.write(b'{}\n')
+        ticks = 0
+
+        async def tick():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0)
+
+        ticker = asyncio.ensure_future(tick())
+        assert await writer.aflush()
+        ticker.cancel()
+        writer.close()
+        assert writer.stats()['written'] == 1
+        assert ticks > 0
+
+    asyncio.run(run())
@@ -0,0 +1,134 @@
+"""
+帧分发单元测试：监控帧只解析头部、响应帧关联键、分类表优先级和不修改原始数据的物化
+"""
+
+import json
+
+import pytest
+
+from event_bus import CHANNEL_ACTION, CHANNEL_GENERAL, CHANNEL_SUBSCRIPTION
+from frame_dispatch import (
+    ROUTE_ACTION, ROUTE_GENERAL, ROUTE_NOTIFICATION, ROUTE_SUBSCRIPTION,
+    FrameDispatcher, frame_correlation_id, parse_frame, ping_key
+)
+
+STATUS_FRAME = {
+    'subtopic': 'lift_1/status',
+    'buildingId': 'building:b',
+    'groupId': '1',
+    'type': 'monitor-lift-status',
+    'callType': 'monitor',
+    'data': {'lift_mode': 0, 'decks': [{'area': 3000}]}
+}
+
+
+def test_monitoring_frame_is_routed_on_header_only():
+    frame = parse_frame(json.dumps(STATUS_FRAME))
+    assert not frame.decoded
+    assert frame.monitoring
+    assert frame.header == {key: value for key, value in STATUS_FRAME.items() if key != 'data'}
+    assert frame_correlation_id(frame) is None
+
+    assert frame.data == STATUS_FRAME
+    assert frame.decoded
+
+
+def test_monitoring_frame_with_routing_fields_after_body_is_fully_decoded():
+    reordered = {'type': 'monitor-lift-status', 'data': {'lift_mode': 0}, 'subtopic': 'lift_1/status',
+                 'buildingId': 'building:b'}
+    frame = parse_frame(json.dumps(reordered))
+    assert frame.decoded
+    assert frame.header['subtopic'] == 'lift_1/status'
+
+
+@pytest.mark.parametrize('trailing', [{'groupId': '2'}, {'groupId': '1', 'callType': 'monitor', 'requestId': 7}])
+def test_fields_after_body_are_not_dropped(trailing):
+    fields = {'type': 'monitor-lift-status', 'buildingId': 'B', 'subtopic': 'lift_1/status', 'data': {'lift_mode': 0}}
+    fields.update(trailing)
+    frame = parse_frame(json.dumps(fields))
+    assert frame.decoded
+    for key, value in trailing.items():
+        assert frame.header[key] == value
+
+
+def test_group_id_is_required_in_header():
+    fields = {key: value for key, value in STATUS_FRAME.items() if key != 'groupId'}
+    assert parse_frame(json.dumps(fields)).decoded
+
+
+def test_bytes_and_pretty_printed_frames():
+    frame = parse_frame(json.dumps(STATUS_FRAME, indent=2).encode('utf-8'))
+    assert not frame.decoded
+    assert frame.header['subtopic'] == 'lift_1/status'
+    assert frame.data == STATUS_FRAME
+
+
+def test_response_frames_are_fully_decoded_and_correlated():
+    ack = parse_frame(json.dumps({'statusCode': 201, 'requestId': 17, 'data': {'time': 't'}}))
+    assert ack.decoded
+    assert frame_correlation_id(ack) == 17
+
+    ping = parse_frame(json.dumps({'callType': 'ping', 'data': {'request_id': 5, 'time': 't'}}))
+    assert frame_correlation_id(ping) == ping_key(5)
+
+    call_event = parse_frame(json.dumps({'callType': 'action', 'data': {'request_id': 9, 'session_id': 3}}))
+    assert frame_correlation_id(call_event) is None
+
+
+@pytest.mark.parametrize('raw', ['not json', '[1, 2]', '"text"'])
+def test_invalid_frames_raise_value_error(raw):
+    with pytest.raises(ValueError):
+        parse_frame(raw)
+
+
+def test_classification_table_priority():
+    dispatcher = FrameDispatcher()
+    assert dispatcher.classify(parse_frame(json.dumps(STATUS_FRAME))) == ROUTE_SUBSCRIPTION
+    assert dispatcher.classify({'type': 'monitor-call-state', 'subtopic': 'call_state/1/assigned'}) == ROUTE_ACTION
+    assert dispatcher.classify({'callType': 'action', 'data': {'session_id': 1}}) == ROUTE_ACTION
+    assert dispatcher.classify({'eventType': 'x'}) == ROUTE_NOTIFICATION
+    assert dispatcher.classify({'callType': 'monitor', 'subtopic': 'lift_1/position'}) == ROUTE_SUBSCRIPTION
+    assert dispatcher.classify({'callType': 'config'}) == ROUTE_GENERAL
+
+
+def test_classification_does_not_depend_on_decoding():
+    # 监控帧正文带 session_id 时，无论是否已被其他消费者解码，分类都相同
+    fields = dict(STATUS_FRAME, data={'session_id': 3})
+    dispatcher = FrameDispatcher()
+    frame = parse_frame(json.dumps(fields))
+    before = dispatcher.classify(frame)
+    frame.data
+    assert dispatcher.classify(frame) == before == ROUTE_SUBSCRIPTION
+
+    reordered = {'type': 'monitor-lift-status', 'data': {'session_id': 3}, 'subtopic': 'lift_1/status'}
+    assert dispatcher.classify(parse_frame(json.dumps(reordered))) == ROUTE_SUBSCRIPTION
+
+
+def test_registered_routes_and_topic_filters():
+    dispatcher = FrameDispatcher()
+    doors = (CHANNEL_GENERAL, 'doors')
+    positions = (CHANNEL_ACTION, 'position')
+    dispatcher.route(doors, topic_filter='lift_+/doors')
+    dispatcher.route(positions, topic_prefix='lift_')
+    dispatcher.route((CHANNEL_SUBSCRIPTION, 'first'), topic_filter='lift_1/#')
+
+    assert dispatcher.classify({'subtopic': 'lift_2/doors'}) == doors
+    # 多个过滤器匹配时先登记的优先
+    assert dispatcher.classify({'subtopic': 'lift_1/doors'}) == doors
+    assert dispatcher.classify({'subtopic': 'lift_1/position'}) == (CHANNEL_SUBSCRIPTION, 'first')
+    assert dispatcher.classify({'subtopic': 'lift_2/position'}) == positions
+
+    dispatcher.route(ROUTE_GENERAL, type='monitor-lift-status')
+    assert dispatcher.classify(STATUS_FRAME) == ROUTE_GENERAL
+
+
+def test_dispatch_materializes_a_copy():
+    frame = parse_frame(json.dumps(STATUS_FRAME))
+    event = FrameDispatcher().dispatch(frame)
+    assert event.channel == CHANNEL_SUBSCRIPTION
+    assert event.header is frame.header
+
+    materialized = event.materialize()
+    assert materialized['callType'] == 'subscription'
+    assert frame.data['callType'] == 'monitor'
+    assert event.materialize() is materialized
@@ -0,0 +1,72 @@
+"""
+单写者发送循环单元测试：优先级通道顺序、公开 send() 回退，以及连接关闭后发送抛出 ConnectionError
+"""
+
+import asyncio
+import json
+
+import pytest
+
+import drivers
+from frame_sender import LANE_BACKGROUND, LANE_CALL, LANE_URGENT, FrameSender, frame_lane
+
+
+class _PublicWebSocket:
+    """只有公开 send() 的连接对象"""
+
+    def __init__(self):
+        self.frames = []
+
+    async def send(self, text):
+        self.frames.append(json.loads(text))
+
+
+def test_frame_lanes():
+    assert frame_lane({'type': 'lift-call-api-v2', 'callType': 'delete'}) == LANE_URGENT
+    assert frame_lane({'type': 'lift-call-api-v2', 'callType': 'action'}) == LANE_CALL
+    assert frame_lane({'type': 'common-api', 'callType': 'config'}) == LANE_BACKGROUND
+
+
+def test_urgent_frames_are_written_first_through_public_send():
+    async def run():
+        websocket = _PublicWebSocket()
+        sender = FrameSender(websocket)
+        sends = [
+            sender.send({'type': 'common-api', 'callType': 'config'}),
+            sender.send({'type': 'lift-call-api-v2', 'callType': 'action'}),
+            sender.send({'type': 'lift-call-api-v2', 'callType': 'hold_open'}),
+        ]
+        await asyncio.gather(*sends)
+        assert [frame['callType'] for frame in websocket.frames] == ['hold_open', 'action', 'config']
+        assert sender.stats()['sent'] == 3
+        sender.close()
+
+    asyncio.run(run())
+
+
+def test_send_after_close_fails():
+    async def run():
+        sender = FrameSender(_PublicWebSocket())
+        sender.close()
+        with pytest.raises(ConnectionError):
+            await sender.send({'type': 'common-api'})
+
+    asyncio.run(run())
+
+
+def test_driver_without_sender_raises_connection_error():
+    async def run():
+        driver = drivers.KoneDriverV2('cid', 'secret', auto_reconnect=False)
+
+        async def ensure_connection():
+            # 模拟 close() 在连接检查之后、发送之前释放了 sender
+            driver.sender = None
+
+        driver._ensure_connection = ensure_connection
+        with pytest.raises(ConnectionError):
+            await driver._send_message(driver.messages.common_api('building:b', 'config'))
+        with pytest.raises(ConnectionError):
+            await driver.ping('building:b')
+        assert driver.pending_requests == {}
+
+    asyncio.run(run())
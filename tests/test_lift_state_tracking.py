@@ -0,0 +1,74 @@
+"""
+电梯状态跟踪单元测试：监听器只为正在跟踪的群组解码并应用状态帧，其余状态帧保持只解析头部
+"""
+
+import asyncio
+import json
+
+import pytest
+
+import drivers
+from evidence_writer import EvidenceWriter
+
+BUILDING = 'building:b'
+
+
+def _status_frame(group_id: str) -> str:
+    return json.dumps({
+        'subtopic': 'lift_1/status', 'buildingId': BUILDING, 'groupId': group_id,
+        'type': 'monitor-lift-status', 'callType': 'monitor',
+        'data': {'time': 't', 'lift_mode': 0, 'fault_active': False, 'decks': [{'area': 3000}]}
+    })
+
+
+class _FakeWebSocket:
+    def __init__(self, frames):
+        self.frames = frames
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for frame in self.frames:
+            yield frame
+
+
+@pytest.fixture
+def evidence(tmp_path, monkeypatch):
+    writer = EvidenceWriter(str(tmp_path / 'evidence.log'))
+    monkeypatch.setattr(drivers, 'get_evidence_writer', lambda: writer)
+    yield writer
+    writer.close()
+
+
+def test_only_tracked_groups_are_decoded(evidence):
+    async def run():
+        driver = drivers.KoneDriverV2('cid', 'secret', auto_reconnect=False)
+
+        async def subscribe_continuous(building_id, subtopics, group_id=None):
+            return 'lease-1'
+
+        driver.subscribe_continuous = subscribe_continuous
+        await driver.track_lift_state(BUILDING, '1')
+
+        driver.websocket = _FakeWebSocket([_status_frame('1'), _status_frame('2')])
+        await driver._listen_events()
+
+        frames = {}
+        while True:
+            event = driver.event_bus.get_event_nowait()
+            if event is None:
+                break
+            frames[event.header['groupId']] = event.source
+
+        assert frames['1'].decoded
+        assert not frames['2'].decoded
+        assert driver.lift_state.get(BUILDING, '1', 1) is not None
+        assert driver.lift_state.get(BUILDING, '2', 1) is None
+
+        assert await driver.untrack_lift_state(BUILDING, '1')
+        driver.websocket = _FakeWebSocket([_status_frame('1')])
+        await driver._listen_events()
+        assert not driver.event_bus.get_event_nowait().source.decoded
+
+    asyncio.run(run())
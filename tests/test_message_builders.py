@@ -0,0 +1,134 @@
+"""
+消息构建器单元测试：预序列化帧与消息字典一致、request_id 单调不重复并在上限回绕，
+以及构建结果与 elevator-websocket-api-v2.yaml 中消息定义的字段、类型和枚举一致
+"""
+
+import json
+import re
+from pathlib import Path
+
+import pytest
+import yaml
+
+from message_builders import (
+    REQUEST_ID_MAX, REQUEST_ID_MIN, BuiltMessage, MessageBuilder, RequestIdGenerator, utc_timestamp
+)
+
+SPEC_PATH = Path(__file__).resolve().parent.parent / 'elevator-websocket-api-v2.yaml'
+
+# 与规范有意不同的字段：common-api / site-monitoring 的字符串 requestId 用于关联响应（规范未声明），
+# lift-call 规范未列出 groupId；规范示例中 lift-call 的 request_id 为数字，而 schema 写成了 string
+SPEC_EXTRA_FIELDS = {
+    ('common-api', 'requestId'), ('site-monitoring', 'requestId'), ('lift-call', 'groupId'),
+}
+SPEC_TYPE_OVERRIDES = {('lift-call', 'payload.request_id'): 'number'}
+
+JSON_TYPES = {'string': str, 'number': (int, float), 'array': list, 'object': dict}
+
+
+@pytest.fixture(scope='module')
+def spec_messages():
+    with open(SPEC_PATH, encoding='utf-8') as f:
+        return yaml.safe_load(f)['components']['messages']
+
+
+def _spec_for(spec_messages, message):
+    """按 type + callType 找到规范中描述该请求的消息；多条匹配时取与 type 同名的定义"""
+    matches = []
+    for name, definition in spec_messages.items():
+        properties = definition['payload'].get('properties', {})
+        if message['type'] in properties.get('type', {}).get('enum', []) \
+                and message['callType'] in properties.get('callType', {}).get('enum', []):
+            matches.append(name)
+    assert matches, f"No spec message for {message['type']}/{message['callType']}"
+    name = message['type'] if message['type'] in matches else matches[0]
+    return name, spec_messages[name]['payload']
+
+
+def _check_against_schema(name, schema, value, path=''):
+    # 规范中 allowed_lifts 的键名带有软连字符（U+00AD）
+    properties = {key.replace('\u00ad', ''): child for key, child in schema.get('properties', {}).items()}
+    for required in schema.get('required', []):
+        assert required in value, f"{name}: missing required {path}{required}"
+    for key, field in value.items():
+        field_path = path + key
+        if (name, field_path) in SPEC_EXTRA_FIELDS:
+            continue
+        assert key in properties, f"{name}: {field_path} is not in the spec"
+        child = properties[key]
+        expected = SPEC_TYPE_OVERRIDES.get((name, field_path), child.get('type'))
+        if expected in JSON_TYPES:
+            assert isinstance(field, JSON_TYPES[expected]), f"{name}: {field_path} should be {expected}"
+        if key in ('type', 'callType'):
+            assert field in child['enum']
+        if isinstance(field, dict):
+            _check_against_schema(name, child, field, field_path + '.')
+
+
+def test_builders_match_spec(spec_messages):
+    builder = MessageBuilder()
+    messages = [
+        builder.common_api('building:b', 'config'),
+        builder.common_api('building:b', 'actions', '2'),
+        builder.common_api('building:b', 'ping'),
+        builder.site_monitoring('building:b', ['lift_+/status'], 300, '1', 'sub-1'),
+        builder.lift_call('building:b', 1000, 2, destination=5000, delay=5, allowed_lifts=[1, 2]),
+        builder.lift_call('building:b', 3000, 2001),
+        builder.hold_open('building:b', 1001010, 1000, 5, soft_time=10),
+        builder.delete_call('building:b', 42),
+    ]
+    for message in messages:
+        name, schema = _spec_for(spec_messages, message)
+        _check_against_schema(name, schema, dict(message))
+
+
+def test_request_ids_are_monotonic_and_wrap():
+    ids = RequestIdGenerator(start=REQUEST_ID_MAX - 1)
+    assert [ids.next() for _ in range(3)] == [REQUEST_ID_MAX - 1, REQUEST_ID_MAX, REQUEST_ID_MIN]
+
+    ids = RequestIdGenerator()
+    values = [ids.next() for _ in range(1000)]
+    assert len(set(values)) == 1000
+    assert all(REQUEST_ID_MIN <= value <= REQUEST_ID_MAX for value in values)
+
+
+def test_frames_decode_to_the_message_fields():
+    builder = MessageBuilder(RequestIdGenerator(start=REQUEST_ID_MIN))
+    messages = [
+        builder.common_api('building:b', 'config'),
+        builder.site_monitoring('building:b', ['lift_+/status'], 600, '2', 'sub-1'),
+        builder.lift_call('building:b', 1000, 2, destination=5000, delay=5, allowed_lifts=[1]),
+        builder.hold_open('building:b', 1001010, 1000, 5, soft_time=10),
+        builder.delete_call('building:b', 42),
+    ]
+    for message in messages:
+        assert isinstance(message, BuiltMessage)
+        assert json.loads(message.frame) == dict(message)
+        assert list(json.loads(message.frame))[:4] == ['type', 'buildingId', 'callType', 'groupId']
+
+
+def test_common_api_request_id_is_a_string_in_the_header():
+    message = MessageBuilder(RequestIdGenerator(start=REQUEST_ID_MIN)).common_api('building:b', 'ping', '1')
+    assert message['requestId'] == str(REQUEST_ID_MIN)
+    assert message['payload'] == {'request_id': REQUEST_ID_MIN}
+
+
+def test_site_monitoring_duration_is_capped():
+    message = MessageBuilder().site_monitoring('building:b', ['lift_1/status'], 900)
+    assert message['payload']['duration'] == 300
+
+
+def test_modifying_a_message_drops_the_frame():
+    message = MessageBuilder().delete_call('building:b', 42)
+    assert message.frame is not None
+    message['groupId'] = '2'
+    assert message.frame is None
+
+    message = MessageBuilder().delete_call('building:b', 42)
+    message['payload']['session_id'] = 43
+    message.invalidate()
+    assert message.frame is None
+
+
+def test_utc_timestamp_format():
+    assert re.fullmatch(r'\d{4}-\d\d-\d\dT\d\d:\d\d:\d\d\.\d{6}Z', utc_timestamp())
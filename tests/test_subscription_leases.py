@@ -0,0 +1,99 @@
+"""
+订阅租约单元测试：同群组合并订阅帧、按群组加锁发送，以及慢建筑不阻塞其他建筑的登记和续订
+"""
+
+import asyncio
+
+from subscription_leases import SubscriptionLeaseManager
+
+
+class _FakeDriver:
+    """记录订阅帧；blocked 中的建筑在对应事件被设置前不返回订阅响应"""
+
+    def __init__(self):
+        self.sent = []
+        self.forgotten = []
+        self.blocked = {}
+
+    async def subscribe(self, building_id, topics, duration, group_id, sub):
+        self.sent.append((building_id, tuple(topics)))
+        gate = self.blocked.get(building_id)
+        if gate is not None:
+            await gate.wait()
+        return {'statusCode': 201}
+
+    def forget_subscription(self, sub):
+        self.forgotten.append(sub)
+
+
+def test_topics_are_merged_per_group():
+    async def run():
+        driver = _FakeDriver()
+        leases = SubscriptionLeaseManager(driver)
+        first, second = await asyncio.gather(
+            leases.acquire('building:a', ['lift_1/status']),
+            leases.acquire('building:a', ['lift_1/status']),
+        )
+        assert driver.sent == [('building:a', ('lift_1/status',))]
+
+        await leases.acquire('building:a', ['lift_+/status'])
+        assert driver.sent[-1] == ('building:a', ('lift_+/status',))
+
+        for lease_id in (first, second):
+            await leases.release(lease_id)
+        assert driver.forgotten == []
+        leases.close()
+
+    asyncio.run(run())
+
+
+def test_release_of_last_lease_forgets_subscription():
+    async def run():
+        driver = _FakeDriver()
+        leases = SubscriptionLeaseManager(driver)
+        lease_id = await leases.acquire('building:a', ['lift_1/status'], '2')
+        await leases.release(lease_id)
+        assert driver.forgotten == ['lease_building:a_2']
+        assert leases.leases() == []
+        leases.close()
+
+    asyncio.run(run())
+
+
+def test_slow_building_does_not_block_other_acquires():
+    async def run():
+        driver = _FakeDriver()
+        driver.blocked['building:slow'] = asyncio.Event()
+        leases = SubscriptionLeaseManager(driver)
+
+        slow = asyncio.ensure_future(leases.acquire('building:slow', ['lift_1/status']))
+        await asyncio.sleep(0)
+        await asyncio.wait_for(leases.acquire('building:fast', ['lift_1/status']), timeout=1)
+        assert not slow.done()
+
+        driver.blocked['building:slow'].set()
+        await slow
+        leases.close()
+
+    asyncio.run(run())
+
+
+def test_slow_building_does_not_delay_other_renewals():
+    async def run():
+        driver = _FakeDriver()
+        leases = SubscriptionLeaseManager(driver, renew_margin=299.95)
+        await leases.acquire('building:slow', ['lift_1/status'])
+        await leases.acquire('building:fast', ['lift_1/status'])
+
+        driver.blocked['building:slow'] = asyncio.Event()
+        await asyncio.sleep(0.35)
+        fast_sent = [entry for entry in driver.sent if entry[0] == 'building:fast']
+        slow_sent = [entry for entry in driver.sent if entry[0] == 'building:slow']
+        # 慢建筑的续订卡住期间，快建筑仍按期续订了多次
+        assert len(slow_sent) == 2
+        assert len(fast_sent) >= 4
+
+        driver.blocked['building:slow'].set()
+        leases.close()
+
+    asyncio.run(run())
@@ -0,0 +1,114 @@
+"""
+主题前缀树单元测试：整级 '+'、级内通配（lift_+）、'#'、移除与最小主题集
+"""
+
+import pytest
+
+from topic_trie import TopicTrie, level_matches, minimal_topics
+
+
+def matches(topic_filter: str, topic: str) -> bool:
+    trie = TopicTrie()
+    trie.add(topic_filter, topic_filter)
+    return bool(trie.match(topic))
+
+
+@pytest.mark.parametrize('topic_filter, topic, expected', [
+    ('lift_1/status', 'lift_1/status', True),
+    ('lift_1/status', 'lift_2/status', False),
+    ('+/status', 'lift_1/status', True),
+    ('+/status', 'lift_1/position', False),
+    ('+', 'lift_1/status', False),
+    ('lift_1/#', 'lift_1/status', True),
+    ('lift_1/#', 'lift_1/doors/1', True),
+    ('lift_1/#', 'lift_1', True),
+    ('lift_1/#', 'lift_2/status', False),
+    ('#', 'call_state/10/assigned', True),
+    ('call_state/+/+', 'call_state/10/assigned', True),
+    ('call_state/+/+', 'call_state/10', False),
+])
+def test_whole_level_wildcards(topic_filter, topic, expected):
+    assert matches(topic_filter, topic) is expected
+
+
+@pytest.mark.parametrize('topic_filter, topic, expected', [
+    ('lift_+/status', 'lift_1/status', True),
+    ('lift_+/status', 'lift_12/status', True),
+    ('lift_+/status', 'lift_/status', True),
+    ('lift_+/status', 'deck_1/status', False),
+    ('lift_+/status', 'lift_1/position', False),
+    ('lift_+/status', 'lift_1/status/extra', False),
+    ('lift_+_deck', 'lift_3_deck', True),
+    ('lift_+_deck', 'lift_3_door', False),
+])
+def test_in_level_wildcard(topic_filter, topic, expected):
+    assert matches(topic_filter, topic) is expected
+
+
+def test_level_matches_multiple_wildcards():
+    assert level_matches('a+b+c', 'axxbyyc')
+    assert level_matches('a+b+c', 'abc')
+    assert not level_matches('a+b+c', 'axxc')
+    assert not level_matches('ab+ba', 'aba')
+
+
+def test_match_returns_every_matching_value_once():
+    trie = TopicTrie()
+    shared = object()
+    trie.add('lift_+/status', 'in-level')
+    trie.add('+/status', 'whole-level')
+    trie.add('lift_1/#', 'hash')
+    trie.add('lift_1/status', shared)
+    trie.add('lift_+/status', shared)
+    trie.add('lift_2/status', 'other')
+
+    result = trie.match('lift_1/status')
+    assert sorted(map(str, result)) == sorted(map(str, ['in-level', 'whole-level', 'hash', shared]))
+    assert result.count(shared) == 1
+
+
+def test_remove_prunes_and_keeps_other_values():
+    trie = TopicTrie()
+    trie.add('lift_+/status', 'a')
+    trie.add('lift_+/status', 'b')
+    trie.add('lift_1/#', 'c')
+    assert len(trie) == 3
+
+    assert trie.remove('lift_+/status', 'a')
+    assert not trie.remove('lift_+/status', 'a')
+    assert sorted(trie.match('lift_1/status')) == ['b', 'c']
+    assert trie.remove('lift_+/status', 'b')
+    assert trie.remove('lift_1/#', 'c')
+    assert len(trie) == 0
+    assert trie.match('lift_1/status') == []
+    assert trie._root.is_empty()
+
+
+def test_hash_must_be_last_level():
+    with pytest.raises(ValueError):
+        TopicTrie().add('lift_1/#/status', 'x')
+
+
+def test_minimal_topics_drops_covered_filters():
+    assert minimal_topics(['lift_1/status', 'lift_+/status', 'lift_2/position']) == \
+        ['lift_+/status', 'lift_2/position']
+    assert minimal_topics(['lift_1/position', 'lift_1/#', 'lift_1/+']) == ['lift_1/#']
+    assert minimal_topics(['lift_+/status', 'lift_+/status']) == ['lift_+/status']
+    assert minimal_topics(['call_state/+/+', 'lift_+/doors']) == ['call_state/+/+', 'lift_+/doors']
+
+
+@pytest.mark.parametrize('wider, narrower, expected', [
+    ('lift_+/status', 'lift_1/status', True),
+    ('+/status', 'lift_+/status', True),
+    ('lift_+/status', '+/status', False),
+    ('lift_1/#', 'lift_1/+', True),
+    ('lift_1/+', 'lift_1/#', False),
+    ('lift_1/+/#', 'lift_1/#', False),
+    ('#', 'call_state/+/+', True),
+    ('l+', 'lift_+', True),
+    ('lift_+', 'l+', False),
+])
+def test_covering_compares_filters_by_containment(wider, narrower, expected):
+    trie = TopicTrie()
+    trie.add(wider, wider)
+    assert (trie.covering(narrower) == [wider]) is expected
@@ -0,0 +1,285 @@
+"""
+KONE OAuth Token管理器
+进程内所有驱动共享同一份内存Token：并发请求只触发一次OAuth刷新，过期前后台主动刷新，
+磁盘缓存（config.yaml 的 cached_token）只在启动时读取一次，并在事件循环之外原子写入
+"""
+
+import asyncio
+import base64
+import hashlib
+import logging
+import os
+import stat
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import aiohttp
+import yaml
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SCOPE = 'application/inventory callgiving/*'
+
+
+class TokenManager:
+    """单飞刷新 + 主动续期的访问令牌管理器"""
+
+    def __init__(self, client_id: str, client_secret: str,
+                 token_endpoint: str = "https://dev.kone.com/api/v2/oauth2/token",
+                 scope: str = DEFAULT_SCOPE,
+                 cache_path: Optional[str] = 'config.yaml',
+                 refresh_margin: float = 300.0,
+                 proactive_lead: float = 60.0,
+                 evidence_logger: Optional[Callable[[str, Dict[str, Any]], None]] = None):
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.token_endpoint = token_endpoint
+        self.scope = scope
+        self.cache_path = cache_path
+        # 距离过期不足 refresh_margin 秒的Token视为失效（与原先提前5分钟刷新一致）
+        self.refresh_margin = refresh_margin
+        # 在失效点之前 proactive_lead 秒于后台刷新，调用方不必等待
+        self.proactive_lead = proactive_lead
+        self.evidence_logger = evidence_logger
+
+        self.access_token: Optional[str] = None
+        self.token_expiry: Optional[datetime] = None
+        # 'oauth' 表示新申请的Token，'cache' 表示从磁盘缓存加载
+        self.token_source: Optional[str] = None
+        # 最近一次OAuth响应（不含access_token），用于scope校验
+        self.last_token_response: Dict[str, Any] = {}
+        self.refresh_count = 0
+
+        self._valid_until = 0.0  # 失效时间点（epoch秒）
+        self._cache_loaded = False
+        self._inflight: Optional[asyncio.Task] = None
+        self._refresh_handle: Optional[asyncio.TimerHandle] = None
+        # 使用中的驱动数；最后一个驱动释放后不再安排后台刷新
+        self.users = 0
+        self._idle = False
+
+    def current_token(self) -> Optional[str]:
+        """无需等待即可使用的Token，已失效时返回None"""
+        if self.access_token and time.time() < self._valid_until:
+            return self.access_token
+        return None
+
+    async def get_token(self) -> str:
+        """获取有效Token - 命中内存时只是一次属性读取"""
+        token = self.access_token
+        if token and time.time() < self._valid_until:
+            return token
+        return await self.refresh()
+
+    async def refresh(self, force: bool = False) -> str:
+        """刷新Token，并发调用共享同一个进行中的刷新任务"""
+        task = self._inflight
+        if task is None or task.done() or task.get_loop() is not asyncio.get_running_loop():
+            task = asyncio.ensure_future(self._do_refresh(force))
+            self._inflight = task
+        # shield: 单个调用方被取消不影响其他等待者
+        return await asyncio.shield(task)
+
+    def load_cached_token(self) -> Tuple[Optional[str], Optional[datetime]]:
+        """从磁盘缓存读取Token（同步）"""
+        if not self.cache_path:
+            return None, None
+        try:
+            with open(self.cache_path, 'r') as f:
+                config = yaml.safe_load(f) or {}
+
+            cached = config.get('kone', {}).get('cached_token', {})
+            token = cached.get('access_token')
+            expires_str = cached.get('expires_at')
+
+            if token and expires_str:
+                expires_at = datetime.fromisoformat(expires_str.replace('Z', '+00:00'))
+                return token, expires_at.replace(tzinfo=None)
+
+        except Exception as e:
+            logger.error(f"Failed to load cached token: {e}")
+
+        return None, None
+
+    def acquire(self) -> 'TokenManager':
+        """登记一个使用者（驱动）"""
+        self.users += 1
+        if self._idle:
+            self._idle = False
+            if self.current_token():
+                self._schedule_proactive_refresh()
+        return self
+
+    def release(self):
+        """使用者不再需要Token：最后一个使用者释放时取消后台刷新，Token仍保留在内存中供之后复用"""
+        self.users = max(self.users - 1, 0)
+        if self.users == 0:
+            self._idle = True
+            self.close()
+
+    def close(self):
+        """取消后台刷新定时器"""
+        if self._refresh_handle is not None:
+            self._refresh_handle.cancel()
+            self._refresh_handle = None
+
+    async def _do_refresh(self, force: bool) -> str:
+        if not force:
+            token = self.current_token()
+            if token:
+                return token
+
+            # 磁盘缓存只在进程内第一次需要时读取
+            if not self._cache_loaded and self.cache_path:
+                self._cache_loaded = True
+                loop = asyncio.get_running_loop()
+                cached_token, cached_expiry = await loop.run_in_executor(None, self.load_cached_token)
+                if cached_token and cached_expiry and self._is_fresh(cached_expiry):
+                    self._set_token(cached_token, cached_expiry, 'cache')
+                    return cached_token
+
+        token, expiry = await self._request_token()
+        self._set_token(token, expiry, 'oauth')
+        self.refresh_count += 1
+
+        if self.cache_path:
+            loop = asyncio.get_running_loop()
+            loop.run_in_executor(None, self._write_cache, token, expiry)
+
+        return token
+
+    async def _request_token(self) -> Tuple[str, datetime]:
+        """向OAuth端点申请新Token"""
+        credentials = f"{self.client_id}:{self.client_secret}"
+        encoded = base64.b64encode(credentials.encode()).decode()
+
+        headers = {
+            'Authorization': f'Basic {encoded}',
+            'Content-Type': 'application/x-www-form-urlencoded'
+        }
+
+        data = {
+            'grant_type': 'client_credentials',
+            'scope': self.scope
+        }
+
+        self._log('request', {
+            'method': 'POST',
+            'url': self.token_endpoint,
+            'headers': {k: v for k, v in headers.items() if 'Authorization' not in k},
+            'data': data
+        })
+
+        async with aiohttp.ClientSession() as session:
+            async with session.post(self.token_endpoint, data=data, headers=headers) as response:
+                response_data = await response.json()
+
+                self._log('response', {
+                    'status': response.status,
+                    'data': {k: v for k, v in response_data.items() if 'access_token' not in k}
+                })
+
+                if response.status != 200:
+                    raise Exception(f"Token request failed: {response.status}")
+
+                self.last_token_response = {k: v for k, v in response_data.items() if k != 'access_token'}
+                expires_in = response_data.get('expires_in', 3600)
+                return response_data['access_token'], datetime.now() + timedelta(seconds=expires_in)
+
+    def _is_fresh(self, expiry: datetime) -> bool:
+        return datetime.now() < expiry - timedelta(seconds=self.refresh_margin)
+
+    def _set_token(self, token: str, expiry: datetime, source: str):
+        self.access_token = token
+        self.token_expiry = expiry
+        self.token_source = source
+        self._valid_until = time.time() + (expiry - datetime.now()).total_seconds() - self.refresh_margin
+        self._schedule_proactive_refresh()
+
+    def _schedule_proactive_refresh(self, delay: Optional[float] = None):
+        """在Token失效前安排一次后台刷新"""
+        self.close()
+        if self._idle:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        if delay is None:
+            delay = max(self._valid_until - time.time() - self.proactive_lead, 0.0)
+        self._refresh_handle = loop.call_later(delay, self._start_background_refresh)
+
+    def _start_background_refresh(self):
+        self._refresh_handle = None
+        task = asyncio.ensure_future(self.refresh(force=True))
+        task.add_done_callback(self._on_background_refresh_done)
+
+    def _on_background_refresh_done(self, task: asyncio.Task):
+        if task.cancelled():
+            return
+        error = task.exception()
+        if error is not None:
+            logger.warning(f"Background token refresh failed: {error}")
+            # 仍在有效期内则稍后重试，否则交给下一次 get_token 同步刷新
+            if self.current_token():
+                self._schedule_proactive_refresh(delay=min(30.0, max(self._valid_until - time.time(), 0.0)))
+
+    def _write_cache(self, access_token: str, expires_at: datetime):
+        """原子写入磁盘缓存（在线程池中执行）"""
+        try:
+            with open(self.cache_path, 'r') as f:
+                config = yaml.safe_load(f) or {}
+
+            if 'kone' not in config:
+                config['kone'] = {}
+
+            # 脱敏处理 - 仅保存必要信息
+            config['kone']['cached_token'] = {
+                'access_token': access_token,
+                'expires_at': expires_at.isoformat(),
+                'token_type': 'Bearer'
+            }
+
+            directory = os.path.dirname(os.path.abspath(self.cache_path))
+            fd, tmp_path = tempfile.mkstemp(prefix='.token-', suffix='.yaml', dir=directory)
+            try:
+                with os.fdopen(fd, 'w') as f:
+                    yaml.safe_dump(config, f, default_flow_style=False, indent=2)
+                # 保持原文件权限
+                os.chmod(tmp_path, stat.S_IMODE(os.stat(self.cache_path).st_mode))
+                os.replace(tmp_path, self.cache_path)
+            except Exception:
+                os.unlink(tmp_path)
+                raise
+
+        except Exception as e:
+            logger.error(f"Failed to save token: {e}")
+
+    def _log(self, phase: str, data: Dict[str, Any]):
+        if self.evidence_logger is not None:
+            self.evidence_logger(phase, data)
+
+
+# 进程级Token管理器注册表，键中只保存密钥的摘要
+_managers: Dict[Tuple[str, str, str, str], TokenManager] = {}
+_managers_lock = threading.Lock()
+
+
+def get_token_manager(client_id: str, client_secret: str,
+                      token_endpoint: str = "https://dev.kone.com/api/v2/oauth2/token",
+                      scope: str = DEFAULT_SCOPE, **kwargs) -> TokenManager:
+    """获取（必要时创建）进程内共享的Token管理器并登记一个使用者，用完须调用 release()；
+    密钥轮换后按新密钥创建新的管理器"""
+    secret_digest = hashlib.sha256(client_secret.encode('utf-8')).hexdigest()
+    key = (client_id, secret_digest, token_endpoint, scope)
+    manager = _managers.get(key)
+    if manager is None:
+        with _managers_lock:
+            manager = _managers.get(key)
+            if manager is None:
+                manager = TokenManager(client_id, client_secret, token_endpoint, scope, **kwargs)
+                _managers[key] = manager
+    return manager.acquire()
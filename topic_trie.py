@@ -0,0 +1,202 @@
+"""
+主题匹配前缀树
+按 '/' 分级保存订阅过滤器，支持 '+'（整级或级内通配，如 lift_+）和 '#'（剩余所有级别）。
+一次匹配沿主题逐级向下，只访问可能匹配的分支：耗时取决于主题层数，与登记的过滤器数量无关。
+过滤器之间的覆盖判断（订阅合并、最小主题集）也用同一棵树，见 covering()
+"""
+
+from typing import Any, Dict, Generic, Iterable, List, Optional, Tuple, TypeVar
+
+T = TypeVar('T')
+
+
+def level_matches(level: str, topic_level: str) -> bool:
+    """单级匹配：'+' 匹配整级；KONE 主题中级内的 '+'（如 lift_+）匹配该级内任意字符"""
+    if level == '+' or level == topic_level:
+        return True
+    if '+' not in level:
+        return False
+    parts = level.split('+')
+    if not topic_level.startswith(parts[0]) or not topic_level.endswith(parts[-1]):
+        return False
+    position = len(parts[0])
+    end = len(topic_level) - len(parts[-1])
+    for part in parts[1:-1]:
+        position = topic_level.find(part, position, end)
+        if position < 0:
+            return False
+        position += len(part)
+    return position <= end
+
+
+class _Node:
+    __slots__ = ('children', 'plus', 'patterns', 'hash_values', 'values')
+
+    def __init__(self):
+        self.children: Dict[str, '_Node'] = {}
+        self.plus: Optional['_Node'] = None          # 整级 '+'
+        self.patterns: Dict[str, '_Node'] = {}       # 级内通配，如 'lift_+'
+        self.hash_values: List[Any] = []             # 以 '#' 结尾的过滤器
+        self.values: List[Any] = []                  # 在此级结束的过滤器
+
+    def is_empty(self) -> bool:
+        return not (self.children or self.plus or self.patterns or self.hash_values or self.values)
+
+
+class TopicTrie(Generic[T]):
+    """过滤器 -> 值 的多值映射，match() 一次遍历返回所有匹配主题的过滤器的值（同一对象只返回一次）"""
+
+    def __init__(self):
+        self._root = _Node()
+        self._count = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    def add(self, topic_filter: str, value: T):
+        node = self._root
+        levels = topic_filter.split('/')
+        for index, level in enumerate(levels):
+            if level == '#':
+                if index != len(levels) - 1:
+                    raise ValueError(f"'#' must be the last level: {topic_filter}")
+                node.hash_values.append(value)
+                self._count += 1
+                return
+            node = self._child(node, level)
+        node.values.append(value)
+        self._count += 1
+
+    @staticmethod
+    def _child(node: _Node, level: str) -> _Node:
+        if level == '+':
+            if node.plus is None:
+                node.plus = _Node()
+            return node.plus
+        table = node.patterns if '+' in level else node.children
+        child = table.get(level)
+        if child is None:
+            child = table[level] = _Node()
+        return child
+
+    def remove(self, topic_filter: str, value: T) -> bool:
+        """移除一次登记，返回是否存在；空分支随之删除"""
+        path: List[Tuple[_Node, str]] = []
+        node = self._root
+        levels = topic_filter.split('/')
+        for level in levels:
+            if level == '#':
+                break
+            path.append((node, level))
+            if level == '+':
+                node = node.plus
+            else:
+                node = (node.patterns if '+' in level else node.children).get(level)
+            if node is None:
+                return False
+
+        bucket = node.hash_values if levels[-1] == '#' else node.values
+        if value not in bucket:
+            return False
+        bucket.remove(value)
+        self._count -= 1
+
+        # 自底向上清理空节点
+        for parent, level in reversed(path):
+            child = parent.plus if level == '+' else \
+                (parent.patterns if '+' in level else parent.children).get(level)
+            if child is None or not child.is_empty():
+                break
+            if level == '+':
+                parent.plus = None
+            elif '+' in level:
+                del parent.patterns[level]
+            else:
+                del parent.children[level]
+        return True
+
+    def match(self, topic: str) -> List[T]:
+        levels = topic.split('/')
+        depth = len(levels)
+        result: List[T] = []
+        seen = set()
+
+        def collect(values: Iterable[T]):
+            for value in values:
+                key = id(value)
+                if key not in seen:
+                    seen.add(key)
+                    result.append(value)
+
+        stack = [(self._root, 0)]
+        while stack:
+            node, index = stack.pop()
+            if node.hash_values:
+                collect(node.hash_values)
+            if index == depth:
+                if node.values:
+                    collect(node.values)
+                continue
+            level = levels[index]
+            child = node.children.get(level)
+            if child is not None:
+                stack.append((child, index + 1))
+            if node.plus is not None:
+                stack.append((node.plus, index + 1))
+            for pattern, child in node.patterns.items():
+                if level_matches(pattern, level):
+                    stack.append((child, index + 1))
+        return result
+
+    def covering(self, topic_filter: str) -> List[T]:
+        """返回覆盖该过滤器的所有过滤器的值：被覆盖过滤器能匹配的主题，它们都能匹配。
+        与 match() 的区别是通配级只能被同样宽或更宽的通配覆盖（'#' 只能被 '#'，'+' 只能被 '+' 或 '#'）"""
+        levels = topic_filter.split('/')
+        depth = len(levels)
+        result: List[T] = []
+        seen = set()
+
+        def collect(values: Iterable[T]):
+            for value in values:
+                key = id(value)
+                if key not in seen:
+                    seen.add(key)
+                    result.append(value)
+
+        stack = [(self._root, 0)]
+        while stack:
+            node, index = stack.pop()
+            if node.hash_values:
+                collect(node.hash_values)
+            if index == depth:
+                if node.values:
+                    collect(node.values)
+                continue
+            level = levels[index]
+            if level == '#':
+                continue
+            if node.plus is not None:
+                stack.append((node.plus, index + 1))
+            if level == '+':
+                continue
+            if '+' not in level:
+                child = node.children.get(level)
+                if child is not None:
+                    stack.append((child, index + 1))
+            for pattern, child in node.patterns.items():
+                if level_matches(pattern, level):
+                    stack.append((child, index + 1))
+        return result
+
+    def clear(self):
+        self._root = _Node()
+        self._count = 0
+
+
+def minimal_topics(topics: Iterable[str]) -> List[str]:
+    """去掉已被其他通配主题覆盖的主题，得到等价的最小主题集；每个主题只在前缀树中查询一次"""
+    unique = sorted(set(topics))
+    trie: TopicTrie[str] = TopicTrie()
+    for topic in unique:
+        trie.add(topic, topic)
+    return [topic for topic in unique if all(other == topic for other in trie.covering(topic))]